@@ -0,0 +1,30 @@
+"""Add frame sampling to extraction jobs
+
+Revision ID: 8f2d6b4c1e73
+Revises: 3c8e5a1f9d42
+Create Date: 2026-10-18 11:03:27.194562
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2d6b4c1e73'
+down_revision: Union[str, Sequence[str], None] = '3c8e5a1f9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('extraction_jobs', sa.Column('target_fps', sa.Float(), nullable=True))
+    op.add_column('extraction_jobs', sa.Column('frame_stride', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('extraction_jobs', 'frame_stride')
+    op.drop_column('extraction_jobs', 'target_fps')
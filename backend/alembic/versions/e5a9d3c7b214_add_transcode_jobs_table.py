@@ -0,0 +1,48 @@
+"""Add transcode jobs table
+
+Revision ID: e5a9d3c7b214
+Revises: c81f3b5e2a97
+Create Date: 2026-10-18 19:02:37.418906
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9d3c7b214'
+down_revision: Union[str, Sequence[str], None] = 'c81f3b5e2a97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('transcode_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('source_filename', sa.String(length=255), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('renditions', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transcode_jobs_id'), 'transcode_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_transcode_jobs_content_hash'), 'transcode_jobs', ['content_hash'], unique=False)
+    op.create_index(op.f('ix_transcode_jobs_status'), 'transcode_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transcode_jobs_status'), table_name='transcode_jobs')
+    op.drop_index(op.f('ix_transcode_jobs_content_hash'), table_name='transcode_jobs')
+    op.drop_index(op.f('ix_transcode_jobs_id'), table_name='transcode_jobs')
+    op.drop_table('transcode_jobs')
@@ -0,0 +1,37 @@
+"""Add expiry and content hash to upload sessions
+
+Revision ID: f3c1b8d6a425
+Revises: e5a9d3c7b214
+Create Date: 2026-10-18 21:14:09.532817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c1b8d6a425'
+down_revision: Union[str, Sequence[str], None] = 'e5a9d3c7b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('upload_sessions', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('upload_sessions', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_upload_sessions_expires_at'), 'upload_sessions', ['expires_at'], unique=False)
+    # Sessions still open get the default lifetime from their start
+    op.execute(
+        "UPDATE upload_sessions SET expires_at = created_at + interval '24 hours' "
+        "WHERE status = 'open'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_upload_sessions_expires_at'), table_name='upload_sessions')
+    op.drop_column('upload_sessions', 'expires_at')
+    op.drop_column('upload_sessions', 'content_hash')
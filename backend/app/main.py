@@ -45,7 +45,7 @@ from starlette.requests import Request
 class CORSStaticFilesMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         response = await call_next(request)
-        if request.url.path.startswith("/static/"):
+        if request.url.path.startswith(("/static/", "/renditions/")):
             response.headers["Access-Control-Allow-Origin"] = "*"
             response.headers["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
             response.headers["Access-Control-Allow-Headers"] = "*"
@@ -53,6 +53,10 @@ class CORSStaticFilesMiddleware(BaseHTTPMiddleware):
 
 STATIC_VIDEO_DIR = str(pathlib.Path(__file__).parent.parent / "uploaded_videos")
 app.mount("/static", StaticFiles(directory=STATIC_VIDEO_DIR), name="static")
+# Transcoded H.264 renditions: /renditions/<sha256>/<720p|480p>.mp4
+RENDITIONS_DIR = pathlib.Path(__file__).parent.parent / "renditions"
+RENDITIONS_DIR.mkdir(exist_ok=True)
+app.mount("/renditions", StaticFiles(directory=str(RENDITIONS_DIR)), name="renditions")
 app.add_middleware(CORSStaticFilesMiddleware)
 
 # Video proxy endpoint for S3 CORS issues
@@ -169,11 +173,26 @@ app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, lambda r, e: PlainTextResponse(str(e), status_code=429))
 
 # Import video_segments router
-from app.routers import video_segments
+from app.routers import video_segments, uploads
 
 # Include routers
 app.include_router(oauth_router)
 app.include_router(video_segments.router)
+app.include_router(uploads.router)
+
+
+# --- Background job: delete upload sessions that were abandoned ---
+def expired_uploads_job():
+    while True:
+        try:
+            db = SessionLocal()
+            uploads.sweep_expired_uploads(db)
+            db.close()
+        except Exception as e:
+            print(f"[expired_uploads_job] error: {e}")
+        time.sleep(600)  # check ทุก 10 นาที
+
+threading.Thread(target=expired_uploads_job, daemon=True).start()
 # include optional routers if present
 try:
     app.include_router(invite.router)
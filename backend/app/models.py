@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, JSON, Text, TIMESTAMP,DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Boolean, Float, JSON, Text, TIMESTAMP,DateTime
 from sqlalchemy.orm import declarative_base
 from app.db import Base  
 from sqlalchemy.sql import func
@@ -85,6 +85,7 @@ class Video(Base):
     rejected_at   = Column(DateTime(timezone=True), nullable=True)
 
     duration = Column(Integer, nullable=True)  # duration in seconds
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the video file
 
 class Exercise(Base):
     __tablename__ = "exercises"
@@ -113,3 +114,61 @@ class Invite(Base):
     email = Column(String, nullable=False)
     token = Column(String, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class ExtractionJob(Base):
+    __tablename__ = "extraction_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=False)
+    segment_id = Column(Integer, ForeignKey("video_segments.id"), nullable=False)
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued / running / succeeded / failed
+    progress = Column(Float, default=0.0, nullable=False)  # 0-1
+    frames_done = Column(Integer, default=0, nullable=False)
+    frames_total = Column(Integer, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    worker_id = Column(String(100), nullable=True)
+    callback_url = Column(Text, nullable=True)  # POSTed the job status when it finishes
+    target_fps = Column(Float, nullable=True)  # frame sampling; None = every frame
+    frame_stride = Column(Integer, nullable=True)  # used when target_fps is not set
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # refreshed by the worker while running
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # random hex token, also names the files on disk
+    trainer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=True)
+    total_size = Column(BigInteger, nullable=False)  # bytes
+    chunk_size = Column(Integer, nullable=False)  # bytes; every chunk but the last has this size
+    status = Column(String(20), default="open", nullable=False)  # open / completed
+    video_id = Column(Integer, ForeignKey("videos.id"), nullable=True)  # set when completed
+    content_hash = Column(String(64), nullable=True)  # SHA-256 of the file, once all chunks are in
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)  # pushed back by every chunk
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class TranscodeJob(Base):
+    __tablename__ = "transcode_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Renditions belong to the content, so videos sharing a stored file share one job
+    content_hash = Column(String(64), nullable=False, index=True)
+    source_filename = Column(String(255), nullable=False)  # file in uploaded_videos/
+    status = Column(String(20), default="queued", nullable=False, index=True)  # queued / running / succeeded / failed
+    attempts = Column(Integer, default=0, nullable=False)
+    worker_id = Column(String(100), nullable=True)
+    renditions = Column(JSON, nullable=True)  # names of the renditions written, e.g. ["720p", "480p"]
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # refreshed by the worker while running
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,18 +1,62 @@
 import os
 import json
+import asyncio
+import numpy as np
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
-from app.db import get_db
-from app.models import Video, VideoSegment
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from app.db import get_db, SessionLocal
+from app.models import ExtractionJob, Video, VideoSegment
+from app.utils.extraction_jobs import (
+    KEYPOINTS_DIR,
+    enqueue_extraction,
+    job_to_dict,
+    resolve_video_path,
+    save_keypoints_to_file,
+)
+from app.utils.joint_angles import (
+    JOINT_ANGLE_NAMES,
+    angle_part_dict,
+    calculate_joint_angles,
+    detect_body_direction,
+    direction_name,
+    is_valid_pose,
+    score_angles,
+)
+from app.utils.keypoints_cache import KeypointsCache
+from app.utils.keypoints_store import (
+    KeypointSequence,
+    encode_keypoints,
+    load_sequence,
+)
+from app.utils.keypoints_track import is_track_file, slice_track
+from app.utils.pose_alignment import DEFAULT_BAND_SECONDS, align_sequences
+from app.utils.pose_features import unpack_visibility, with_derived_features
+from app.utils.pose_scoring import (
+    BODY_PART_NAMES,
+    IMPORTANT_JOINTS,
+    LANDMARK_COUNT,
+    landmarks_to_array,
+    score_pose,
+    score_poses,
+)
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Dict, Any, Literal, Optional
 
 router = APIRouter(prefix="/keypoints", tags=["keypoints"])
 
-# Base directory for keypoints files
-KEYPOINTS_DIR = Path(__file__).parent.parent.parent / "keypoints"
-KEYPOINTS_DIR.mkdir(exist_ok=True)
+# Decoded trainer sequences shared by every request in this process
+keypoints_cache = KeypointsCache.from_env()
+
+# Upper bound on frames accepted by one compare-batch request
+MAX_BATCH_FRAMES = int(os.getenv("KEYPOINTS_MAX_BATCH_FRAMES", 600))
+# Whole-session alignment limits (20 minutes at 30 fps)
+MAX_ALIGN_FRAMES = int(os.getenv("KEYPOINTS_MAX_ALIGN_FRAMES", 36000))
+MAX_BAND_SECONDS = 10.0
+
+# Frames buffered per live comparison socket before the oldest ones are dropped
+STREAM_QUEUE_SIZE = int(os.getenv("KEYPOINTS_STREAM_QUEUE_SIZE", 30))
+WS_CLOSE_NOT_FOUND = 4404
 
 # Pydantic models
 class KeypointsData(BaseModel):
@@ -29,26 +73,10 @@ class KeypointsResponse(BaseModel):
     keypoints_file: str
     message: str
 
-def save_keypoints_to_file(video_id: int, segment_id: int, keypoints_data: List[Dict[str, Any]]) -> str:
-    """
-    Save keypoints data to JSON file
-    Returns: file path relative to keypoints directory
-    """
-    filename = f"video_{video_id}_segment_{segment_id}.json"
-    file_path = KEYPOINTS_DIR / filename
-    
-    # Create directory if it doesn't exist
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Save keypoints to JSON file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(keypoints_data, f, ensure_ascii=False, indent=2)
-    
-    return filename
-
-def load_keypoints_from_file(keypoints_file: str) -> List[Dict[str, Any]]:
+def load_keypoint_sequence(keypoints_file: str, use_mmap: bool = False) -> KeypointSequence:
     """
-    Load keypoints data from JSON file
+    Load keypoints for a segment as arrays (binary or legacy JSON file)
+    use_mmap=True maps binary files read-only instead of reading them into the heap
     """
     file_path = KEYPOINTS_DIR / keypoints_file
     
@@ -59,14 +87,64 @@ def load_keypoints_from_file(keypoints_file: str) -> List[Dict[str, Any]]:
         )
     
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
+        return load_sequence(file_path, use_mmap=use_mmap)
+    except (ValueError, KeyError, json.JSONDecodeError):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to decode keypoints file"
         )
 
+def get_segment_sequence(segment: VideoSegment) -> KeypointSequence:
+    """
+    Load a segment's trainer keypoints through the process-wide cache
+
+    Segments stored in their video's keypoint track are sliced out of the cached track
+    (views, no copy), so they always follow the segment's current start/end times.
+    """
+    file_path = KEYPOINTS_DIR / segment.keypoints_file
+    if is_track_file(segment.keypoints_file):
+        track = keypoints_cache.get(
+            segment.video_id,
+            None,
+            file_path,
+            lambda: with_derived_features(load_keypoint_sequence(segment.keypoints_file, use_mmap=True))
+        )
+        return slice_track(track, segment.start_time, segment.end_time)
+    return keypoints_cache.get(
+        segment.video_id,
+        segment.id,
+        file_path,
+        # Files written before derived features existed get them computed once here
+        lambda: with_derived_features(load_keypoint_sequence(segment.keypoints_file, use_mmap=True))
+    )
+
+def get_segment_with_keypoints(db: Session, video_id: int, segment_id: int) -> VideoSegment:
+    """
+    Fetch a segment and make sure it has a keypoints file (404 otherwise)
+    """
+    segment = db.query(VideoSegment).filter(
+        VideoSegment.id == segment_id,
+        VideoSegment.video_id == video_id
+    ).first()
+    if not segment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Video segment not found"
+        )
+    
+    if not segment.keypoints_file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No keypoints file found for this segment"
+        )
+    return segment
+
+def load_keypoints_from_file(keypoints_file: str) -> List[Dict[str, Any]]:
+    """
+    Load keypoints data in the legacy list-of-frames JSON shape
+    """
+    return load_keypoint_sequence(keypoints_file).to_frames()
+
 @router.post("/videos/{video_id}/segments/{segment_id}/upload", response_model=KeypointsResponse)
 async def upload_keypoints(
     video_id: int,
@@ -97,18 +175,20 @@ async def upload_keypoints(
         )
     
     try:
-        # Convert keypoints_data to dict format for JSON serialization
-        keypoints_data_dict = []
-        for item in keypoints_upload.keypoints_data:
-            if hasattr(item, 'dict'):
-                keypoints_data_dict.append(item.dict())
-            elif isinstance(item, dict):
-                keypoints_data_dict.append(item)
-            else:
-                keypoints_data_dict.append(dict(item))
+        # Convert keypoints_data to dicts lazily; the file is written a chunk of frames at a
+        # time, so frames are put in time order first (stable, like the per-chunk sort)
+        def keypoints_data_dicts():
+            for item in sorted(keypoints_upload.keypoints_data, key=lambda item: item.timestamp):
+                if hasattr(item, 'dict'):
+                    yield item.dict()
+                elif isinstance(item, dict):
+                    yield item
+                else:
+                    yield dict(item)
         
         # Save keypoints to file
-        filename = save_keypoints_to_file(video_id, segment_id, keypoints_data_dict)
+        filename = save_keypoints_to_file(video_id, segment_id, keypoints_data_dicts())
+        keypoints_cache.invalidate(video_id, segment_id)
         
         # Update segment with keypoints file path
         segment.keypoints_file = filename
@@ -132,11 +212,19 @@ async def upload_keypoints(
 async def load_keypoints(
     video_id: int,
     segment_id: int,
+    format: str = "json",
     db: Session = Depends(get_db)
 ):
     """
     Load keypoints for a video segment from file
+    format=json returns the legacy frame list, format=binary returns the raw .kpt bytes
     """
+    if format not in ("json", "binary"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="format must be 'json' or 'binary'"
+        )
+    
     # Check if segment exists
     segment = db.query(VideoSegment).filter(
         VideoSegment.id == segment_id,
@@ -154,8 +242,17 @@ async def load_keypoints(
             detail="No keypoints file found for this segment"
         )
     
-    # Load keypoints from file
-    keypoints_data = load_keypoints_from_file(segment.keypoints_file)
+    # Load keypoints from file (cached)
+    sequence = get_segment_sequence(segment)
+    
+    if format == "binary":
+        return Response(
+            content=encode_keypoints(sequence),
+            media_type="application/octet-stream",
+            headers={"X-Keypoints-File": segment.keypoints_file}
+        )
+    
+    keypoints_data = sequence.to_frames()
     
     return {
         "video_id": video_id,
@@ -201,6 +298,13 @@ async def get_video_segments_keypoints(
         "segments": segments_data
     }
 
+@router.get("/cache/stats")
+async def get_keypoints_cache_stats():
+    """
+    Hit/miss counters and memory usage of the trainer keypoints cache
+    """
+    return keypoints_cache.stats()
+
 @router.delete("/videos/{video_id}/segments/{segment_id}/keypoints")
 async def delete_keypoints(
     video_id: int,
@@ -228,10 +332,18 @@ async def delete_keypoints(
         )
     
     try:
-        # Delete file from disk
+        # Delete file from disk; a track goes only with the last segment using it (videos
+        # with the same content share their track)
         file_path = KEYPOINTS_DIR / segment.keypoints_file
-        if file_path.exists():
+        shared = is_track_file(segment.keypoints_file) and db.query(VideoSegment).filter(
+            VideoSegment.id != segment_id,
+            VideoSegment.keypoints_file == segment.keypoints_file
+        ).first() is not None
+        if file_path.exists() and not shared:
             file_path.unlink()
+        keypoints_cache.invalidate(video_id, segment_id)
+        if is_track_file(segment.keypoints_file) and not shared:
+            keypoints_cache.invalidate(video_id)
         
         # Remove file path from database
         segment.keypoints_file = None
@@ -251,15 +363,26 @@ async def delete_keypoints(
         )
 
 # Comparison models
+# Scoring modes: landmark distance (original) or joint angles (MultiDirectionalPoseComparator)
+SCORING_MODE_DISTANCE = "distance"
+SCORING_MODE_ANGLES = "angles"
+ScoringMode = Literal["distance", "angles"]
+
 class TraineeKeypoints(BaseModel):
     keypoints: List[Dict[str, Any]]
     timestamp: float
+    interpolate: bool = False  # blend the two trainer frames around the timestamp
+    mode: ScoringMode = SCORING_MODE_DISTANCE
 
 class ComparisonResult(BaseModel):
     similarity_score: float
     feedback: str
     timestamp: float
     detailed_scores: Dict[str, float]
+    # Only set in "angles" mode
+    confidence: Optional[float] = None
+    trainer_direction: Optional[str] = None
+    trainee_direction: Optional[str] = None
 
 @router.post("/videos/{video_id}/segments/{segment_id}/compare", response_model=ComparisonResult)
 async def compare_keypoints(
@@ -272,37 +395,27 @@ async def compare_keypoints(
     Compare trainee keypoints with trainer keypoints at specific timestamp
     """
     # Check if segment exists and has keypoints file
-    segment = db.query(VideoSegment).filter(
-        VideoSegment.id == segment_id,
-        VideoSegment.video_id == video_id
-    ).first()
-    if not segment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video segment not found"
-        )
+    segment = get_segment_with_keypoints(db, video_id, segment_id)
     
-    if not segment.keypoints_file:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No keypoints file found for this segment"
-        )
+    # Map trainer keypoints (cached); only the timestamp column and the matched frame are paged in
+    trainer_sequence = get_segment_sequence(segment)
     
-    # Load trainer keypoints from file
-    trainer_keypoints_data = load_keypoints_from_file(segment.keypoints_file)
+    if trainee_keypoints.mode == SCORING_MODE_ANGLES:
+        return compare_frames_batch(
+            trainer_sequence, [trainee_keypoints], trainee_keypoints.interpolate, SCORING_MODE_ANGLES
+        ).results[0]
     
-    # Find the closest timestamp in trainer keypoints
+    # Find the trainer pose at this timestamp via binary search on the timestamp index
     target_timestamp = trainee_keypoints.timestamp
-    closest_frame = None
-    min_time_diff = float('inf')
-    
-    for frame in trainer_keypoints_data:
-        time_diff = abs(frame.get('timestamp', 0) - target_timestamp)
-        if time_diff < min_time_diff:
-            min_time_diff = time_diff
-            closest_frame = frame
+    if trainee_keypoints.interpolate:
+        trainer_landmarks = trainer_sequence.interpolated_landmarks(target_timestamp)
+    else:
+        closest_index = trainer_sequence.closest_frame_index(target_timestamp)
+        trainer_landmarks = None
+        if closest_index is not None and trainer_sequence.pose_detected[closest_index]:
+            trainer_landmarks = trainer_sequence.landmarks[closest_index]
     
-    if not closest_frame or not closest_frame.get('pose_detected', False):
+    if trainer_landmarks is None:
         return ComparisonResult(
             similarity_score=0.0,
             feedback="No trainer pose found at this timestamp",
@@ -311,10 +424,9 @@ async def compare_keypoints(
         )
     
     # Compare poses
-    trainer_pose = closest_frame.get('keypoints', [])
-    trainee_pose = trainee_keypoints.keypoints
+    trainee_pose = landmarks_to_array(trainee_keypoints.keypoints)
     
-    if not trainer_pose or not trainee_pose:
+    if not len(trainer_landmarks) or not len(trainee_pose):
         return ComparisonResult(
             similarity_score=0.0,
             feedback="Invalid pose data",
@@ -322,11 +434,8 @@ async def compare_keypoints(
             detailed_scores={}
         )
     
-    # Calculate overall similarity
-    overall_score = calculate_pose_similarity(trainer_pose, trainee_pose)
-    
-    # Calculate detailed scores for different body parts
-    detailed_scores = calculate_detailed_scores(trainer_pose, trainee_pose)
+    # Overall similarity and per-body-part scores in one vectorized pass
+    overall_score, detailed_scores = score_pose(trainer_landmarks, trainee_pose)
     
     # Generate feedback
     feedback = generate_feedback(overall_score, detailed_scores)
@@ -338,100 +447,411 @@ async def compare_keypoints(
         detailed_scores=detailed_scores
     )
 
-def calculate_pose_similarity(trainer_keypoints: List[Dict], trainee_keypoints: List[Dict]) -> float:
+class TraineeKeypointsBatch(BaseModel):
+    frames: List[TraineeKeypoints]
+    interpolate: bool = False
+    mode: ScoringMode = SCORING_MODE_DISTANCE
+
+class WindowSummary(BaseModel):
+    frames: int
+    scored_frames: int
+    mean_score: float
+    min_score: float
+    max_score: float
+    body_part_averages: Dict[str, float]
+
+class BatchComparisonResult(BaseModel):
+    results: List[ComparisonResult]
+    window: WindowSummary
+
+def summarize_window(results: List[ComparisonResult]) -> WindowSummary:
     """
-    Calculate overall pose similarity score (0-1)
+    Aggregate a window of results; frames that could not be scored (no detailed scores) are skipped
     """
-    import numpy as np
+    scored = [result for result in results if result.detailed_scores]
+    if not scored:
+        return WindowSummary(
+            frames=len(results),
+            scored_frames=0,
+            mean_score=0.0,
+            min_score=0.0,
+            max_score=0.0,
+            body_part_averages={}
+        )
     
-    if len(trainer_keypoints) != len(trainee_keypoints):
-        return 0.0
+    overall_array = np.array([result.similarity_score for result in scored])
+    part_names = list(scored[0].detailed_scores)
+    part_averages = np.array([[result.detailed_scores[name] for name in part_names] for result in scored]).mean(axis=0)
+    return WindowSummary(
+        frames=len(results),
+        scored_frames=len(scored),
+        mean_score=float(overall_array.mean()),
+        min_score=float(overall_array.min()),
+        max_score=float(overall_array.max()),
+        body_part_averages=dict(zip(part_names, part_averages.tolist()))
+    )
+
+def _unscored_result(timestamp: float, feedback: str) -> ComparisonResult:
+    return ComparisonResult(
+        similarity_score=0.0,
+        feedback=feedback,
+        timestamp=timestamp,
+        detailed_scores={}
+    )
+
+def _score_distance(
+    trainer_sequence: KeypointSequence,
+    frames: List[TraineeKeypoints],
+    timestamps: np.ndarray,
+    interpolate: bool
+) -> List[ComparisonResult]:
+    """
+    Landmark-distance scoring (the original compare rules), vectorized over frames
+    """
+    count = len(frames)
+    landmark_count = trainer_sequence.landmark_count
+    if interpolate or not len(trainer_sequence) or "visibility_mask" not in trainer_sequence.features:
+        # Blended poses (and sequences without derived features) are checked from their landmarks
+        trainer_poses, trainer_found = trainer_sequence.poses_at(timestamps, interpolate=interpolate)
+        trainer_visible = None
+    else:
+        # Stored frames: trainer visibility comes from the precomputed mask
+        nearest = trainer_sequence.closest_frame_indices(timestamps)
+        trainer_poses = trainer_sequence.landmarks[nearest]
+        trainer_found = trainer_sequence.pose_detected[nearest]
+        trainer_visible = unpack_visibility(trainer_sequence.features["visibility_mask"][nearest])
     
-    total_similarity = 0.0
-    valid_points = 0
+    # Frames with a full skeleton go through the batched scorer; anything else is
+    # scored one by one with the same rules as the single-frame endpoint
+    trainee_poses = np.zeros((count, landmark_count, 4), dtype=np.float64)
+    full_skeleton = np.zeros(count, dtype=bool)
+    for i, frame in enumerate(frames):
+        if len(frame.keypoints) == landmark_count:
+            trainee_poses[i] = landmarks_to_array(frame.keypoints)
+            full_skeleton[i] = True
     
-    for i, (trainer_point, trainee_point) in enumerate(zip(trainer_keypoints, trainee_keypoints)):
-        # Check visibility threshold
-        trainer_vis = trainer_point.get('visibility', 0)
-        trainee_vis = trainee_point.get('visibility', 0)
-        
-        if trainer_vis > 0.5 and trainee_vis > 0.5:
-            # Calculate normalized distance
-            dx = trainer_point['x'] - trainee_point['x']
-            dy = trainer_point['y'] - trainee_point['y']
-            distance = np.sqrt(dx*dx + dy*dy)
-            
-            # Convert to similarity score (closer = higher score)
-            similarity = max(0, 1 - (distance * 2))  # Scale factor for sensitivity
-            
-            # Weight important joints more (e.g., shoulders, hips, knees)
-            weight = get_joint_weight(i)
-            total_similarity += similarity * weight
-            valid_points += weight
+    overall_scores, part_scores = score_poses(trainer_poses, trainee_poses, trainer_visible)
     
-    return total_similarity / valid_points if valid_points > 0 else 0.0
+    results = []
+    for i, frame in enumerate(frames):
+        if not trainer_found[i]:
+            results.append(_unscored_result(frame.timestamp, "No trainer pose found at this timestamp"))
+            continue
+        if not frame.keypoints:
+            results.append(_unscored_result(frame.timestamp, "Invalid pose data"))
+            continue
+        
+        if full_skeleton[i]:
+            overall_score = float(overall_scores[i])
+            detailed_scores = dict(zip(BODY_PART_NAMES, part_scores[i].tolist()))
+        else:
+            overall_score, detailed_scores = score_pose(trainer_poses[i], landmarks_to_array(frame.keypoints))
+        
+        results.append(ComparisonResult(
+            similarity_score=overall_score,
+            feedback=generate_feedback(overall_score, detailed_scores),
+            timestamp=frame.timestamp,
+            detailed_scores=detailed_scores
+        ))
+    return results
 
-def calculate_detailed_scores(trainer_keypoints: List[Dict], trainee_keypoints: List[Dict]) -> Dict[str, float]:
+def _score_angles(
+    trainer_sequence: KeypointSequence,
+    frames: List[TraineeKeypoints],
+    timestamps: np.ndarray,
+    interpolate: bool
+) -> List[ComparisonResult]:
     """
-    Calculate detailed scores for different body parts
+    Joint-angle scoring (MultiDirectionalPoseComparator rules) against precomputed trainer angles
     """
-    # MediaPipe pose landmark indices
-    body_parts = {
-        "head": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],  # Face and ears
-        "arms": [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22],  # Shoulders, elbows, wrists, hands
-        "torso": [11, 12, 23, 24],  # Shoulders and hips
-        "legs": [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]  # Hips, knees, ankles, feet
-    }
+    count = len(frames)
+    if not len(trainer_sequence) or trainer_sequence.landmark_count < LANDMARK_COUNT:
+        return [_unscored_result(frame.timestamp, "No trainer pose found at this timestamp") for frame in frames]
     
-    detailed_scores = {}
+    # isValidPose applies to both poses, so a detected but barely visible trainer frame
+    # is rejected like on the web client (a non-zero angle_visibility_mask for stored frames)
+    if interpolate:
+        # Blended poses have no stored features, so derive them from the blended landmarks
+        trainer_poses, trainer_found = trainer_sequence.poses_at(timestamps, interpolate=True)
+        trainer_angles = calculate_joint_angles(trainer_poses)
+        trainer_directions = detect_body_direction(trainer_poses)
+        trainer_valid = is_valid_pose(trainer_poses)
+    else:
+        nearest = trainer_sequence.closest_frame_indices(timestamps)
+        trainer_found = trainer_sequence.pose_detected[nearest]
+        trainer_angles = trainer_sequence.features["joint_angles"][nearest]
+        trainer_directions = trainer_sequence.features["body_direction"][nearest]
+        trainer_valid = trainer_sequence.features["angle_visibility_mask"][nearest] != 0
     
-    for part_name, indices in body_parts.items():
-        part_score = 0.0
-        valid_points = 0
-        
-        for idx in indices:
-            if idx < len(trainer_keypoints) and idx < len(trainee_keypoints):
-                trainer_point = trainer_keypoints[idx]
-                trainee_point = trainee_keypoints[idx]
-                
-                trainer_vis = trainer_point.get('visibility', 0)
-                trainee_vis = trainee_point.get('visibility', 0)
-                
-                if trainer_vis > 0.5 and trainee_vis > 0.5:
-                    import numpy as np
-                    dx = trainer_point['x'] - trainee_point['x']
-                    dy = trainer_point['y'] - trainee_point['y']
-                    distance = np.sqrt(dx*dx + dy*dy)
-                    similarity = max(0, 1 - (distance * 2))
-                    
-                    part_score += similarity
-                    valid_points += 1
+    trainee_poses = np.zeros((count, LANDMARK_COUNT, 4), dtype=np.float64)
+    for i, frame in enumerate(frames):
+        if len(frame.keypoints) >= LANDMARK_COUNT:
+            trainee_poses[i] = landmarks_to_array(frame.keypoints[:LANDMARK_COUNT])
+    trainee_valid = is_valid_pose(trainee_poses)
+    
+    accuracy, part_scores, confidence, trainee_directions = score_angles(trainer_angles, trainee_poses)
+    
+    results = []
+    for i, frame in enumerate(frames):
+        if not trainer_found[i]:
+            results.append(_unscored_result(frame.timestamp, "No trainer pose found at this timestamp"))
+            continue
+        if not trainer_valid[i] or not trainee_valid[i]:
+            results.append(_unscored_result(frame.timestamp, "Invalid pose data"))
+            continue
         
-        detailed_scores[part_name] = part_score / valid_points if valid_points > 0 else 0.0
+        overall_score = float(accuracy[i]) / 100
+        detailed_scores = angle_part_dict(part_scores[i])
+        results.append(ComparisonResult(
+            similarity_score=overall_score,
+            feedback=generate_feedback(overall_score, detailed_scores),
+            timestamp=frame.timestamp,
+            detailed_scores=detailed_scores,
+            confidence=float(confidence[i]) / 100,
+            trainer_direction=direction_name(int(trainer_directions[i])),
+            trainee_direction=direction_name(int(trainee_directions[i]))
+        ))
+    return results
+
+def compare_frames_batch(
+    trainer_sequence: KeypointSequence,
+    frames: List[TraineeKeypoints],
+    interpolate: bool = False,
+    mode: ScoringMode = SCORING_MODE_DISTANCE
+) -> BatchComparisonResult:
+    """
+    Score a window of trainee frames against the trainer sequence in one vectorized pass
+    """
+    timestamps = np.array([frame.timestamp for frame in frames], dtype=np.float64)
+    if mode == SCORING_MODE_ANGLES:
+        results = _score_angles(trainer_sequence, frames, timestamps, interpolate)
+    else:
+        results = _score_distance(trainer_sequence, frames, timestamps, interpolate)
     
+    return BatchComparisonResult(results=results, window=summarize_window(results))
+
+@router.post("/videos/{video_id}/segments/{segment_id}/compare-batch", response_model=BatchComparisonResult)
+async def compare_keypoints_batch(
+    video_id: int,
+    segment_id: int,
+    batch: TraineeKeypointsBatch,
+    db: Session = Depends(get_db)
+):
+    """
+    Compare a window of trainee frames (each with its own timestamp) in one request
+    """
+    if len(batch.frames) > MAX_BATCH_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BATCH_FRAMES} frames per batch"
+        )
+    
+    segment = get_segment_with_keypoints(db, video_id, segment_id)
+    trainer_sequence = get_segment_sequence(segment)
+    
+    return compare_frames_batch(trainer_sequence, batch.frames, batch.interpolate, batch.mode)
+
+# Whole-session alignment models
+class TraineeSession(BaseModel):
+    frames: List[TraineeKeypoints]  # the full recording; timestamps on the trainer video clock
+    band_seconds: float = DEFAULT_BAND_SECONDS  # how far a frame may be matched from its timestamp
+
+class AlignmentResult(BaseModel):
+    frames: int
+    scored_frames: int
+    aligned_score: float  # mean similarity after DTW alignment
+    unaligned_score: float  # same frames scored at their own timestamps, for reference
+    body_part_scores: Dict[str, float]
+    tempo_offset: float  # median seconds the trainee is behind (+) or ahead of (-) the trainer
+    feedback: str
+
+def align_session(trainer_sequence: KeypointSequence, session: TraineeSession) -> AlignmentResult:
+    """
+    Align a whole trainee recording to the trainer sequence with banded DTW and score the matches
+    """
+    landmark_count = trainer_sequence.landmark_count
+    recorded = sorted(
+        (frame for frame in session.frames if len(frame.keypoints) == landmark_count),
+        key=lambda frame: frame.timestamp
+    )
+    if not recorded or not trainer_sequence.pose_detected.any():
+        return AlignmentResult(
+            frames=len(session.frames),
+            scored_frames=0,
+            aligned_score=0.0,
+            unaligned_score=0.0,
+            body_part_scores={},
+            tempo_offset=0.0,
+            feedback="Invalid pose data"
+        )
+    
+    trainee_poses = np.stack([landmarks_to_array(frame.keypoints) for frame in recorded])
+    trainee_timestamps = np.array([frame.timestamp for frame in recorded], dtype=np.float64)
+    
+    matches, _ = align_sequences(
+        trainer_sequence.landmarks, trainer_sequence.timestamps,
+        trainee_poses, trainee_timestamps,
+        band_seconds=session.band_seconds
+    )
+    aligned_overall, aligned_parts = score_poses(trainer_sequence.landmarks[matches], trainee_poses)
+    unaligned_poses, _ = trainer_sequence.poses_at(trainee_timestamps)
+    unaligned_overall, _ = score_poses(unaligned_poses, trainee_poses)
+    
+    aligned_score = float(aligned_overall.mean())
+    body_part_scores = dict(zip(BODY_PART_NAMES, aligned_parts.mean(axis=0).tolist()))
+    return AlignmentResult(
+        frames=len(session.frames),
+        scored_frames=len(recorded),
+        aligned_score=aligned_score,
+        unaligned_score=float(unaligned_overall.mean()),
+        body_part_scores=body_part_scores,
+        tempo_offset=float(np.median(trainee_timestamps - trainer_sequence.timestamps[matches])),
+        feedback=generate_feedback(aligned_score, body_part_scores)
+    )
+
+@router.post("/videos/{video_id}/segments/{segment_id}/align", response_model=AlignmentResult)
+async def align_keypoints_session(
+    video_id: int,
+    segment_id: int,
+    session: TraineeSession,
+    db: Session = Depends(get_db)
+):
+    """
+    Score a completed workout: DTW-align the trainee's full recording to the trainer segment
+    """
+    if len(session.frames) > MAX_ALIGN_FRAMES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_ALIGN_FRAMES} frames per session"
+        )
+    if not 0 < session.band_seconds <= MAX_BAND_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"band_seconds must be in (0, {MAX_BAND_SECONDS}]"
+        )
+    
+    segment = get_segment_with_keypoints(db, video_id, segment_id)
+    trainer_sequence = get_segment_sequence(segment)
+    
+    # A long session takes a few hundred ms of NumPy work; keep it off the event loop
+    return await asyncio.to_thread(align_session, trainer_sequence, session)
+
+@router.websocket("/ws/videos/{video_id}/segments/{segment_id}/compare")
+async def compare_keypoints_stream(
+    websocket: WebSocket,
+    video_id: int,
+    segment_id: int,
+    interpolate: bool = False,
+    mode: ScoringMode = SCORING_MODE_DISTANCE
+):
+    """
+    Live comparison channel: one connection per (video, segment) workout session
+
+    Client sends {"keypoints": [...], "timestamp": t} or {"frames": [{...}, ...]}.
+    Server replies {"type": "results", "results": [ComparisonResult, ...], "dropped": n}.
+    If the client sends faster than frames can be scored, the oldest queued frames
+    are dropped (live feedback only cares about the latest pose) and counted in "dropped".
+    """
+    await websocket.accept()
+    
+    # Resolve the segment once and pin its trainer sequence for the whole session
+    db = SessionLocal()
+    try:
+        segment = get_segment_with_keypoints(db, video_id, segment_id)
+        trainer_sequence = get_segment_sequence(segment)
+    except HTTPException as e:
+        await websocket.send_json({"type": "error", "detail": e.detail})
+        await websocket.close(code=WS_CLOSE_NOT_FOUND)
+        return
+    finally:
+        db.close()
+    
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+    dropped = 0
+    
+    async def receive_frames():
+        nonlocal dropped
+        while True:
+            # Parsed here rather than with receive_json so a non-JSON (or binary) frame is
+            # answered like any other bad message instead of ending the session
+            try:
+                message = json.loads(await websocket.receive_text())
+            except KeyError:
+                await websocket.send_json({"type": "error", "detail": "Messages must be JSON text frames"})
+                continue
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": f"Invalid JSON: {e}"})
+                continue
+            raw_frames = message.get("frames", [message]) if isinstance(message, dict) else message
+            if not isinstance(raw_frames, list):
+                await websocket.send_json({
+                    "type": "error",
+                    "detail": "Message must be a frame, a list of frames or {\"frames\": [...]}"
+                })
+                continue
+            for raw in raw_frames:
+                try:
+                    frame = TraineeKeypoints(**raw)
+                except (ValidationError, TypeError) as e:
+                    await websocket.send_json({"type": "error", "detail": f"Invalid frame: {e}"})
+                    continue
+                if queue.full():
+                    queue.get_nowait()
+                    dropped += 1
+                queue.put_nowait(frame)
+    
+    async def score_frames():
+        while True:
+            # Coalesce whatever piled up while the previous reply was being sent
+            frames = [await queue.get()]
+            while not queue.empty() and len(frames) < MAX_BATCH_FRAMES:
+                frames.append(queue.get_nowait())
+            
+            # Off the event loop, so receiving (and other connections) go on while it scores
+            batch = await asyncio.to_thread(compare_frames_batch, trainer_sequence, frames, interpolate, mode)
+            await websocket.send_json({
+                "type": "results",
+                "results": [result.model_dump() for result in batch.results],
+                "dropped": dropped
+            })
+    
+    tasks = [asyncio.create_task(receive_frames()), asyncio.create_task(score_frames())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def calculate_pose_similarity(trainer_keypoints: List[Dict], trainee_keypoints: List[Dict]) -> float:
+    """
+    Calculate overall pose similarity score (0-1)
+    """
+    if len(trainer_keypoints) != len(trainee_keypoints):
+        return 0.0
+    
+    overall, _ = score_pose(landmarks_to_array(trainer_keypoints), landmarks_to_array(trainee_keypoints))
+    return overall
+
+def calculate_detailed_scores(trainer_keypoints: List[Dict], trainee_keypoints: List[Dict]) -> Dict[str, float]:
+    """
+    Calculate detailed scores for different body parts
+    """
+    common = min(len(trainer_keypoints), len(trainee_keypoints))
+    _, detailed_scores = score_pose(
+        landmarks_to_array(trainer_keypoints[:common]),
+        landmarks_to_array(trainee_keypoints[:common])
+    )
     return detailed_scores
 
 def get_joint_weight(joint_index: int) -> float:
     """
     Get weight for specific joint (more important joints have higher weights)
     """
-    # MediaPipe pose landmark indices with weights
-    important_joints = {
-        11: 1.5,  # Left shoulder
-        12: 1.5,  # Right shoulder
-        13: 1.3,  # Left elbow
-        14: 1.3,  # Right elbow
-        15: 1.1,  # Left wrist
-        16: 1.1,  # Right wrist
-        23: 1.5,  # Left hip
-        24: 1.5,  # Right hip
-        25: 1.3,  # Left knee
-        26: 1.3,  # Right knee
-        27: 1.1,  # Left ankle
-        28: 1.1,  # Right ankle
-    }
-    
-    return important_joints.get(joint_index, 1.0)
+    return IMPORTANT_JOINTS.get(joint_index, 1.0)
 
 def generate_feedback(overall_score: float, detailed_scores: Dict[str, float]) -> str:
     """
@@ -465,23 +885,33 @@ def generate_feedback(overall_score: float, detailed_scores: Dict[str, float]) -
     return feedback
 
 # Processing endpoints
+# Extraction runs in separate worker processes (scripts/keypoints_worker.py); these
+# endpoints only queue jobs, so the API stays responsive while videos are processed.
 class ExtractRequest(BaseModel):
     video_id: int
     segment_id: int
+    callback_url: Optional[str] = None  # POSTed the job status when extraction finishes
+    target_fps: Optional[float] = Field(None, gt=0)  # sample the video down to this rate
+    frame_stride: Optional[int] = Field(None, ge=1)  # or process every n-th frame
+
+def check_sampling(target_fps: Optional[float], frame_stride: Optional[int]):
+    if target_fps and frame_stride:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either target_fps or frame_stride, not both"
+        )
 
-@router.post("/extract-segment")
+@router.post("/extract-segment", status_code=status.HTTP_202_ACCEPTED)
 async def extract_segment_keypoints(
     request: ExtractRequest,
     db: Session = Depends(get_db)
 ):
     """
-    Extract keypoints for a specific segment (called from frontend after video upload)
+    Queue keypoint extraction for a specific segment (called from frontend after video upload)
+    Poll GET /keypoints/jobs/{job_id} for progress
     """
+    check_sampling(request.target_fps, request.frame_stride)
     try:
-        # Import here to avoid circular imports
-        from app.utils.keypoints_extractor import KeypointsExtractor
-        from pathlib import Path
-        
         # Check if segment exists
         segment = db.query(VideoSegment).filter(
             VideoSegment.id == request.segment_id,
@@ -501,63 +931,46 @@ async def extract_segment_keypoints(
                 detail="Video not found"
             )
         
-        # Construct video file path
-        # Assuming videos are stored in uploaded_videos directory
-        backend_dir = Path(__file__).parent.parent.parent
-        
-        # Try to get filename from s3_url or use default pattern
-        if video.s3_url:
-            video_filename = video.s3_url.split('/')[-1]
-        else:
-            video_filename = f"video_{video.id}.mp4"
-            
-        video_path = backend_dir / "uploaded_videos" / video_filename
-        
+        # Fail fast instead of queueing a job that cannot run
+        video_path = resolve_video_path(video)
         if not video_path.exists():
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Video file not found: {video_filename}"
+                detail=f"Video file not found: {video_path.name}"
             )
         
-        # Extract keypoints
-        extractor = KeypointsExtractor()
-        keypoints_data = extractor.extract_keypoints_from_video(
-            video_path=str(video_path),
-            start_time=segment.start_time,
-            end_time=segment.end_time
+        job = enqueue_extraction(
+            db, request.video_id, request.segment_id, request.callback_url,
+            target_fps=request.target_fps, frame_stride=request.frame_stride
         )
         
-        # Save keypoints to file
-        filename = save_keypoints_to_file(request.video_id, request.segment_id, keypoints_data)
-        
-        # Update segment with keypoints file path
-        segment.keypoints_file = filename
-        db.commit()
-        
         return {
             "success": True,
-            "video_id": request.video_id,
-            "segment_id": request.segment_id,
-            "keypoints_file": filename,
-            "frames_count": len(keypoints_data),
-            "message": "Keypoints extracted successfully"
+            **job_to_dict(job),
+            "message": "Keypoints extraction queued"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to extract keypoints: {str(e)}"
+            detail=f"Failed to queue keypoints extraction: {str(e)}"
         )
 
-@router.post("/extract-video/{video_id}")
+@router.post("/extract-video/{video_id}", status_code=status.HTTP_202_ACCEPTED)
 async def extract_video_keypoints(
     video_id: int,
+    callback_url: Optional[str] = None,
+    target_fps: Optional[float] = Query(None, gt=0),
+    frame_stride: Optional[int] = Query(None, ge=1),
     db: Session = Depends(get_db)
 ):
     """
-    Extract keypoints for all segments of a video
+    Queue keypoint extraction for all segments of a video (one job per segment)
     """
+    check_sampling(target_fps, frame_stride)
     try:
         # Check if video exists
         video = db.query(Video).filter(Video.id == video_id).first()
@@ -577,51 +990,75 @@ async def extract_video_keypoints(
             )
         
         results = []
-        processed_count = 0
+        queued_count = 0
         
         for segment in segments:
-            try:
-                # Skip if segment already has keypoints
-                if segment.keypoints_file:
-                    results.append({
-                        "segment_id": segment.id,
-                        "status": "skipped",
-                        "message": "Already has keypoints",
-                        "keypoints_file": segment.keypoints_file
-                    })
-                    continue
-                
-                # Extract keypoints for this segment
-                extract_request = ExtractRequest(video_id=video_id, segment_id=segment.id)
-                result = await extract_segment_keypoints(extract_request, db)
-                
+            # Skip if segment already has keypoints
+            if segment.keypoints_file:
                 results.append({
                     "segment_id": segment.id,
-                    "status": "success",
-                    "keypoints_file": result["keypoints_file"],
-                    "frames_count": result["frames_count"]
-                })
-                processed_count += 1
-                
-            except Exception as e:
-                results.append({
-                    "segment_id": segment.id,
-                    "status": "error",
-                    "message": str(e)
+                    "status": "skipped",
+                    "message": "Already has keypoints",
+                    "keypoints_file": segment.keypoints_file
                 })
+                continue
+            
+            job = enqueue_extraction(
+                db, video_id, segment.id, callback_url,
+                target_fps=target_fps, frame_stride=frame_stride
+            )
+            results.append({
+                "segment_id": segment.id,
+                "status": job.status,
+                "job_id": job.id
+            })
+            queued_count += 1
         
         return {
             "success": True,
             "video_id": video_id,
             "total_segments": len(segments),
-            "processed_segments": processed_count,
+            "queued_segments": queued_count,
             "results": results
         }
         
     except HTTPException:
         raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process video keypoints: {str(e)}"
-        )
\ No newline at end of file
+            detail=f"Failed to queue video keypoints: {str(e)}"
+        )
+
+@router.get("/jobs/{job_id}")
+async def get_extraction_job(
+    job_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Status and progress of an extraction job
+    """
+    job = db.query(ExtractionJob).filter(ExtractionJob.id == job_id).first()
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Extraction job not found"
+        )
+    return job_to_dict(job)
+
+@router.get("/videos/{video_id}/jobs")
+async def get_video_extraction_jobs(
+    video_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    All extraction jobs of a video, newest first
+    """
+    jobs = db.query(ExtractionJob).filter(
+        ExtractionJob.video_id == video_id
+    ).order_by(ExtractionJob.id.desc()).all()
+    return {
+        "video_id": video_id,
+        "jobs": [job_to_dict(job) for job in jobs]
+    }
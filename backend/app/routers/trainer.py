@@ -1,17 +1,18 @@
-import subprocess
 import json
-import tempfile
+import logging
+import uuid
 
 from fastapi import APIRouter, Depends, Request, HTTPException, status, Response, File, UploadFile, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from app.db import get_db
-from app.models import Admin, User, TrainerTrainee, Video, VideoSegment, Exercise
+from app.models import Admin, User, TrainerTrainee, Video, VideoSegment, Exercise, ExtractionJob, TranscodeJob, UploadSession
 from app.schemas import TraineeListItem, TraineeProfile
 from app.schemas_video import VideoOut, VideoCreate, VideoUpdate
-import jwt
 import boto3
+from boto3.s3.transfer import TransferConfig
 import os
 import shutil
 from typing import List, Optional
@@ -20,11 +21,26 @@ from fastapi.responses import StreamingResponse, FileResponse, RedirectResponse
 import requests
 from pathlib import Path
 from sqlalchemy import text
+from app.utils.auth import request_user_id
+from app.utils.keypoints_track import track_filename
+from app.utils.transcode_jobs import enqueue_transcode
+from app.utils.transcoding import available_renditions, remove_renditions
+from app.utils.video_upload import lock_content, save_upload, store_upload
+from app.utils.video_metadata import get_video_metadata
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+KEYPOINTS_DIR = Path(__file__).parent.parent.parent / "keypoints"
+# S3 uploads are staged next to the stored videos, under hidden names like store_upload's
+UPLOAD_STAGING_DIR = Path(__file__).parent.parent.parent / "uploaded_videos"
+
+# S3 multipart uploads: 8 MB parts, at most 4 in flight per upload
+S3_TRANSFER_CONFIG = TransferConfig(multipart_chunksize=8 * 1024 * 1024, max_concurrency=4)
+
 
 
 # GET /my-videos: ดึงวิดีโอของ trainer ที่ login อยู่
@@ -40,16 +56,7 @@ async def upload_video(
     description: str = Form(None),
     db: Session = Depends(get_db)
 ):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     # Upload file to S3
     AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -62,37 +69,36 @@ async def upload_video(
         aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
         region_name=AWS_REGION
     )
-    # Read file bytes once for both S3 upload and ffprobe
-    file_bytes = await file.read()
-    s3_key = f"videos/{file.filename}"
-    from io import BytesIO
-    try:
-        s3_client.upload_fileobj(BytesIO(file_bytes), AWS_S3_BUCKET, s3_key, ExtraArgs={"ContentType": file.content_type})
-        s3_url = f"https://{AWS_S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"S3 upload error: {str(e)}")
 
-    # Extract duration (seconds) from uploaded file using ffprobe
-    duration_seconds = None
+    # Stream the upload to a staging file once; ffprobe and the S3 upload both read it from disk
+    staging_path = UPLOAD_STAGING_DIR / f".upload_{uuid.uuid4().hex}{Path(file.filename).suffix}"
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[-1]) as temp_file:
-            temp_file.write(file_bytes)
-            temp_path = temp_file.name
-        def probe_duration(file_path: str) -> float:
-            cmd = [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "json", file_path
-            ]
-            out = subprocess.check_output(cmd)
-            info = json.loads(out)
-            return float(info["format"]["duration"])
-        duration_seconds = int(probe_duration(temp_path))
-        print(f"[DEBUG] duration_seconds from ffprobe: {duration_seconds}")
-        os.remove(temp_path)
-    except Exception as e:
-        print(f"[DEBUG] ffprobe error: {e}")
-        duration_seconds = None  # fallback if error
+        saved = await save_upload(file, staging_path)
+
+        # Extract duration (seconds) from uploaded file using ffprobe (cached by content hash)
+        metadata = await get_video_metadata(saved.path, saved.sha256)
+        duration_seconds = metadata.duration_seconds if metadata else None
+        logger.info(f"Upload {file.filename}: sha256 {saved.sha256}, duration_seconds {duration_seconds}")
+
+        # Objects are keyed by content hash: the same video uploaded again reuses its object
+        s3_key = f"videos/{saved.sha256}{Path(file.filename).suffix.lower()}"
+        s3_url = f"https://{AWS_S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+        stored = db.query(Video).filter(Video.content_hash == saved.sha256, Video.s3_url == s3_url).first()
+        try:
+            if stored:
+                logger.info(f"Same content already in S3 (video {stored.id}), skipping upload")
+            else:
+                # Multipart upload read from disk part by part (memory bounded by S3_TRANSFER_CONFIG)
+                await run_in_threadpool(
+                    s3_client.upload_file,
+                    str(saved.path), AWS_S3_BUCKET, s3_key,
+                    ExtraArgs={"ContentType": file.content_type, "Metadata": {"sha256": saved.sha256}},
+                    Config=S3_TRANSFER_CONFIG
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"S3 upload error: {str(e)}")
+    finally:
+        staging_path.unlink(missing_ok=True)
 
     # สร้าง Video record
     video = Video(
@@ -103,7 +109,8 @@ async def upload_video(
         s3_url=s3_url,
         created_at=datetime.utcnow(),
         approved=False,
-        duration=duration_seconds
+        duration=duration_seconds,
+        content_hash=saved.sha256
     )
     db.add(video)
     db.commit()
@@ -141,16 +148,7 @@ def get_trainer_profile(trainer_id: int, db: Session = Depends(get_db)):
 # Endpoint: GET /my-trainees (trainer ดูรายชื่อลูกเทรนตัวเอง)
 @router.get("/my-trainees", response_model=list[TraineeListItem])
 def get_my_trainees(request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
     # ดึง trainee_id ทั้งหมดที่ trainer_id นี้เชิญ
     trainee_ids = db.query(TrainerTrainee.trainee_id).filter(TrainerTrainee.trainer_id == trainer_id).all()
     trainee_ids = [tid[0] for tid in trainee_ids]
@@ -171,16 +169,7 @@ def get_my_trainees(request: Request, db: Session = Depends(get_db)):
 
 @router.get("/my-videos", response_model=List[VideoOut])
 def get_my_videos(request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     videos = db.query(Video).filter(Video.trainer_id == trainer_id).order_by(Video.created_at.desc()).all()
     
@@ -216,18 +205,7 @@ def get_my_videos(request: Request, db: Session = Depends(get_db)):
 # GET /videos/{video_id}: ดึงข้อมูลวิดีโอแต่ละอัน
 @router.get("/videos/{video_id}")
 def get_video_by_id(video_id: int, request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        user_id = payload.get("user_id")
-    except Exception as e:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    user_id = request_user_id(request)
     
     # ดึงข้อมูลวิดีโอ
     video = db.query(Video).filter(Video.id == video_id).first()
@@ -279,16 +257,7 @@ def get_video_by_id(video_id: int, request: Request, db: Session = Depends(get_d
 # GET /my-trainees: ดึงรายชื่อลูกศิษย์ของเทรนเนอร์
 @router.get("/my-trainees", response_model=List[dict])
 def get_my_trainees(request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     trainees = (
         db.query(User)
@@ -366,18 +335,7 @@ def get_profile_image(user_id: int, db: Session = Depends(get_db)):
 # DELETE /videos/{video_id}: ลบวิดีโอ
 @router.delete("/videos/{video_id}")
 def delete_video(video_id: int, request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        print("[DELETE VIDEO] No or invalid Authorization header")
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception as e:
-        print(f"[DELETE VIDEO] JWT decode error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     print(f"[DELETE VIDEO] video_id={video_id}, trainer_id={trainer_id}")
     video = db.query(Video).filter(Video.id == video_id, Video.trainer_id == trainer_id).first()
@@ -388,8 +346,13 @@ def delete_video(video_id: int, request: Request, db: Session = Depends(get_db))
         print("[DELETE VIDEO] Video not found, returning 404")
         raise HTTPException(status_code=404, detail="Video not found")
 
-    # Remove video file if exists
-    if video.s3_url and video.s3_url.startswith("/static/"):
+    # Remove video file if exists; videos with the same content share one stored file and
+    # keypoint track, removed only with the last video referencing them. The content lock
+    # (held until the commit) keeps a duplicate upload from starting to use them meanwhile.
+    if video.content_hash:
+        lock_content(db, video.content_hash)
+    file_shared = db.query(Video).filter(Video.id != video.id, Video.s3_url == video.s3_url).first() is not None
+    if video.s3_url and video.s3_url.startswith("/static/") and not file_shared:
         filename = video.s3_url.replace("/static/", "")
         file_path = os.path.join("uploaded_videos", filename)
         if os.path.exists(file_path):
@@ -398,11 +361,32 @@ def delete_video(video_id: int, request: Request, db: Session = Depends(get_db))
             except Exception as e:
                 print(f"[DELETE VIDEO] Error removing file: {e}")
                 pass
+    content_shared = video.content_hash and db.query(Video).filter(
+        Video.id != video.id, Video.content_hash == video.content_hash
+    ).first() is not None
+    # A track extracted before the video had a content hash is named after the video only
+    track_names = [track_filename(video.id)]
+    if video.content_hash and not content_shared:
+        track_names.append(track_filename(video.id, video.content_hash))
+    for track_name in track_names:
+        if (KEYPOINTS_DIR / track_name).exists():
+            (KEYPOINTS_DIR / track_name).unlink()
+            print(f"[DELETE VIDEO] Removed keypoint track {track_name}")
+        shutil.rmtree(KEYPOINTS_DIR / "checkpoints" / Path(track_name).stem, ignore_errors=True)
+    if video.content_hash and not content_shared:
+        remove_renditions(video.content_hash)
+        db.query(TranscodeJob).filter(TranscodeJob.content_hash == video.content_hash).delete(synchronize_session=False)
 
     # Step 1: Find all related segments
     segments = db.query(VideoSegment).filter(VideoSegment.video_id == video_id).all()
     print(f"[DELETE VIDEO] Found {len(segments)} segments to delete")
 
+    # Rows referencing the video or its segments
+    db.query(ExtractionJob).filter(ExtractionJob.video_id == video_id).delete(synchronize_session=False)
+    db.query(UploadSession).filter(UploadSession.video_id == video_id).update(
+        {UploadSession.video_id: None}, synchronize_session=False
+    )
+
     # Step 2: Delete all segments using raw SQL (to avoid foreign key constraint)
     if segments:
         segment_ids = [str(segment.id) for segment in segments]
@@ -429,16 +413,7 @@ def get_trainer_videos(trainer_id: int, db: Session = Depends(get_db)):
 @router.delete("/my-trainees/{trainee_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_my_trainee(trainee_id: int, request: Request, db: Session = Depends(get_db)):
     # auth เหมือน /my-trainees
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     # ยืนยันว่าเป็น trainer
     trainer = db.query(User).filter(User.id == trainer_id, User.role == "trainer").first()
@@ -466,6 +441,63 @@ def get_exercises(db: Session = Depends(get_db)):
     return exercises
 
 
+def create_video_with_segments(
+    db: Session,
+    trainer_id: int,
+    title: str,
+    difficulty,
+    description: str,
+    approved: bool,
+    filename: str,
+    duration_seconds: Optional[int],
+    segments_data: List[dict],
+    content_hash: Optional[str] = None
+) -> Video:
+    """
+    Video row for a file in uploaded_videos/ plus its segments (incomplete segments are skipped)
+
+    Only flushed: the caller commits, together with whatever else belongs to the video.
+    """
+    # Create video record
+    db_video = Video(
+        title=title,
+        trainer_id=trainer_id,
+        difficulty=difficulty,
+        description=description,
+        approved=approved,
+        s3_url=f"/static/{filename}",
+        duration=duration_seconds,  # เพิ่ม duration จากไฟล์จริง
+        content_hash=content_hash,
+        created_at=datetime.utcnow()
+    )
+    db.add(db_video)
+    db.flush()  # Get the video ID
+    
+    # Create video segments
+    for segment_data in segments_data:
+        exercise_id = segment_data.get("exercise_id")
+        start_time = segment_data.get("start_time")
+        end_time = segment_data.get("end_time")
+        
+        if not all([exercise_id, start_time is not None, end_time is not None]):
+            continue
+            
+        db_segment = VideoSegment(
+            video_id=db_video.id,
+            exercise_id=int(exercise_id),
+            start_time=float(start_time),
+            end_time=float(end_time)
+        )
+        db.add(db_segment)
+
+    # Normalized streaming renditions are made in the background (scripts/transcode_worker.py)
+    if content_hash:
+        enqueue_transcode(db, content_hash, filename)
+
+    db.flush()
+    return db_video
+
+
 # POST /videos: สร้างวิดีโอใหม่ (multipart/form-data)
 @router.post("/videos", response_model=VideoOut)
 async def create_video(
@@ -479,17 +511,7 @@ async def create_video(
     db: Session = Depends(get_db)
 ):
     # Authentication
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception as e:
-        print(f"[CREATE VIDEO] JWT decode error: {e}")
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     try:
         # Parse segments JSON
@@ -504,76 +526,21 @@ async def create_video(
         upload_dir = Path("uploaded_videos")
         upload_dir.mkdir(exist_ok=True)
 
-        # Generate unique filename
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        file_extension = Path(file.filename).suffix
-        safe_filename = f"{timestamp}_{file.filename.replace(' ', '_')}"
-        file_path = upload_dir / safe_filename
-
-        # Read file bytes once for both file save and ffprobe
-        file_bytes = await file.read()
-        
-        # Save video file
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_bytes)
+        # Stream the upload (constant memory, running SHA-256) and store it under its content
+        # hash; the same video uploaded again shares the stored file
+        saved = await store_upload(file, upload_dir, db)
 
-        print(f"[CREATE VIDEO] Saved video file: {file_path}")
+        print(f"[CREATE VIDEO] Saved video file: {saved.path} ({saved.size} bytes, sha256 {saved.sha256})")
 
-        # Extract duration (seconds) from uploaded file using ffprobe (จากโค้ดเก่า)
-        duration_seconds = None
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                temp_file.write(file_bytes)
-                temp_path = temp_file.name
-            
-            def probe_duration(file_path: str) -> float:
-                cmd = [
-                    "ffprobe", "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "json", file_path
-                ]
-                out = subprocess.check_output(cmd)
-                info = json.loads(out)
-                return float(info["format"]["duration"])
-            
-            duration_seconds = int(probe_duration(temp_path))
-            print(f"[CREATE VIDEO] duration_seconds from ffprobe: {duration_seconds}")
-            os.remove(temp_path)
-        except Exception as e:
-            print(f"[CREATE VIDEO] ffprobe error: {e}")
-            duration_seconds = None  # fallback if error
+        # Extract duration (seconds) using ffprobe on the saved file (cached by content hash)
+        metadata = await get_video_metadata(saved.path, saved.sha256)
+        duration_seconds = metadata.duration_seconds if metadata else None
+        print(f"[CREATE VIDEO] duration_seconds from ffprobe: {duration_seconds}")
         
-        # Create video record
-        db_video = Video(
-            title=title,
-            trainer_id=trainer_id,
-            difficulty=difficulty,
-            description=description,
-            approved=approved,
-            s3_url=f"/static/{safe_filename}",
-            duration=duration_seconds,  # เพิ่ม duration จากไฟล์จริง
-            created_at=datetime.utcnow()
+        db_video = create_video_with_segments(
+            db, trainer_id, title, difficulty, description, approved,
+            saved.path.name, duration_seconds, segments_data, saved.sha256
         )
-        db.add(db_video)
-        db.flush()  # Get the video ID
-        
-        # Create video segments
-        for segment_data in segments_data:
-            exercise_id = segment_data.get("exercise_id")
-            start_time = segment_data.get("start_time")
-            end_time = segment_data.get("end_time")
-            
-            if not all([exercise_id, start_time is not None, end_time is not None]):
-                continue
-                
-            db_segment = VideoSegment(
-                video_id=db_video.id,
-                exercise_id=int(exercise_id),
-                start_time=float(start_time),
-                end_time=float(end_time)
-            )
-            db.add(db_segment)
-
         db.commit()
         db.refresh(db_video)
         
@@ -589,23 +556,38 @@ async def create_video(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+# GET /videos/{video_id}/renditions: ไฟล์วิดีโอที่ transcode แล้ว (H.264 480p/720p) สำหรับเล่น
+@router.get("/videos/{video_id}/renditions")
+def get_video_renditions(video_id: int, db: Session = Depends(get_db)):
+    video = db.query(Video).filter(Video.id == video_id).first()
+    if not video:
+        raise HTTPException(status_code=404, detail="Video not found")
+
+    job = None
+    if video.content_hash:
+        job = db.query(TranscodeJob).filter(
+            TranscodeJob.content_hash == video.content_hash
+        ).order_by(TranscodeJob.id.desc()).first()
+    return {
+        "video_id": video.id,
+        "original": video.s3_url,
+        "transcode_status": job.status if job else None,
+        # Highest first; empty until transcoding has finished
+        "renditions": {
+            name: f"/renditions/{video.content_hash}/{name}.mp4"
+            for name in available_renditions(video.content_hash)
+        }
+    }
+
+
 # PUT /videos/{video_id}/update-duration: อัปเดต duration จากไฟล์จริง
 @router.put("/videos/{video_id}/update-duration")
-def update_video_duration_endpoint(video_id: int, request: Request, db: Session = Depends(get_db)):
+async def update_video_duration_endpoint(video_id: int, request: Request, db: Session = Depends(get_db)):
     """อัปเดต duration ของวิดีโอจากไฟล์จริง"""
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     from app.utils.video_utils import update_video_duration
-    success = update_video_duration(video_id, db)
+    success = await update_video_duration(video_id, db)
     
     if success:
         return {"detail": "Duration updated successfully"}
@@ -616,16 +598,7 @@ def update_video_duration_endpoint(video_id: int, request: Request, db: Session
 # POST /videos/simple: สร้างวิดีโอใหม่ (JSON body - for testing)
 @router.post("/videos/simple", response_model=VideoOut)
 def create_video_simple(video: VideoCreate, request: Request, db: Session = Depends(get_db)):
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    token = auth_header.split(" ")[1]
-    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        trainer_id = payload.get("user_id")
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    trainer_id = request_user_id(request)
 
     # สร้างวิดีโอใหม่
     db_video = Video(
@@ -0,0 +1,310 @@
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.models import UploadSession, Video
+from app.routers.trainer import create_video_with_segments
+from app.schemas_video import VideoOut
+from app.utils.auth import request_user_id
+from app.utils.video_upload import ChunkedUpload, content_path, lock_content, place_by_content
+from app.utils.video_metadata import file_sha256, get_video_metadata
+
+# Resumable trainer video uploads.
+#
+# POST /uploads opens a session, the client PUTs the file as numbered chunks of chunk_size
+# bytes (any order, in parallel, retried as often as needed), GET /uploads/{id} reports
+# which chunks arrived, and POST /uploads/{id}/complete turns the assembled file into a
+# Video row with its segments, like POST /videos does for a single-request upload.
+#
+# A session expires UPLOAD_SESSION_TTL_HOURS after its last chunk; sweep_expired_uploads
+# (run periodically by main.py) deletes expired sessions and their partial files.
+
+router = APIRouter(prefix="/uploads", tags=["uploads"])
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+# Same filesystem as uploaded_videos/, so storing a completed upload is a rename
+UPLOAD_SESSIONS_DIR = BACKEND_DIR / "upload_sessions"
+UPLOADED_VIDEOS_DIR = BACKEND_DIR / "uploaded_videos"
+
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+MIN_CHUNK_BYTES = 256 * 1024
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024 * 1024))
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24))
+
+SESSION_OPEN = "open"
+SESSION_COMPLETED = "completed"
+
+
+class UploadCreate(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    total_size: int = Field(gt=0, le=MAX_UPLOAD_BYTES)
+    chunk_size: int = Field(DEFAULT_CHUNK_BYTES, ge=MIN_CHUNK_BYTES, le=MAX_CHUNK_BYTES)
+
+
+class UploadComplete(BaseModel):
+    title: str
+    difficulty: int
+    description: str
+    approved: bool = False
+    segments: List[dict] = []
+
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    status: str
+    total_size: int
+    chunk_size: int
+    chunk_count: int
+    received_chunks: List[int]
+    received_ranges: List[List[int]]  # [start, end) byte ranges
+    missing_chunks: List[int]
+    video_id: Optional[int] = None
+
+
+def _get_session(db: Session, upload_id: str, trainer_id: int) -> UploadSession:
+    session = db.query(UploadSession).filter(
+        UploadSession.id == upload_id,
+        UploadSession.trainer_id == trainer_id
+    ).first()
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return session
+
+
+def _expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+
+
+def _is_expired(session: UploadSession) -> bool:
+    expires_at = session.expires_at
+    if expires_at is None:
+        return False
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at < datetime.now(timezone.utc)
+
+
+def _check_open(session: UploadSession):
+    if session.status != SESSION_OPEN:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+    if _is_expired(session):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload expired")
+
+
+def _chunked(session: UploadSession) -> ChunkedUpload:
+    return ChunkedUpload(UPLOAD_SESSIONS_DIR, session.id, session.total_size, session.chunk_size)
+
+
+def _discard_files(db: Session, session: UploadSession):
+    """
+    Delete the received data of an open session
+
+    A file the session already moved into uploaded_videos/ (completion failed and was never
+    retried) is deleted as well, unless a video uses that content.
+    """
+    _chunked(session).discard()
+    if not session.content_hash:
+        return
+    lock_content(db, session.content_hash)
+    stored_path = content_path(UPLOADED_VIDEOS_DIR, session.content_hash, session.filename)
+    in_use = db.query(Video.id).filter(or_(
+        Video.content_hash == session.content_hash,
+        Video.s3_url == f"/static/{stored_path.name}"
+    )).first()
+    if not in_use:
+        stored_path.unlink(missing_ok=True)
+
+
+def _status(session: UploadSession) -> UploadStatus:
+    upload = _chunked(session)
+    completed = session.status == SESSION_COMPLETED
+    return UploadStatus(
+        upload_id=session.id,
+        filename=session.filename,
+        status=session.status,
+        total_size=session.total_size,
+        chunk_size=session.chunk_size,
+        chunk_count=upload.chunk_count,
+        received_chunks=list(range(upload.chunk_count)) if completed else upload.received_chunks(),
+        received_ranges=[[0, session.total_size]] if completed else [list(r) for r in upload.received_ranges()],
+        missing_chunks=[] if completed else upload.missing_chunks(),
+        video_id=session.video_id
+    )
+
+
+@router.post("", response_model=UploadStatus, status_code=status.HTTP_201_CREATED)
+def create_upload(upload: UploadCreate, request: Request, db: Session = Depends(get_db)):
+    """
+    เริ่ม upload session ใหม่
+    """
+    trainer_id = request_user_id(request)
+    if upload.content_type and not upload.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video")
+
+    session = UploadSession(
+        id=secrets.token_hex(16),
+        trainer_id=trainer_id,
+        filename=Path(upload.filename).name,
+        content_type=upload.content_type,
+        total_size=upload.total_size,
+        chunk_size=upload.chunk_size,
+        status=SESSION_OPEN,
+        expires_at=_expiry()
+    )
+    _chunked(session).create()
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return _status(session)
+
+
+@router.put("/{upload_id}/chunks/{index}", response_model=UploadStatus)
+async def put_chunk(upload_id: str, index: int, request: Request, db: Session = Depends(get_db)):
+    """
+    รับ chunk ที่ index (request body คือข้อมูลดิบของ chunk) ส่งซ้ำได้
+    """
+    session = _get_session(db, upload_id, request_user_id(request))
+    _check_open(session)
+
+    upload = _chunked(session)
+    if not upload.exists():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload data no longer available")
+    try:
+        # The body goes to disk block by block as it arrives
+        await upload.write_chunk(index, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # An upload that is still making progress does not expire
+    session.expires_at = _expiry()
+    db.commit()
+    return _status(session)
+
+
+@router.get("/{upload_id}", response_model=UploadStatus)
+def get_upload(upload_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    สถานะของ upload: chunk ที่ได้รับแล้วและที่ยังขาด
+    """
+    return _status(_get_session(db, upload_id, request_user_id(request)))
+
+
+@router.post("/{upload_id}/complete", response_model=VideoOut)
+async def complete_upload(upload_id: str, details: UploadComplete, request: Request, db: Session = Depends(get_db)):
+    """
+    รวมไฟล์ที่อัปโหลดครบแล้วเป็นวิดีโอใหม่พร้อม segments
+    """
+    trainer_id = request_user_id(request)
+    session = _get_session(db, upload_id, trainer_id)
+    if session.status == SESSION_COMPLETED:
+        # Completing twice (e.g. a retried request) returns the same video
+        video = db.query(Video).filter(Video.id == session.video_id).first()
+        if not video:
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Video of this upload was deleted")
+        return video
+    _check_open(session)
+
+    upload = _chunked(session)
+    missing = upload.missing_chunks()
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload incomplete: {len(missing)} chunks missing (first {missing[0]})"
+        )
+
+    # Chunks arrive out of order, so the content hash is computed once the file is whole.
+    # It is saved before the file is moved, so a retry after a failure below still knows
+    # where the file went.
+    if session.content_hash is None:
+        if not upload.exists():
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload data no longer available")
+        session.content_hash = await run_in_threadpool(file_sha256, upload.data_path)
+        db.commit()
+
+    # Held until the commit below, so deleting another video with this content cannot
+    # remove the stored file between here and the new video referencing it
+    lock_content(db, session.content_hash)
+    if upload.exists():
+        # Same content already stored: this copy is dropped and the new video shares that file
+        stored_path = await run_in_threadpool(
+            place_by_content, upload.data_path, session.content_hash, UPLOADED_VIDEOS_DIR, session.filename
+        )
+        logger.info(f"Stored {session.total_size} bytes as {stored_path.name}")
+    else:
+        # Moved by an earlier attempt that failed before committing
+        stored_path = content_path(UPLOADED_VIDEOS_DIR, session.content_hash, session.filename)
+        if not stored_path.exists():
+            raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload data no longer available")
+
+    # Row lock until the commit below: of two concurrent attempts only one creates the video
+    db.refresh(session, with_for_update=True)
+    if session.status == SESSION_COMPLETED:
+        db.commit()
+        return db.query(Video).filter(Video.id == session.video_id).first()
+
+    try:
+        metadata = await get_video_metadata(stored_path, session.content_hash)
+        duration_seconds = metadata.duration_seconds if metadata else None
+        # The video, its segments and the completed session are committed together
+        video = create_video_with_segments(
+            db, trainer_id, details.title, details.difficulty, details.description, details.approved,
+            stored_path.name, duration_seconds, details.segments, session.content_hash
+        )
+        session.status = SESSION_COMPLETED
+        session.completed_at = datetime.now(timezone.utc)
+        session.video_id = video.id
+        db.commit()
+    except Exception as e:
+        logger.exception(f"Error completing upload {upload_id}: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Internal server error")
+    db.refresh(video)
+    upload.discard()
+    return video
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def abort_upload(upload_id: str, request: Request, db: Session = Depends(get_db)):
+    """
+    ยกเลิก upload ที่ยังไม่เสร็จและลบข้อมูลที่ได้รับแล้ว
+    """
+    session = _get_session(db, upload_id, request_user_id(request))
+    if session.status == SESSION_COMPLETED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload already completed")
+    _discard_files(db, session)
+    db.delete(session)
+    db.commit()
+
+
+def sweep_expired_uploads(db: Session) -> int:
+    """
+    Delete open sessions past their expiry with their partial files; returns how many
+    """
+    expired = db.query(UploadSession).filter(
+        UploadSession.status == SESSION_OPEN,
+        UploadSession.expires_at < datetime.now(timezone.utc)
+    ).all()
+    for session in expired:
+        _discard_files(db, session)
+        db.delete(session)
+    db.commit()
+    if expired:
+        logger.info(f"Removed {len(expired)} expired upload sessions")
+    return len(expired)
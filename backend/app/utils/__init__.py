@@ -2,5 +2,19 @@
 from . import email_sender
 from . import video_utils
 from . import keypoints_extractor
+from . import keypoints_store
+from . import keypoints_cache
+from . import keypoints_track
+from . import pose_scoring
+from . import joint_angles
+from . import pose_features
+from . import pose_alignment
+from . import parallel_extraction
+from . import extraction_checkpoint
+from . import video_upload
+from . import video_metadata
+from . import transcoding
 
-__all__ = ['email_sender', 'video_utils', 'keypoints_extractor']
\ No newline at end of file
+# extraction_jobs and transcode_jobs are imported directly: they need app.models and therefore a database
+
+__all__ = ['email_sender', 'video_utils', 'keypoints_extractor', 'keypoints_store', 'keypoints_cache', 'keypoints_track', 'pose_scoring', 'joint_angles', 'pose_features', 'pose_alignment', 'parallel_extraction', 'extraction_checkpoint', 'video_upload', 'video_metadata', 'transcoding']
\ No newline at end of file
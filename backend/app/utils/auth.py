@@ -0,0 +1,24 @@
+import os
+
+import jwt
+from fastapi import HTTPException, Request
+
+# Bearer-token parsing shared by the trainer routers, so every endpoint reads the same
+# secret and answers a missing or bad token the same way. JWT_SECRET is read per request,
+# as the routers did, so it still picks up values load_dotenv sets after this import.
+
+
+def request_user_id(request: Request) -> int:
+    """
+    user_id from the request's "Authorization: Bearer <jwt>" header; 401 when it is missing or invalid
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    token = auth_header.split(" ")[1]
+    JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret")
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload.get("user_id")
@@ -0,0 +1,78 @@
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.utils.keypoints_store import FILE_SUFFIX, KeypointSequence, read_keypoints, write_keypoints
+
+# On-disk checkpoints of an extraction in progress.
+#
+# While a video is extracted, the extractor hands over the rows inferred since the last
+# checkpoint (every CHECKPOINT_EVERY_FRAMES frames, or per finished chunk in the process
+# pool); each batch becomes one small part file, so checkpointing stays O(new rows) however
+# long the video is. Part meta carries "next_frame": every wanted frame before it is in the
+# parts written so far. A retried job with the same plan (frame ranges + sampling) loads
+# the parts (memory-mapped) and resumes from there; any other plan discards them.
+
+logger = logging.getLogger(__name__)
+
+PLAN_FILE = "plan.json"
+
+
+class ExtractionCheckpoint:
+    """
+    Part files of one extraction plan in a directory of their own
+    """
+
+    def __init__(self, directory: Path, plan: Dict[str, Any]):
+        self.directory = Path(directory)
+        # Round-trip through JSON so tuples and lists compare equal
+        self.plan = json.loads(json.dumps(plan))
+        self.parts = 0
+
+    def _part_path(self, index: int) -> Path:
+        return self.directory / f"part_{index:05d}{FILE_SUFFIX}"
+
+    def load(self) -> List[KeypointSequence]:
+        """
+        Parts saved by an earlier attempt of the same plan, in frame order (the last one's
+        meta "next_frame" says where to resume); empty if there are none
+
+        Parts are memory-mapped, so resuming does not read everything extracted so far.
+        """
+        plan_path = self.directory / PLAN_FILE
+        try:
+            saved_plan = json.loads(plan_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            saved_plan = None
+        if saved_plan != self.plan:
+            self.clear()
+            return []
+
+        parts = []
+        while self._part_path(len(parts)).exists():
+            try:
+                parts.append(read_keypoints(self._part_path(len(parts)), use_mmap=True))
+            except (ValueError, KeyError):
+                # A part cut short by a crash; everything before it is still good
+                break
+        self.parts = len(parts)
+        if parts:
+            frames = sum(len(part) for part in parts)
+            logger.info(f"Resuming from checkpoint {self.directory.name}: {frames} frames, next frame {parts[-1].meta['next_frame']}")
+        return parts
+
+    def save_part(self, part: KeypointSequence):
+        """
+        Persist the rows extracted since the previous part
+        """
+        if self.parts == 0:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            (self.directory / PLAN_FILE).write_text(json.dumps(self.plan))
+        write_keypoints(self._part_path(self.parts), part)
+        self.parts += 1
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.parts = 0
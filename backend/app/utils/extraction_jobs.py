@@ -0,0 +1,504 @@
+import logging
+import os
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models import ExtractionJob, Video, VideoSegment
+from app.utils.extraction_checkpoint import ExtractionCheckpoint
+from app.utils.keypoints_extractor import STREAM_CHUNK_FRAMES
+from app.utils.keypoints_store import FILE_SUFFIX, KeypointsFileWriter, KeypointSequence, write_keypoints
+from app.utils.keypoints_track import (
+    covered_ranges,
+    frame_range,
+    is_covered,
+    load_track,
+    merge_ranges,
+    range_times,
+    slice_track,
+    subtract_ranges,
+    track_filename,
+    track_sampling,
+    write_track,
+)
+from app.utils.pose_features import with_derived_features
+from app.utils.transcoding import extraction_source, is_rendition
+from app.utils.video_metadata import file_sha256, get_video_metadata_sync
+from app.utils.video_upload import lock_content
+
+# Keypoint extraction as a persistent job queue.
+#
+# The API only inserts rows into extraction_jobs; scripts/keypoints_worker.py processes
+# run separately, claim queued rows with SELECT ... FOR UPDATE SKIP LOCKED (so any number
+# of workers can share the table) and report progress back into the row. A worker that
+# dies mid-job stops refreshing heartbeat_at, and its job is re-queued once it goes stale.
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# A running job whose heartbeat is older than this is assumed to belong to a dead worker
+STALE_JOB_SECONDS = int(os.getenv("KEYPOINTS_JOB_STALE_SECONDS", 300))
+# Re-queued at most this many times before being marked failed
+MAX_JOB_ATTEMPTS = int(os.getenv("KEYPOINTS_JOB_MAX_ATTEMPTS", 3))
+# Minimum time between progress writes to the database
+PROGRESS_INTERVAL_SECONDS = 2.0
+# Frame rates closer than this are the same file's rate probed two ways
+TIMING_FPS_TOLERANCE = 1e-3
+# Rate trainer videos are sampled at when a request does not ask for one (unset = every frame)
+DEFAULT_TARGET_FPS = float(os.getenv("KEYPOINTS_TARGET_FPS", 0)) or None
+CALLBACK_TIMEOUT_SECONDS = 10
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+KEYPOINTS_DIR = BACKEND_DIR / "keypoints"
+KEYPOINTS_DIR.mkdir(exist_ok=True)
+# Partial results of interrupted extractions, one directory per video
+CHECKPOINTS_DIR = KEYPOINTS_DIR / "checkpoints"
+UPLOADED_VIDEOS_DIR = BACKEND_DIR / "uploaded_videos"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def save_sequence_to_file(video_id: int, segment_id: int, sequence: KeypointSequence) -> str:
+    """
+    Write a segment's keypoints (with derived features) to its binary keypoints file
+    Returns: file path relative to keypoints directory
+    """
+    filename = f"video_{video_id}_segment_{segment_id}{FILE_SUFFIX}"
+    write_keypoints(KEYPOINTS_DIR / filename, with_derived_features(sequence))
+    return filename
+
+
+def stream_sequence_to_file(video_id: int, segment_id: int, chunks: Iterable[KeypointSequence]) -> str:
+    """
+    Write a segment's keypoints chunk by chunk (derived features added per chunk), so memory
+    use does not grow with the segment's length, e.g. from KeypointsExtractor.iter_sequence
+    Returns: file path relative to keypoints directory
+    """
+    filename = f"video_{video_id}_segment_{segment_id}{FILE_SUFFIX}"
+    with KeypointsFileWriter(KEYPOINTS_DIR / filename) as writer:
+        for chunk in chunks:
+            writer.append(with_derived_features(chunk))
+    return filename
+
+
+def save_keypoints_to_file(video_id: int, segment_id: int, keypoints_data: Iterable[Dict[str, Any]]) -> str:
+    """
+    Save keypoints data (frame dicts in time order, any iterable) to a binary keypoints file
+    Raises ValueError when the frames are not in time order
+    Returns: file path relative to keypoints directory
+    """
+    def chunks():
+        frames = iter(keypoints_data)
+        first_index = 0
+        while True:
+            chunk = list(islice(frames, STREAM_CHUNK_FRAMES))
+            if not chunk:
+                return
+            yield KeypointSequence.from_frames(chunk, first_index=first_index)
+            first_index += len(chunk)
+
+    # Pack frames into fixed-shape arrays a chunk at a time, precompute the trainer's derived
+    # features and write atomically
+    return stream_sequence_to_file(video_id, segment_id, chunks())
+
+
+def resolve_video_path(video: Video) -> Path:
+    """
+    Local file to extract a video from: its normalized rendition once transcoded (short
+    GOPs, fast exact seeks), else the upload (named after the last part of s3_url, or
+    video_<id>.mp4)
+    """
+    rendition = extraction_source(video.content_hash)
+    if rendition is not None:
+        return rendition
+    if video.s3_url:
+        video_filename = video.s3_url.split('/')[-1]
+    else:
+        video_filename = f"video_{video.id}.mp4"
+    return UPLOADED_VIDEOS_DIR / video_filename
+
+
+def job_to_dict(job: ExtractionJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "video_id": job.video_id,
+        "segment_id": job.segment_id,
+        "status": job.status,
+        "progress": job.progress,
+        "frames_done": job.frames_done,
+        "frames_total": job.frames_total,
+        "attempts": job.attempts,
+        "target_fps": job.target_fps,
+        "frame_stride": job.frame_stride,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def enqueue_extraction(
+    db: Session,
+    video_id: int,
+    segment_id: int,
+    callback_url: Optional[str] = None,
+    target_fps: Optional[float] = None,
+    frame_stride: Optional[int] = None
+) -> ExtractionJob:
+    """
+    Queue extraction for a segment; an already queued/running job for it is returned instead
+
+    Without target_fps or frame_stride the segment is sampled at DEFAULT_TARGET_FPS.
+    """
+    job = db.query(ExtractionJob).filter(
+        ExtractionJob.segment_id == segment_id,
+        ExtractionJob.status.in_(ACTIVE_STATUSES)
+    ).first()
+    if job:
+        return job
+
+    job = ExtractionJob(
+        video_id=video_id,
+        segment_id=segment_id,
+        status=JOB_QUEUED,
+        progress=0.0,
+        frames_done=0,
+        attempts=0,
+        callback_url=callback_url,
+        target_fps=target_fps if target_fps or frame_stride else DEFAULT_TARGET_FPS,
+        frame_stride=frame_stride
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """
+    Put running jobs of dead workers back in the queue (or fail them after MAX_JOB_ATTEMPTS)
+    """
+    threshold = _now() - timedelta(seconds=STALE_JOB_SECONDS)
+    stale = db.query(ExtractionJob).filter(
+        ExtractionJob.status == JOB_RUNNING,
+        ExtractionJob.heartbeat_at < threshold
+    ).with_for_update(skip_locked=True).all()
+
+    for job in stale:
+        logger.warning(f"Extraction job {job.id} on {job.worker_id} went stale")
+        if job.attempts >= MAX_JOB_ATTEMPTS:
+            job.status = JOB_FAILED
+            job.error = f"Worker stopped responding ({job.attempts} attempts)"
+            job.finished_at = _now()
+        else:
+            job.status = JOB_QUEUED
+            job.worker_id = None
+    db.commit()
+    return len(stale)
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[ExtractionJob]:
+    """
+    Atomically take the oldest queued job; concurrent workers skip rows another one locked
+    """
+    jobs = claim_video_jobs(db, worker_id, limit=1)
+    return jobs[0] if jobs else None
+
+
+def claim_video_jobs(db: Session, worker_id: str, limit: int) -> List[ExtractionJob]:
+    """
+    Claim the oldest queued job plus up to limit - 1 more queued jobs of the same video and
+    sampling, so they can be extracted together
+    """
+    # A video's track is rewritten by whoever extracts it, so one worker per video at a
+    # time; videos with the same content share their track, so they count as busy too
+    running = db.query(ExtractionJob.video_id).filter(ExtractionJob.status == JOB_RUNNING)
+    busy_hashes = db.query(Video.content_hash).filter(Video.id.in_(running), Video.content_hash.isnot(None))
+    busy_videos = db.query(Video.id).filter(or_(Video.id.in_(running), Video.content_hash.in_(busy_hashes)))
+    first = db.query(ExtractionJob).filter(
+        ExtractionJob.status == JOB_QUEUED,
+        ExtractionJob.video_id.notin_(busy_videos)
+    ).order_by(ExtractionJob.id).with_for_update(skip_locked=True).first()
+    if not first:
+        db.commit()
+        return []
+
+    # The check above only sees jobs other claimers have committed, so two of them can both
+    # pass it for the same video, or for two videos sharing a track. Locking the content
+    # hash and the video row queues them up here (held until the commit below); once both
+    # are ours the check is repeated and sees what the other committed.
+    content_hash = db.query(Video.content_hash).filter(Video.id == first.video_id).scalar()
+    same_content = Video.id == first.video_id
+    if content_hash:
+        lock_content(db, content_hash)
+        same_content = or_(same_content, Video.content_hash == content_hash)
+    db.query(Video.id).filter(Video.id == first.video_id).with_for_update().first()
+    if db.query(ExtractionJob.id).filter(
+        ExtractionJob.video_id.in_(db.query(Video.id).filter(same_content)),
+        ExtractionJob.status == JOB_RUNNING
+    ).first():
+        db.commit()
+        return []
+
+    # Same sampling only: the track is extracted at one rate
+    jobs = [first] + db.query(ExtractionJob).filter(
+        ExtractionJob.status == JOB_QUEUED,
+        ExtractionJob.video_id == first.video_id,
+        ExtractionJob.id != first.id,
+        # == None renders as IS NULL
+        ExtractionJob.target_fps == first.target_fps,
+        ExtractionJob.frame_stride == first.frame_stride
+    ).order_by(ExtractionJob.id).limit(max(0, limit - 1)).with_for_update(skip_locked=True).all()
+
+    started_at = _now()
+    for job in jobs:
+        job.status = JOB_RUNNING
+        job.worker_id = worker_id
+        job.attempts += 1
+        job.started_at = started_at
+        job.heartbeat_at = started_at
+        job.error = None
+    db.commit()
+    return jobs
+
+
+def send_callback(job: ExtractionJob) -> None:
+    """
+    POST the final job status to its callback URL (best effort)
+    """
+    if not job.callback_url:
+        return
+    try:
+        response = requests.post(job.callback_url, json=job_to_dict(job), timeout=CALLBACK_TIMEOUT_SECONDS)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.error(f"Callback for extraction job {job.id} failed: {e}")
+
+
+def _job_target(db: Session, job: ExtractionJob):
+    """
+    (segment, local video path) of a job; raises if either is gone
+    """
+    segment = db.query(VideoSegment).filter(
+        VideoSegment.id == job.segment_id,
+        VideoSegment.video_id == job.video_id
+    ).first()
+    if not segment:
+        raise ValueError("Video segment not found")
+    video = db.query(Video).filter(Video.id == job.video_id).first()
+    if not video:
+        raise ValueError("Video not found")
+
+    video_path = resolve_video_path(video)
+    if not video_path.exists():
+        raise FileNotFoundError(f"Video file not found: {video_path.name}")
+    return segment, video_path
+
+
+def _track_filename(video: Video, video_path: Path) -> str:
+    """
+    Track file of a video, shared by every video with the same content hash; a video
+    extracted before it had a hash keeps its video_<id> track
+    """
+    if not video.content_hash:
+        if (KEYPOINTS_DIR / track_filename(video.id)).exists():
+            return track_filename(video.id)
+        # Older uploads: hash once, committed with the jobs' outcome
+        video.content_hash = file_sha256(video_path)
+    shared = track_filename(video.id, video.content_hash)
+    if not (KEYPOINTS_DIR / shared).exists() and (KEYPOINTS_DIR / track_filename(video.id)).exists():
+        return track_filename(video.id)
+    return shared
+
+
+def _video_timing(video_path: Path, content_hash: Optional[str], extractor):
+    """
+    (fps, frame count) of the file that is decoded: the metadata cached for the upload's
+    content hash (usually probed at upload), else from the extractor. A rendition is a
+    different file from the one the hash describes, so it is always read by the extractor.
+    """
+    if not is_rendition(video_path):
+        metadata = get_video_metadata_sync(video_path, content_hash)
+        if metadata is not None and metadata.fps and metadata.frame_count:
+            return metadata.fps, metadata.frame_count
+    return extractor.video_timing(str(video_path))
+
+
+def _same_timing(track, fps: float, frame_count: int) -> bool:
+    return abs(track.meta["fps"] - fps) < TIMING_FPS_TOLERANCE and track.meta["frame_count"] == frame_count
+
+
+def _progress_reporter(db: Session):
+    """
+    Progress callback factory: writes frames done/total (and the heartbeat) to a job row,
+    at most every PROGRESS_INTERVAL_SECONDS except for the final update
+    """
+    last_report: Dict[int, float] = {}
+
+    def report_progress(job: ExtractionJob, frames_done: int, frames_total: int):
+        now = _now()
+        if frames_done < frames_total and now.timestamp() - last_report.get(job.id, 0.0) < PROGRESS_INTERVAL_SECONDS:
+            return
+        last_report[job.id] = now.timestamp()
+        job.frames_done = frames_done
+        job.frames_total = frames_total
+        job.progress = min(1.0, frames_done / frames_total) if frames_total else 0.0
+        job.heartbeat_at = now
+        db.commit()
+
+    return report_progress
+
+
+def _succeed(job: ExtractionJob, segment: VideoSegment, filename: str, frames_count: int):
+    # API processes notice the new file through the cache's file version check
+    segment.keypoints_file = filename
+    job.status = JOB_SUCCEEDED
+    job.progress = 1.0
+    job.result = {"keypoints_file": filename, "frames_count": frames_count}
+    logger.info(f"Extraction job {job.id}: {frames_count} frames -> {filename}")
+
+
+def _fail(job: ExtractionJob, error: Exception):
+    job.status = JOB_FAILED
+    job.error = str(error)
+    logger.error(f"Extraction job {job.id} failed: {error}")
+
+
+def _finish(db: Session, jobs: List[ExtractionJob]):
+    finished_at = _now()
+    for job in jobs:
+        job.finished_at = finished_at
+    db.commit()
+    for job in jobs:
+        send_callback(job)
+
+
+def run_job(db: Session, job: ExtractionJob, extractor) -> ExtractionJob:
+    """
+    Extract a claimed job's segment, recording progress and the outcome on the job row
+    """
+    return run_video_jobs(db, [job], extractor)[0]
+
+
+def run_video_jobs(db: Session, jobs: List[ExtractionJob], extractor) -> List[ExtractionJob]:
+    """
+    Extract claimed jobs of one video into the video's keypoint track
+
+    Segments already inside the track's covered ranges succeed without extraction; for the
+    others only the frames the track does not cover yet are extracted, all together (a
+    KeypointsExtractor decodes the video once for all of them, a ParallelExtractor spreads
+    their time chunks over its process pool). The extracted chunks are merged with the
+    old track's rows in frame order and streamed into the new track file, so memory does
+    not grow with the video's length. Every segment then points at the track file. Tracks
+    are keyed by content hash, so segments of a re-uploaded clip reuse whatever earlier
+    uploads extracted.
+
+    Extraction checkpoints to CHECKPOINTS_DIR as it goes; a failed batch retried with the
+    same frame ranges and sampling resumes from the last checkpoint.
+    """
+    report_progress = _progress_reporter(db)
+    targets = {}
+    for job in jobs:
+        try:
+            targets[job.id] = _job_target(db, job)
+        except Exception as e:
+            _fail(job, e)
+
+    runnable = [job for job in jobs if job.id in targets]
+    if runnable:
+        try:
+            video_id = runnable[0].video_id
+            video_path = targets[runnable[0].id][1]
+            sampling = (runnable[0].target_fps, runnable[0].frame_stride)
+            video = db.query(Video).filter(Video.id == video_id).first()
+            filename = _track_filename(video, video_path)
+            track_path = KEYPOINTS_DIR / filename
+
+            # Memory-mapped: rows outside the new ranges are copied through, never all loaded
+            track = load_track(track_path, use_mmap=True)
+            # Timing of the file that is decoded now (the rendition once it exists), which
+            # may not be the one the track was extracted from
+            fps, frame_count = _video_timing(video_path, video.content_hash, extractor)
+            ranges = {
+                job.id: frame_range(fps, frame_count, targets[job.id][0].start_time, targets[job.id][0].end_time)
+                for job in runnable
+            }
+
+            covered = covered_ranges(track)
+            if track is not None and (track_sampling(track) != sampling or not _same_timing(track, fps, frame_count)):
+                # Re-extract everything the track covers at the new sampling, or from the file
+                # with the new timing (its ranges moved to that file's frame numbers), so segments
+                # already pointing at it keep their frames; none of the old rows are kept
+                logger.info(
+                    f"Video {video_id}: track sampling or timing changed to {sampling}, "
+                    f"{fps} fps, {frame_count} frames, re-extracting"
+                )
+                missing = [
+                    frame_range(fps, frame_count, *range_times(track.meta["fps"], covered_range))
+                    for covered_range in covered
+                ] + list(ranges.values())
+                covered = []
+                track = None
+            else:
+                # Only the gaps: frames of a recreated or widened segment that are already in
+                # the track are read from it
+                missing = subtract_ranges(list(ranges.values()), covered)
+
+            if missing:
+                pending = [job for job in runnable if not is_covered(covered, *ranges[job.id])]
+                extract = merge_ranges(missing)
+                progress = {extract_range: (0, 0) for extract_range in extract}
+
+                def on_progress(extract_range, done, total):
+                    progress[extract_range] = (done, total)
+                    done_all = sum(done for done, _ in progress.values())
+                    total_all = sum(total for _, total in progress.values())
+                    for job in pending:
+                        report_progress(job, done_all, total_all)
+
+                checkpoint = ExtractionCheckpoint(
+                    CHECKPOINTS_DIR / Path(filename).stem,
+                    {"ranges": extract, "sampling": list(sampling), "timing": [fps, frame_count]}
+                )
+                chunks = extractor.iter_segments(
+                    str(video_path),
+                    {extract_range: range_times(fps, extract_range) for extract_range in extract},
+                    progress_callback=on_progress,
+                    sampling={extract_range: sampling for extract_range in extract},
+                    resume_from=checkpoint.load(),
+                    checkpoint=checkpoint.save_part
+                )
+                # Chunks go to disk as they are extracted, merged with the old track's rows
+                track = write_track(
+                    track_path, track, (with_derived_features(chunk) for chunk in chunks),
+                    extract, fps, frame_count, sampling
+                )
+                # Kept when anything above fails, for the retry to resume from
+                checkpoint.clear()
+
+            for job in runnable:
+                segment = targets[job.id][0]
+                # No track when every segment is empty (nothing was extracted): 0 frames
+                frames = len(slice_track(track, segment.start_time, segment.end_time)) if track is not None else 0
+                _succeed(job, segment, filename, frames)
+        except Exception as e:
+            db.rollback()
+            for job in runnable:
+                if job.status != JOB_SUCCEEDED:
+                    _fail(job, e)
+
+    _finish(db, jobs)
+    return jobs
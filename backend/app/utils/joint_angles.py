@@ -0,0 +1,204 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.utils.keypoints_store import LANDMARK_COUNT
+
+# Vectorized port of frontend/src/utils/MultiDirectionalPoseComparator.js
+# (calculateAllJointAngles, detectBodyDirection, compareJointAngles and
+# calculateWeightedAccuracy). Scores follow the JS rounding so web clients and
+# the backend agree on the same frame.
+
+MIN_VISIBILITY = 0.6
+ANGLE_SENSITIVITY = 1.2
+
+# MediaPipe Pose landmark indices
+NOSE = 0
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_ELBOW, RIGHT_ELBOW = 13, 14
+LEFT_WRIST, RIGHT_WRIST = 15, 16
+LEFT_HIP, RIGHT_HIP = 23, 24
+LEFT_KNEE, RIGHT_KNEE = 25, 26
+LEFT_ANKLE, RIGHT_ANKLE = 27, 28
+
+# Each angle is measured at the middle point: (first, middle, last)
+JOINT_ANGLES = {
+    "LEFT_ARM_ANGLE": (LEFT_SHOULDER, LEFT_ELBOW, LEFT_WRIST),
+    "RIGHT_ARM_ANGLE": (RIGHT_SHOULDER, RIGHT_ELBOW, RIGHT_WRIST),
+    "LEFT_LEG_ANGLE": (LEFT_HIP, LEFT_KNEE, LEFT_ANKLE),
+    "RIGHT_LEG_ANGLE": (RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE),
+    "LEFT_TORSO_ANGLE": (LEFT_SHOULDER, LEFT_HIP, LEFT_KNEE),
+    "RIGHT_TORSO_ANGLE": (RIGHT_SHOULDER, RIGHT_HIP, RIGHT_KNEE),
+    "SHOULDER_ANGLE": (LEFT_SHOULDER, NOSE, RIGHT_SHOULDER),
+    "HIP_ANGLE": (LEFT_HIP, NOSE, RIGHT_HIP),
+}
+JOINT_ANGLE_NAMES = tuple(JOINT_ANGLES)
+_ANGLE_POINTS = np.array(list(JOINT_ANGLES.values()))  # (angles, 3)
+
+JOINT_ANGLE_WEIGHTS = np.array([
+    1.5,  # LEFT_ARM_ANGLE
+    1.5,  # RIGHT_ARM_ANGLE
+    2.0,  # LEFT_LEG_ANGLE
+    2.0,  # RIGHT_LEG_ANGLE
+    2.5,  # LEFT_TORSO_ANGLE
+    2.5,  # RIGHT_TORSO_ANGLE
+    1.8,  # SHOULDER_ANGLE
+    1.8,  # HIP_ANGLE
+])
+
+# Body part groups over JOINT_ANGLE_NAMES (keys line up with generate_feedback)
+ANGLE_BODY_PARTS = {
+    "arms": ["LEFT_ARM_ANGLE", "RIGHT_ARM_ANGLE"],
+    "legs": ["LEFT_LEG_ANGLE", "RIGHT_LEG_ANGLE"],
+    "torso": ["LEFT_TORSO_ANGLE", "RIGHT_TORSO_ANGLE"],
+    "posture": ["SHOULDER_ANGLE", "HIP_ANGLE"],
+}
+_ANGLE_PART_MASKS = np.array([
+    [name in joints for name in JOINT_ANGLE_NAMES] for joints in ANGLE_BODY_PARTS.values()
+], dtype=np.float64).T  # (angles, parts)
+
+# Facing directions in degrees, in the JS declaration order (ties go to the first)
+DIRECTIONS = {
+    "FRONT": 0,
+    "FRONT_RIGHT": 45,
+    "RIGHT": 90,
+    "BACK_RIGHT": 135,
+    "BACK": 180,
+    "BACK_LEFT": 225,
+    "LEFT": 270,
+    "FRONT_LEFT": 315,
+}
+DIRECTION_NAMES = tuple(DIRECTIONS)
+_DIRECTION_ANGLES = np.array(list(DIRECTIONS.values()), dtype=np.float64)
+UNKNOWN_DIRECTION = -1
+
+
+def js_round(values: np.ndarray) -> np.ndarray:
+    """
+    Math.round semantics (halves round up), unlike numpy's round-half-to-even
+    """
+    return np.floor(np.asarray(values, dtype=np.float64) + 0.5)
+
+
+def calculate_joint_angles(landmarks: np.ndarray) -> np.ndarray:
+    """
+    Joint angles in degrees [0, 360) for (..., 33, 4) landmarks
+
+    Returns (..., len(JOINT_ANGLES)); NaN where any of the three points has
+    visibility <= MIN_VISIBILITY.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    points = landmarks[..., _ANGLE_POINTS, :]  # (..., angles, 3, 4)
+    p1, p2, p3 = points[..., 0, :], points[..., 1, :], points[..., 2, :]
+
+    v1x, v1y = p1[..., 0] - p2[..., 0], p1[..., 1] - p2[..., 1]
+    v2x, v2y = p3[..., 0] - p2[..., 0], p3[..., 1] - p2[..., 1]
+    dot = v1x * v2x + v1y * v2y
+    cross = v1x * v2y - v1y * v2x
+
+    angles = np.degrees(np.arctan2(cross, dot))
+    angles = np.where(angles < 0, angles + 360, angles)
+
+    visible = (points[..., 3] > MIN_VISIBILITY).all(axis=-1)
+    return np.where(visible, angles, np.nan)
+
+
+def detect_body_direction(landmarks: np.ndarray) -> np.ndarray:
+    """
+    Facing direction code per pose: index into DIRECTION_NAMES, or UNKNOWN_DIRECTION
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    left = landmarks[..., LEFT_SHOULDER, :]
+    right = landmarks[..., RIGHT_SHOULDER, :]
+    nose = landmarks[..., NOSE, :]
+
+    shoulder_angle = np.degrees(np.arctan2(right[..., 1] - left[..., 1], right[..., 0] - left[..., 0]))
+    shoulder_angle = np.where(shoulder_angle < 0, shoulder_angle + 360, shoulder_angle)
+
+    delta = shoulder_angle[..., None] - _DIRECTION_ANGLES
+    difference = np.minimum(np.abs(delta), np.minimum(np.abs(delta + 360), np.abs(delta - 360)))
+    direction = np.argmin(difference, axis=-1).astype(np.int8)
+
+    visible = (
+        (left[..., 3] > MIN_VISIBILITY)
+        & (right[..., 3] > MIN_VISIBILITY)
+        & (nose[..., 3] > MIN_VISIBILITY)
+    )
+    return np.where(visible, direction, UNKNOWN_DIRECTION).astype(np.int8)
+
+
+def direction_name(code: int) -> str:
+    return DIRECTION_NAMES[code] if 0 <= code < len(DIRECTION_NAMES) else "UNKNOWN"
+
+
+def is_valid_pose(landmarks: np.ndarray) -> np.ndarray:
+    """
+    isValidPose: at least 33 landmarks and one of them clearly visible
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    if landmarks.shape[-2] < LANDMARK_COUNT:
+        return np.zeros(landmarks.shape[:-2], dtype=bool)
+    return (landmarks[..., 3] > MIN_VISIBILITY).any(axis=-1)
+
+
+def compare_joint_angles(trainer_angles: np.ndarray, trainee_angles: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score joint angles the way compareJointAngles + calculateWeightedAccuracy do
+
+    Returns:
+        accuracy:   (...,) overall accuracy 0-100 (rounded like the JS result)
+        joints:     (..., angles) per-joint accuracy 0-100, 0 where either angle is missing
+        confidence: (...,) share of joints measurable on both poses, 0-100
+    """
+    trainer_angles = np.asarray(trainer_angles, dtype=np.float64)
+    trainee_angles = np.asarray(trainee_angles, dtype=np.float64)
+
+    valid = ~np.isnan(trainer_angles) & ~np.isnan(trainee_angles)
+    difference = np.abs(trainer_angles - trainee_angles)
+    difference = np.minimum(difference, 360 - difference)
+    joints = js_round(np.maximum(0.0, 100 - difference * ANGLE_SENSITIVITY))
+    joints = np.where(valid, joints, 0.0)
+
+    # Only joints with a positive score take part in the weighted mean
+    weights = np.where(joints > 0, JOINT_ANGLE_WEIGHTS, 0.0)
+    weight_sum = weights.sum(axis=-1)
+    accuracy = np.divide(
+        (joints * weights).sum(axis=-1), weight_sum,
+        out=np.zeros_like(weight_sum), where=weight_sum > 0
+    )
+
+    confidence = js_round(valid.sum(axis=-1) / len(JOINT_ANGLE_NAMES) * 100)
+    return js_round(accuracy), joints, confidence
+
+
+def angle_body_part_scores(joints: np.ndarray) -> np.ndarray:
+    """
+    Mean positive joint accuracy per ANGLE_BODY_PARTS group, (..., parts) in 0-100
+    """
+    scored = (joints > 0).astype(np.float64)
+    counts = scored @ _ANGLE_PART_MASKS
+    return np.divide(
+        joints @ _ANGLE_PART_MASKS, counts,
+        out=np.zeros_like(counts), where=counts > 0
+    )
+
+
+def score_angles(
+    trainer_angles: np.ndarray,
+    trainee_landmarks: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Score trainee poses against precomputed trainer angles
+
+    Returns (accuracy 0-100, body part scores 0-100, confidence 0-100, trainee direction codes)
+    """
+    trainee_angles = calculate_joint_angles(trainee_landmarks)
+    accuracy, joints, confidence = compare_joint_angles(trainer_angles, trainee_angles)
+    return accuracy, angle_body_part_scores(joints), confidence, detect_body_direction(trainee_landmarks)
+
+
+def angle_part_dict(parts: np.ndarray) -> Dict[str, float]:
+    """
+    Body part scores on the 0-1 scale used by ComparisonResult.detailed_scores
+    """
+    return dict(zip(ANGLE_BODY_PARTS, (np.asarray(parts) / 100).tolist()))
@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional, Tuple
+
+from app.utils.keypoints_store import KeypointSequence
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_version(path: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    Identify a specific version of a file on disk (inode, size, mtime)
+    Returns None if the file does not exist
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class KeypointsCache:
+    """
+    Process-wide LRU cache of decoded trainer keypoint sequences
+
+    Entries are keyed by (video_id, segment_id) and remember the file version they
+    were loaded from, so a rewritten file is picked up even without an explicit
+    invalidate(). The cache is bounded by the total nbytes of cached sequences.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[int, int], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[int, int], threading.Lock] = {}
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "KeypointsCache":
+        return cls(max_bytes=int(os.getenv("KEYPOINTS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)))
+
+    def get(
+        self,
+        video_id: int,
+        segment_id: int,
+        path: Path,
+        loader: Callable[[], KeypointSequence]
+    ) -> KeypointSequence:
+        """
+        Return the cached sequence for a segment, calling `loader` on a miss
+        """
+        key = (video_id, segment_id)
+        version = file_version(path)
+
+        sequence = self._lookup(key, version)
+        if sequence is not None:
+            return sequence
+
+        # Only one thread decodes a given segment; the others wait and then hit
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            sequence = self._lookup(key, version, count=False)
+            if sequence is not None:
+                return sequence
+
+            with self._lock:
+                self.misses += 1
+            sequence = loader()
+            self._store(key, version, sequence)
+            return sequence
+
+    def _lookup(self, key, version, count: bool = True) -> Optional[KeypointSequence]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["version"] != version:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return entry["sequence"]
+
+    def _store(self, key, version, sequence: KeypointSequence):
+        nbytes = sequence.nbytes
+        if version is None or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {"version": version, "sequence": sequence, "nbytes": nbytes}
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry["nbytes"]
+
+    def invalidate(self, video_id: int, segment_id: Optional[int] = None):
+        """
+        Drop one segment, or every segment of a video when segment_id is None
+        """
+        with self._lock:
+            keys = [
+                key for key in self._entries
+                if key[0] == video_id and (segment_id is None or key[1] == segment_id)
+            ]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
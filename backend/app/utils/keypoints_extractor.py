@@ -1,93 +1,687 @@
 import cv2
 import mediapipe as mp
 import json
+import math
+import os
 import requests
 from pathlib import Path
-from typing import List, Dict, Any
+import queue
+import threading
+from collections import deque
+from contextlib import closing
+from typing import List, Dict, Any, Callable, Hashable, Iterable, Iterator, NamedTuple, Optional, Tuple
 import numpy as np
 
+from app.utils.keypoints_store import CHANNELS, LANDMARK_COUNT, KeypointSequence, concatenate_sequences
+from app.utils.pose_features import feature_block, with_derived_features
+
+# How often (in processed frames) extract_keypoints_from_video reports progress
+PROGRESS_EVERY_FRAMES = 30
+# How often (in processed frames) rows are handed to a checkpoint callback
+CHECKPOINT_EVERY_FRAMES = int(os.getenv("KEYPOINTS_CHECKPOINT_EVERY_FRAMES", 900))
+# Frames per chunk handed out by the streaming extraction (iter_sequence, iter_segments)
+STREAM_CHUNK_FRAMES = 256
+
+
+class ExtractionProfile(NamedTuple):
+    model_complexity: int  # MediaPipe Pose model: 0 lite, 1 full, 2 heavy
+    max_inference_size: Optional[int]  # longest frame side fed to MediaPipe (None = source size)
+
+
+# MediaPipe returns landmarks normalized to the frame, so downscaling (aspect ratio kept)
+# does not change the coordinate space, only the detail the model sees
+EXTRACTION_PROFILES = {
+    "fast": ExtractionProfile(model_complexity=0, max_inference_size=480),
+    "balanced": ExtractionProfile(model_complexity=1, max_inference_size=720),
+    "accurate": ExtractionProfile(model_complexity=2, max_inference_size=None),
+}
+DEFAULT_PROFILE = os.getenv("KEYPOINTS_EXTRACTION_PROFILE", "balanced")
+
+
+def video_timing(video_path: str) -> Tuple[float, int]:
+    """
+    (fps, frame count) of a video file
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, total_frames
+
+
+def get_profile(name: Optional[str] = None) -> ExtractionProfile:
+    name = name or DEFAULT_PROFILE
+    if name not in EXTRACTION_PROFILES:
+        raise ValueError(f"Unknown extraction profile '{name}' (expected one of {', '.join(EXTRACTION_PROFILES)})")
+    return EXTRACTION_PROFILES[name]
+
+
+def inference_size(width: int, height: int, max_size: Optional[int]) -> Optional[tuple]:
+    """
+    (width, height) to resize a frame to before inference, or None to keep it as is
+    """
+    longest = max(width, height)
+    if not max_size or longest <= max_size:
+        return None
+    scale = max_size / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def sample_step(fps: float, target_fps: Optional[float] = None, frame_stride: Optional[int] = None) -> float:
+    """
+    Source frames per processed frame (1.0 = every frame)
+
+    target_fps wins over frame_stride; a target at or above the video's rate keeps every frame.
+    """
+    if target_fps and fps:
+        return max(1.0, fps / target_fps)
+    if frame_stride:
+        return float(max(1, frame_stride))
+    return 1.0
+
+
+def is_sampled(frame_index: int, step: float) -> bool:
+    """
+    Whether a frame is processed at the given sample step
+
+    Based on the absolute frame index, so any start time (and any split of a segment into
+    chunks) picks the same frames, and a fractional step (e.g. 25 -> 15 fps) stays evenly spaced.
+    """
+    return frame_index == 0 or math.floor(frame_index / step) != math.floor((frame_index - 1) / step)
+
+
+# Frames buffered between two pipeline stages (bounds memory to a few decoded frames)
+PIPELINE_QUEUE_SIZE = 8
+# How long a blocked stage waits before re-checking whether the pipeline was stopped
+PIPELINE_POLL_SECONDS = 0.1
+
+_END = object()
+
+
+class _Pipeline:
+    """
+    Background threads around the calling thread's inference loop: produce() runs a frame
+    iterator ahead into a bounded queue, consume() hands results to a writer thread.
+    An error in any stage stops the others and is re-raised in the calling thread.
+    """
+
+    def __init__(self, queue_size: int = PIPELINE_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.stopped = threading.Event()
+        self.errors: List[BaseException] = []
+        self.threads: List[threading.Thread] = []
+        self.outputs: List[queue.Queue] = []
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def _put(self, items: queue.Queue, item) -> bool:
+        while not self.stopped.is_set():
+            try:
+                items.put(item, timeout=PIPELINE_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, items: queue.Queue):
+        while not self.stopped.is_set():
+            try:
+                return items.get(timeout=PIPELINE_POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, error: BaseException):
+        self.errors.append(error)
+        self.stopped.set()
+
+    def _raise_errors(self):
+        if self.errors:
+            raise self.errors[0]
+
+    def produce(self, iterable: Iterable) -> Iterator:
+        items = queue.Queue(self.queue_size)
+
+        def run():
+            try:
+                for item in iterable:
+                    if not self._put(items, item):
+                        return
+            except BaseException as e:
+                self._fail(e)
+            finally:
+                self._put(items, _END)
+
+        self._start(run)
+        while True:
+            item = self._get(items)
+            if item is _END:
+                break
+            yield item
+        self._raise_errors()
+
+    def consume(self, handler: Callable) -> Callable:
+        items = queue.Queue(self.queue_size)
+        self.outputs.append(items)
+
+        def run():
+            try:
+                while True:
+                    item = self._get(items)
+                    if item is _END:
+                        return
+                    handler(*item)
+            except BaseException as e:
+                self._fail(e)
+
+        self._start(run)
+
+        def submit(*args):
+            if not self._put(items, args):
+                self._raise_errors()
+
+        return submit
+
+    def finish(self):
+        """
+        Flush the consumers and wait for every stage; re-raise the first stage error
+        """
+        for items in self.outputs:
+            self._put(items, _END)
+        for thread in self.threads:
+            thread.join()
+        self._raise_errors()
+
+    def stop(self):
+        self.stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+
+class _TrackWriter:
+    """
+    Copies MediaPipe landmarks straight into preallocated arrays
+
+    With a hand_over callback the writer is a rolling buffer of capacity rows: once full,
+    the rows are handed over and forgotten, so the arrays never outgrow one batch.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        fps: float,
+        frame_count: int,
+        hand_over: Optional[Callable[[KeypointSequence], None]] = None
+    ):
+        capacity = max(1, capacity)
+        self.landmarks = np.zeros((capacity, LANDMARK_COUNT, len(CHANNELS)), dtype=np.float32)
+        self.frame_indices = np.zeros(capacity, dtype=np.int32)
+        self.pose_detected = np.zeros(capacity, dtype=bool)
+        self.count = 0
+        self.fps = fps
+        self.frame_count = frame_count
+        self.hand_over = hand_over
+
+    def append(self, frame_index: int, pose_landmarks):
+        if self.count == len(self.frame_indices):
+            # The container's frame count was an underestimate
+            self.landmarks = np.concatenate([self.landmarks, np.zeros_like(self.landmarks)])
+            self.frame_indices = np.concatenate([self.frame_indices, np.zeros_like(self.frame_indices)])
+            self.pose_detected = np.concatenate([self.pose_detected, np.zeros_like(self.pose_detected)])
+
+        row = self.count
+        self.frame_indices[row] = frame_index
+        if pose_landmarks:
+            self.landmarks[row] = [
+                (landmark.x, landmark.y, landmark.z, landmark.visibility)
+                for landmark in pose_landmarks.landmark
+            ]
+            self.pose_detected[row] = True
+        elif self.hand_over:
+            # The row may hold a frame already handed over
+            self.landmarks[row] = 0
+            self.pose_detected[row] = False
+        self.count += 1
+
+        if self.hand_over and self.count == len(self.frame_indices):
+            rows = self.sequence()
+            self.count = 0
+            self.hand_over(rows)
+
+    def sequence(self) -> KeypointSequence:
+        """
+        Rows written (since the last hand-over)
+        """
+        frame_indices = self.frame_indices[:self.count].copy()
+        return KeypointSequence(
+            landmarks=self.landmarks[:self.count].copy(),
+            timestamps=frame_indices / self.fps,
+            frame_indices=frame_indices,
+            pose_detected=self.pose_detected[:self.count].copy(),
+            meta={"fps": self.fps, "frame_count": self.frame_count}
+        )
+
+
 class KeypointsExtractor:
-    def __init__(self):
+    def __init__(self, profile: Optional[str] = None):
+        """
+        Args:
+            profile: "fast", "balanced" or "accurate" (default KEYPOINTS_EXTRACTION_PROFILE or balanced)
+        """
+        self.profile_name = profile or DEFAULT_PROFILE
+        self.profile = get_profile(self.profile_name)
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose(
             static_image_mode=False,
-            model_complexity=1,
+            model_complexity=self.profile.model_complexity,
             enable_segmentation=False,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5
         )
         self.mp_drawing = mp.solutions.drawing_utils
 
-    def extract_keypoints_from_video(self, video_path: str, start_time: float = 0, end_time: float = None) -> List[Dict[str, Any]]:
+    def extract_sequence(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        end_time: float = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        target_fps: Optional[float] = None,
+        frame_stride: Optional[int] = None,
+        pipelined: bool = True
+    ) -> KeypointSequence:
         """
-        Extract keypoints from video segment
-        
+        Extract keypoints from video segment as fixed-shape arrays
+
+        Decoding (read/grab, resize, colour conversion) runs in a background thread and
+        landmark copying in another, each handing over through a bounded queue, so OpenCV
+        decodes the next frames while MediaPipe runs inference on this one. Both release the
+        GIL in native code. pipelined=False runs the same stages one after another.
+
         Args:
             video_path: Path to video file
             start_time: Start time in seconds
             end_time: End time in seconds (None = end of video)
-            
+            progress_callback: Called as (frames_done, frames_total) while processing
+            target_fps: Process at most this many frames per second (None = every frame)
+            frame_stride: Process every n-th frame; ignored when target_fps is set
+            pipelined: Overlap decoding, inference and landmark copying in separate threads
+
         Returns:
-            List of keypoints data for each frame
+            KeypointSequence (meta: source "fps" and "frame_count"); timestamps are always the source
+            frame's own time (frame_index / fps)
         """
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
-        
+        cap = self._open(video_path)
         fps = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = sample_step(fps, target_fps, frame_stride)
         
         # Calculate frame range
         start_frame = int(start_time * fps)
         end_frame = int(end_time * fps) if end_time else total_frames
+        return self._extract_span(
+            cap, start_frame, end_frame, lambda frame_index: is_sampled(frame_index, step),
+            progress_callback, pipelined
+        )
+
+    def iter_sequence(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        end_time: float = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        target_fps: Optional[float] = None,
+        frame_stride: Optional[int] = None,
+        chunk_frames: int = STREAM_CHUNK_FRAMES,
+        pipelined: bool = True
+    ) -> Iterator[KeypointSequence]:
+        """
+        Extract a video segment as consecutive KeypointSequence chunks
+
+        Same frames as extract_sequence, but every chunk of chunk_frames rows is handed out
+        as soon as it is full and not kept afterwards, so memory stays at one chunk however
+        long the segment is. The video is released once the iterator is exhausted or closed.
+        """
+        callback = (lambda key, done, total: progress_callback(done, total)) if progress_callback else None
+        return self.iter_segments(
+            video_path, {None: (start_time, end_time)}, callback, {None: (target_fps, frame_stride)},
+            pipelined, chunk_frames=chunk_frames
+        )
+
+    def iter_segments(
+        self,
+        video_path: str,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        progress_callback: Optional[Callable[[Hashable, int, int], None]] = None,
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]] = None,
+        pipelined: bool = True,
+        resume_from: Optional[List[KeypointSequence]] = None,
+        checkpoint: Optional[Callable[[KeypointSequence], None]] = None,
+        chunk_frames: int = STREAM_CHUNK_FRAMES
+    ) -> Iterator[KeypointSequence]:
+        """
+        Rows of several segments of one video from a single decode pass, as consecutive chunks
+
+        Every frame any segment wants comes out once, in frame order: the parts of
+        resume_from first, then chunks of chunk_frames rows, each handed out as soon as it
+        is full and not kept afterwards. Memory stays at one chunk (plus the rows waiting
+        for the next checkpoint) however long the video is. Arguments as for
+        extract_segments, which collects these chunks and splits them per segment.
+        """
+        cap = self._open(video_path)
+        try:
+            yield from self._segment_chunks(
+                cap, segments, progress_callback, sampling, pipelined, resume_from, checkpoint, chunk_frames
+            )
+        finally:
+            cap.release()
+
+    def extract_segments(
+        self,
+        video_path: str,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        progress_callback: Optional[Callable[[Hashable, int, int], None]] = None,
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]] = None,
+        pipelined: bool = True,
+        resume_from: Optional[List[KeypointSequence]] = None,
+        checkpoint: Optional[Callable[[KeypointSequence], None]] = None
+    ) -> Dict[Hashable, KeypointSequence]:
+        """
+        Extract several segments of one video in a single decode pass
+
+        The video is read once from the earliest segment start to the latest end. Frames
+        no segment needs are grabbed without decoding, every other frame is inferred once,
+        and each segment gets the rows inside its own range (overlapping segments share
+        the same inference results).
+
+        Args:
+            segments: {key: (start_time, end_time or None)}
+            progress_callback: called as (key, frames_done, frames_total); all segments
+                               advance together with the shared pass
+            sampling: {key: (target_fps, frame_stride)} for segments not extracted at every frame
+            resume_from: parts saved by an interrupted run, in frame order (the last one's
+                         meta "next_frame"); only frames from next_frame on are extracted
+            checkpoint: called every CHECKPOINT_EVERY_FRAMES frames with the new rows
+
+        Returns:
+            {key: KeypointSequence}, frames in order
+        """
+        cap = self._open(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_ranges, steps = self._segment_plan(fps, total_frames, segments, sampling)
+        try:
+            chunks = list(self._segment_chunks(cap, segments, progress_callback, sampling, pipelined, resume_from, checkpoint))
+        finally:
+            cap.release()
+        track = concatenate_sequences(chunks, meta={"fps": fps, "frame_count": total_frames})
+
+        results = {}
+        for key, (start_frame, end_frame) in frame_ranges.items():
+            rows = slice(*np.searchsorted(track.frame_indices, [start_frame, end_frame]))
+            part = track.subset(rows)
+            if len(segments) > 1:
+                # Drop rows only another segment's sampling asked for
+                keep = np.fromiter(
+                    (is_sampled(int(index), steps[key]) for index in part.frame_indices), dtype=bool, count=len(part)
+                )
+                if not keep.all():
+                    part = part.subset(keep)
+            results[key] = part
+        return results
+
+    def _segment_plan(
+        self,
+        fps: float,
+        total_frames: int,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]]
+    ) -> Tuple[Dict[Hashable, Tuple[int, int]], Dict[Hashable, float]]:
+        """
+        ({key: (start_frame, end_frame)}, {key: sampling step}) of a set of segments
+        """
+        # Same int(time * fps) frame rule as a single-segment extraction
+        frame_ranges = {
+            key: (int(start_time * fps), int(end_time * fps) if end_time else total_frames)
+            for key, (start_time, end_time) in segments.items()
+        }
+        steps = {
+            key: sample_step(fps, *(sampling or {}).get(key, (None, None)))
+            for key in segments
+        }
+        return frame_ranges, steps
+
+    def _segment_chunks(
+        self,
+        cap,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        progress_callback: Optional[Callable[[Hashable, int, int], None]],
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]],
+        pipelined: bool,
+        resume_from: Optional[List[KeypointSequence]],
+        checkpoint: Optional[Callable[[KeypointSequence], None]],
+        chunk_frames: int = STREAM_CHUNK_FRAMES
+    ) -> Iterator[KeypointSequence]:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_ranges, steps = self._segment_plan(fps, total_frames, segments, sampling)
+        resume_from = [part for part in resume_from or [] if len(part)]
+        next_frame = int(resume_from[-1].meta.get("next_frame", 0)) if resume_from else 0
+
+        def wanted_by(key, frame_index):
+            start_frame, end_frame = frame_ranges[key]
+            return start_frame <= frame_index < end_frame and is_sampled(frame_index, steps[key])
+
+        def wanted(frame_index):
+            return frame_index >= next_frame and any(wanted_by(key, frame_index) for key in segments)
+
+        span_start = max(next_frame, min(start_frame for start_frame, _ in frame_ranges.values()))
+        span_end = max(end_frame for _, end_frame in frame_ranges.values())
+
+        frames_total = {
+            key: sum(1 for index in range(start_frame, min(end_frame, total_frames)) if wanted_by(key, index))
+            for key, (start_frame, end_frame) in frame_ranges.items()
+        }
+        frames_resumed = {
+            key: sum(1 for part in resume_from for index in part.frame_indices if wanted_by(key, int(index)))
+            for key in segments
+        }
+        callback = None
+        if progress_callback:
+            def callback(done, total):
+                for key, key_total in frames_total.items():
+                    remaining = key_total - frames_resumed[key]
+                    key_done = frames_resumed[key] + (min(remaining, round(remaining * done / total)) if total else 0)
+                    progress_callback(key, key_done, key_total)
+
+        yield from resume_from
+
+        # Filled by the pipeline's writer thread, emptied here
+        ready = deque()
+        unsaved: List[KeypointSequence] = []
+
+        def hand_over(chunk: KeypointSequence):
+            ready.append(chunk)
+            if not checkpoint:
+                return
+            unsaved.append(chunk)
+            if sum(len(part) for part in unsaved) >= CHECKPOINT_EVERY_FRAMES:
+                part = concatenate_sequences(unsaved, meta={**chunk.meta, "next_frame": int(chunk.frame_indices[-1]) + 1})
+                unsaved.clear()
+                checkpoint(part)
+
+        track = _TrackWriter(chunk_frames, fps, total_frames, hand_over)
+        with closing(self._run_span(cap, span_start, span_end, wanted, callback, pipelined, track.append)) as ticks:
+            for _ in ticks:
+                while ready:
+                    yield ready.popleft()
+        while ready:
+            yield ready.popleft()
+        if track.count:
+            yield track.sequence()
+
+    def video_timing(self, video_path: str) -> Tuple[float, int]:
+        return video_timing(video_path)
+
+    def _open(self, video_path: str):
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Cannot open video: {video_path}")
+        return cap
+
+    def _extract_span(
+        self,
+        cap,
+        start_frame: int,
+        end_frame: int,
+        select: Callable[[int], bool],
+        progress_callback: Optional[Callable[[int, int], None]],
+        pipelined: bool
+    ) -> KeypointSequence:
+        """
+        Infer every frame of [start_frame, end_frame) accepted by select; the rest are only grabbed
+        """
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames_total = sum(1 for index in range(start_frame, min(end_frame, total_frames)) if select(index))
+
+        track = _TrackWriter(frames_total, fps, total_frames)
+        for _ in self._run_span(cap, start_frame, end_frame, select, progress_callback, pipelined, track.append):
+            pass
+        return track.sequence()
+
+    def _run_span(
+        self,
+        cap,
+        start_frame: int,
+        end_frame: int,
+        select: Callable[[int], bool],
+        progress_callback: Optional[Callable[[int, int], None]],
+        pipelined: bool,
+        write: Callable[[int, Any], None]
+    ) -> Iterator[int]:
+        """
+        Infer the selected frames of [start_frame, end_frame), passing each result to
+        write(frame_index, pose_landmarks)
+
+        Yields the index of every inferred frame, so a caller can hand out finished rows
+        while the video is still being read. Releases cap when done.
+        """
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        resize_to = inference_size(
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            self.profile.max_inference_size
+        )
+        frames_total = sum(1 for index in range(start_frame, min(end_frame, total_frames)) if select(index))
         
         # Set video position to start frame
         cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
         
-        keypoints_data = []
-        current_frame = start_frame
+        def decode_frames():
+            current_frame = start_frame
+            while current_frame < end_frame:
+                if not select(current_frame):
+                    # Skipped frames are only demuxed, not decoded
+                    if not cap.grab():
+                        break
+                    current_frame += 1
+                    continue
+                
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                
+                # Downscale first so the colour conversion also runs on the smaller frame
+                if resize_to:
+                    frame = cv2.resize(frame, resize_to, interpolation=cv2.INTER_AREA)
+                
+                # Convert BGR to RGB
+                yield current_frame, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                current_frame += 1
         
-        while current_frame < end_frame:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Convert BGR to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        pipeline = _Pipeline() if pipelined else None
+        try:
+            frames = pipeline.produce(decode_frames()) if pipeline else decode_frames()
+            consume = pipeline.consume(write) if pipeline else write
             
-            # Process frame with MediaPipe
-            results = self.pose.process(rgb_frame)
-            
-            # Extract keypoints
-            if results.pose_landmarks:
-                landmarks = []
-                for landmark in results.pose_landmarks.landmark:
-                    landmarks.append({
-                        "x": landmark.x,
-                        "y": landmark.y,
-                        "z": landmark.z,
-                        "visibility": landmark.visibility
-                    })
+            frames_done = 0
+            for frame_index, rgb_frame in frames:
+                # Process frame with MediaPipe
+                results = self.pose.process(rgb_frame)
+                consume(frame_index, results.pose_landmarks)
                 
-                keypoints_data.append({
-                    "frame_index": current_frame,
-                    "timestamp": current_frame / fps,
-                    "keypoints": landmarks,
-                    "pose_detected": True
-                })
-            else:
-                # No pose detected in this frame
-                keypoints_data.append({
-                    "frame_index": current_frame,
-                    "timestamp": current_frame / fps,
-                    "keypoints": [],
-                    "pose_detected": False
-                })
+                frames_done += 1
+                if progress_callback and frames_done % PROGRESS_EVERY_FRAMES == 0:
+                    progress_callback(frames_done, frames_total)
+                yield frame_index
             
-            current_frame += 1
+            if pipeline:
+                pipeline.finish()
+        finally:
+            if pipeline:
+                pipeline.stop()
+            cap.release()
         
-        cap.release()
-        return keypoints_data
+        if progress_callback:
+            progress_callback(frames_done, frames_done)
+
+    def iter_keypoints_from_video(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        end_time: float = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        target_fps: Optional[float] = None,
+        frame_stride: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Frame records of a video segment, one at a time (see extract_keypoints_from_video)
+
+        Built on iter_sequence, so only one chunk of frames is held at once.
+        """
+        for chunk in self.iter_sequence(video_path, start_time, end_time, progress_callback, target_fps, frame_stride):
+            # Derived trainer features are per frame, so a chunk at a time gives the same values
+            chunk = with_derived_features(chunk)
+            for row in range(len(chunk)):
+                frame = chunk.frame_to_dict(row)
+                frame["features"] = feature_block(chunk.features, row) if frame["pose_detected"] else None
+                yield frame
+
+    def extract_keypoints_from_video(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        end_time: float = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        target_fps: Optional[float] = None,
+        frame_stride: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract keypoints from video segment
+        
+        Args:
+            video_path: Path to video file
+            start_time: Start time in seconds
+            end_time: End time in seconds (None = end of video)
+            progress_callback: Called as (frames_done, frames_total) while processing
+            target_fps: Process at most this many frames per second (None = every frame)
+            frame_stride: Process every n-th frame; ignored when target_fps is set
+            
+        Returns:
+            List of keypoints data for each processed frame; detected frames carry a "features"
+            block (joint angles, body direction, normalized pose, visibility bitmasks).
+            Timestamps are always the source frame's own time (frame_index / fps).
+            Use iter_keypoints_from_video to process long videos without the whole list.
+        """
+        return list(self.iter_keypoints_from_video(
+            video_path, start_time, end_time, progress_callback, target_fps, frame_stride
+        ))
 
     def save_keypoints_to_api(self, video_id: int, segment_id: int, keypoints_data: List[Dict[str, Any]], api_base_url: str = "http://localhost:8000"):
         """
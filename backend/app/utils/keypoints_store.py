@@ -0,0 +1,556 @@
+import json
+import mmap
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import List, Dict, Any, IO, Optional, Tuple, Union
+
+import numpy as np
+
+# Binary keypoints file layout (".kpt"):
+#   8 bytes   magic
+#   4 bytes   little-endian uint32 header length
+#   N bytes   UTF-8 JSON header (padded with spaces to ARRAY_ALIGNMENT)
+#   arrays    raw little-endian arrays, each starting on an ARRAY_ALIGNMENT boundary
+#
+# The header records dtype, shape and byte offset of every array so readers can
+# map columns directly without parsing any per-frame data.
+
+MAGIC = b"FITKPT\x00\x01"
+FORMAT_VERSION = 1
+FILE_SUFFIX = ".kpt"
+LEGACY_SUFFIX = ".json"
+ARRAY_ALIGNMENT = 64
+# Block size KeypointsFileWriter copies spilled columns into the final file with
+COPY_BUFFER_BYTES = 1024 * 1024
+
+LANDMARK_COUNT = 33
+CHANNELS = ("x", "y", "z", "visibility")
+
+_PREFIX = struct.Struct("<8sI")
+
+# Arrays every file has; anything else in the header is a derived per-frame feature
+CORE_ARRAYS = ("landmarks", "timestamps", "frame_indices", "pose_detected")
+
+
+class KeypointSequence:
+    """
+    Fixed-shape keypoints for one video segment
+
+    landmarks:     float32 (frames, landmarks, 4) -> x, y, z, visibility
+    timestamps:    float64 (frames,) seconds from the start of the video
+    frame_indices: int32   (frames,) frame number in the source video
+    pose_detected: bool    (frames,)
+    features:      optional per-frame derived arrays (first axis = frames), e.g. joint angles
+    """
+
+    def __init__(
+        self,
+        landmarks: np.ndarray,
+        timestamps: np.ndarray,
+        frame_indices: np.ndarray,
+        pose_detected: np.ndarray,
+        meta: Optional[Dict[str, Any]] = None,
+        features: Optional[Dict[str, np.ndarray]] = None
+    ):
+        self.landmarks = landmarks
+        self.timestamps = timestamps
+        self.frame_indices = frame_indices
+        self.pose_detected = pose_detected
+        self.meta = meta or {}
+        self.features = dict(features or {})
+
+        # The timestamp column doubles as the lookup index, so it must be sorted
+        if len(timestamps) > 1 and not np.all(timestamps[1:] >= timestamps[:-1]):
+            order = np.argsort(timestamps, kind="stable")
+            self.landmarks = landmarks[order]
+            self.timestamps = timestamps[order]
+            self.frame_indices = frame_indices[order]
+            self.pose_detected = pose_detected[order]
+            self.features = {name: array[order] for name, array in self.features.items()}
+
+    def __len__(self) -> int:
+        return int(self.timestamps.shape[0])
+
+    @property
+    def landmark_count(self) -> int:
+        return int(self.landmarks.shape[1])
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            self.landmarks.nbytes
+            + self.timestamps.nbytes
+            + self.frame_indices.nbytes
+            + self.pose_detected.nbytes
+            + sum(array.nbytes for array in self.features.values())
+        )
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: List[Dict[str, Any]],
+        meta: Optional[Dict[str, Any]] = None,
+        first_index: int = 0
+    ) -> "KeypointSequence":
+        """
+        Build a sequence from the JSON frame dicts produced by the extractor / upload endpoint
+
+        Frames without a frame_index are numbered from first_index.
+        """
+        landmark_count = next(
+            (len(frame.get("keypoints") or []) for frame in frames if frame.get("keypoints")),
+            LANDMARK_COUNT
+        )
+
+        frames = sorted(frames, key=lambda frame: frame.get("timestamp", 0))
+        count = len(frames)
+
+        landmarks = np.zeros((count, landmark_count, len(CHANNELS)), dtype=np.float32)
+        timestamps = np.zeros(count, dtype=np.float64)
+        frame_indices = np.zeros(count, dtype=np.int32)
+        pose_detected = np.zeros(count, dtype=bool)
+
+        for i, frame in enumerate(frames):
+            timestamps[i] = frame.get("timestamp", 0)
+            frame_indices[i] = frame.get("frame_index", first_index + i)
+
+            points = frame.get("keypoints") or []
+            pose_detected[i] = bool(frame.get("pose_detected", bool(points)))
+            if not points:
+                continue
+            if len(points) != landmark_count:
+                raise ValueError(
+                    f"Frame {frame_indices[i]} has {len(points)} keypoints, expected {landmark_count}"
+                )
+            landmarks[i] = [
+                [point.get("x", 0), point.get("y", 0), point.get("z", 0), point.get("visibility", 0)]
+                for point in points
+            ]
+
+        return cls(landmarks, timestamps, frame_indices, pose_detected, meta)
+
+    def frame_to_dict(self, index: int) -> Dict[str, Any]:
+        """
+        Return one frame in the legacy JSON shape
+        """
+        detected = bool(self.pose_detected[index])
+        return {
+            "frame_index": int(self.frame_indices[index]),
+            "timestamp": float(self.timestamps[index]),
+            "keypoints": landmarks_to_dicts(self.landmarks[index]) if detected else [],
+            "pose_detected": detected
+        }
+
+    def closest_frame_indices(self, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Binary search the sorted timestamp column for the nearest frame of each query time
+        (the earlier frame wins on ties)
+        """
+        queries = np.asarray(timestamps, dtype=np.float64)
+        right = np.searchsorted(self.timestamps, queries, side="left")
+        right = np.clip(right, 0, len(self) - 1)
+        left = np.clip(right - 1, 0, len(self) - 1)
+        left_diff = np.abs(queries - self.timestamps[left])
+        right_diff = np.abs(self.timestamps[right] - queries)
+        return np.where(left_diff <= right_diff, left, right)
+
+    def closest_frame_index(self, timestamp: float) -> Optional[int]:
+        """
+        Index of the frame whose timestamp is closest to `timestamp`, in O(log n)
+        """
+        if len(self) == 0:
+            return None
+        return int(self.closest_frame_indices(np.array([timestamp]))[0])
+
+    def interpolated_landmarks(self, timestamp: float) -> Optional[np.ndarray]:
+        """
+        Linearly interpolate landmarks between the two frames around `timestamp`
+
+        Falls back to the closest frame outside the sequence or when either neighbour
+        has no detected pose. Returns None if the chosen frame has no pose.
+        """
+        landmarks, found = self.poses_at(np.array([timestamp]), interpolate=True)
+        return landmarks[0] if found[0] else None
+
+    def poses_at(self, timestamps: np.ndarray, interpolate: bool = False):
+        """
+        Vectorized trainer pose lookup for many query times at once
+
+        Returns:
+            landmarks: float64 (queries, landmarks, 4)
+            found:     bool (queries,) False where no trainer pose is available
+        """
+        queries = np.asarray(timestamps, dtype=np.float64)
+        if len(self) == 0:
+            return np.zeros((len(queries), self.landmark_count, len(CHANNELS))), np.zeros(len(queries), dtype=bool)
+
+        nearest = self.closest_frame_indices(queries)
+        landmarks = self.landmarks[nearest].astype(np.float64)
+        found = self.pose_detected[nearest].copy()
+
+        if interpolate:
+            right = np.searchsorted(self.timestamps, queries, side="right")
+            left = right - 1
+            inside = (left >= 0) & (right < len(self))
+            left_safe = np.clip(left, 0, len(self) - 1)
+            right_safe = np.clip(right, 0, len(self) - 1)
+            blend = inside & self.pose_detected[left_safe] & self.pose_detected[right_safe]
+            if blend.any():
+                lo, hi = left_safe[blend], right_safe[blend]
+                span = self.timestamps[hi] - self.timestamps[lo]
+                alpha = np.divide(
+                    queries[blend] - self.timestamps[lo], span,
+                    out=np.zeros_like(span), where=span > 0
+                )[:, None, None]
+                start = self.landmarks[lo].astype(np.float64)
+                end = self.landmarks[hi].astype(np.float64)
+                landmarks[blend] = start + (end - start) * alpha
+                found[blend] = True
+
+        return landmarks, found
+
+    def subset(self, rows: Union[slice, np.ndarray]) -> "KeypointSequence":
+        """
+        Sequence of the selected rows, features included (a slice gives views, not copies)
+        """
+        return KeypointSequence(
+            landmarks=self.landmarks[rows],
+            timestamps=self.timestamps[rows],
+            frame_indices=self.frame_indices[rows],
+            pose_detected=self.pose_detected[rows],
+            meta=self.meta,
+            features={name: array[rows] for name, array in self.features.items()}
+        )
+
+    def to_frames(self) -> List[Dict[str, Any]]:
+        """
+        Convert back to the list-of-dicts JSON shape used by older clients
+        """
+        return [self.frame_to_dict(i) for i in range(len(self))]
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {
+            "landmarks": np.ascontiguousarray(self.landmarks, dtype="<f4"),
+            "timestamps": np.ascontiguousarray(self.timestamps, dtype="<f8"),
+            "frame_indices": np.ascontiguousarray(self.frame_indices, dtype="<i4"),
+            "pose_detected": np.ascontiguousarray(self.pose_detected, dtype="|u1"),
+        }
+        for name, array in self.features.items():
+            arrays[name] = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+        return arrays
+
+
+def concatenate_sequences(parts: List[KeypointSequence], meta: Optional[Dict[str, Any]] = None) -> KeypointSequence:
+    """
+    Join sequences of consecutive time ranges into one, in the order given
+
+    Only features present in every part are kept.
+    """
+    parts = [part for part in parts if len(part)] or parts[:1]
+    if not parts:
+        return KeypointSequence(
+            np.zeros((0, LANDMARK_COUNT, len(CHANNELS)), dtype=np.float32),
+            np.zeros(0, dtype=np.float64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=bool),
+            meta
+        )
+
+    feature_names = set(parts[0].features).intersection(*(part.features for part in parts[1:]))
+    return KeypointSequence(
+        landmarks=np.concatenate([part.landmarks for part in parts]),
+        timestamps=np.concatenate([part.timestamps for part in parts]),
+        frame_indices=np.concatenate([part.frame_indices for part in parts]),
+        pose_detected=np.concatenate([part.pose_detected for part in parts]),
+        meta=meta if meta is not None else parts[0].meta,
+        features={name: np.concatenate([part.features[name] for part in parts]) for name in feature_names}
+    )
+
+
+def landmarks_to_dicts(landmarks: np.ndarray) -> List[Dict[str, float]]:
+    """
+    Convert a (landmarks, 4) array to the [{"x", "y", "z", "visibility"}, ...] JSON shape
+    """
+    return [dict(zip(CHANNELS, point)) for point in np.asarray(landmarks).tolist()]
+
+
+def _align(offset: int) -> int:
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
+
+
+def _build_header(
+    frames: int,
+    landmark_count: int,
+    meta: Dict[str, Any],
+    columns: Dict[str, Tuple[np.dtype, Tuple[int, ...]]]
+) -> bytes:
+    """
+    Lay out the arrays {name: (dtype, shape)} after the header and return the padded header bytes
+    """
+    header = {
+        "version": FORMAT_VERSION,
+        "frames": frames,
+        "landmarks": landmark_count,
+        "channels": list(CHANNELS),
+        "meta": meta,
+        "arrays": {}
+    }
+
+    # The header size depends on the offsets it contains, so iterate until stable
+    header_size = 0
+    while True:
+        offset = _align(_PREFIX.size + header_size)
+        for name, (dtype, shape) in columns.items():
+            header["arrays"][name] = {
+                "dtype": dtype.str,
+                "shape": list(shape),
+                "offset": offset
+            }
+            offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+        encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        if len(encoded) <= header_size:
+            break
+        header_size = _align(len(encoded) + _PREFIX.size) - _PREFIX.size
+
+    return encoded.ljust(header_size, b" ")
+
+
+def encode_keypoints(sequence: KeypointSequence) -> bytes:
+    """
+    Serialize a sequence into the binary keypoints format
+    """
+    arrays = sequence._arrays()
+    header = _build_header(
+        len(sequence), sequence.landmark_count, sequence.meta,
+        {name: (array.dtype, array.shape) for name, array in arrays.items()}
+    )
+
+    parts = [_PREFIX.pack(MAGIC, len(header)), header]
+    position = _PREFIX.size + len(header)
+    for array in arrays.values():
+        aligned = _align(position)
+        parts.append(b"\x00" * (aligned - position))
+        parts.append(array.tobytes())
+        position = aligned + array.nbytes
+    return b"".join(parts)
+
+
+def write_keypoints(path: Union[str, Path], sequence: KeypointSequence) -> Path:
+    """
+    Atomically write a sequence to `path` (written to a temp file, then renamed)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(encode_keypoints(sequence))
+    os.replace(tmp_path, path)
+    return path
+
+
+class KeypointsFileWriter:
+    """
+    Writes a keypoints file chunk by chunk, for sequences too long to hold in memory
+
+    Every column is appended to a spill file of its own as chunks arrive. close() writes
+    the header (known only once the frame count is) and copies the columns behind it in
+    COPY_BUFFER_BYTES blocks, then renames the file into place like write_keypoints. Memory
+    use is one chunk plus the copy buffer, however many frames are written.
+
+        with KeypointsFileWriter(path) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+    """
+
+    def __init__(self, path: Union[str, Path], meta: Optional[Dict[str, Any]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta = meta
+        self.frames = 0
+        self.last_timestamp = -np.inf
+        self.landmark_count = LANDMARK_COUNT
+        # name -> (dtype, shape of one frame), fixed by the first chunk
+        self.columns: Dict[str, Tuple[np.dtype, Tuple[int, ...]]] = {}
+        self.spills: Dict[str, IO[bytes]] = {}
+
+    def _spill_path(self, name: str) -> Path:
+        return self.path.with_name(f"{self.path.name}.{name}.part")
+
+    def append(self, chunk: KeypointSequence):
+        """
+        Add the next frames (same features as every other chunk, in time order)
+
+        Raises ValueError for a chunk starting before the end of the previous one: the
+        timestamp column is the file's lookup index and readers expect it sorted.
+        """
+        if len(chunk) and chunk.timestamps[0] < self.last_timestamp:
+            raise ValueError(
+                f"Chunk starting at {float(chunk.timestamps[0])}s is out of order (previous chunk ends at {self.last_timestamp}s)"
+            )
+        arrays = chunk._arrays()
+        if self.meta is None:
+            self.meta = chunk.meta
+        if not self.columns:
+            self.landmark_count = chunk.landmark_count
+            for name, array in arrays.items():
+                self.columns[name] = (array.dtype, array.shape[1:])
+                self.spills[name] = open(self._spill_path(name), "wb")
+        elif set(arrays) != set(self.columns):
+            raise ValueError(f"Chunk arrays {sorted(arrays)} differ from earlier chunks {sorted(self.columns)}")
+
+        for name, array in arrays.items():
+            dtype, frame_shape = self.columns[name]
+            if array.dtype != dtype or array.shape[1:] != frame_shape:
+                raise ValueError(f"Chunk array '{name}' does not match earlier chunks")
+            self.spills[name].write(array.tobytes())
+        self.frames += len(chunk)
+        if len(chunk):
+            self.last_timestamp = float(chunk.timestamps[-1])
+
+    def close(self) -> Path:
+        """
+        Assemble the file and move it into place
+        """
+        if not self.columns:
+            return write_keypoints(self.path, concatenate_sequences([], meta=self.meta))
+
+        for spill in self.spills.values():
+            spill.close()
+        header = _build_header(
+            self.frames, self.landmark_count, self.meta or {},
+            {name: (dtype, (self.frames,) + frame_shape) for name, (dtype, frame_shape) in self.columns.items()}
+        )
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_PREFIX.pack(MAGIC, len(header)))
+                f.write(header)
+                for name in self.columns:
+                    position = f.tell()
+                    f.write(b"\x00" * (_align(position) - position))
+                    with open(self._spill_path(name), "rb") as spill:
+                        shutil.copyfileobj(spill, f, COPY_BUFFER_BYTES)
+            os.replace(tmp_path, self.path)
+        finally:
+            self.abort()
+        return self.path
+
+    def abort(self):
+        """
+        Drop everything written so far (the target file is left untouched)
+        """
+        for name, spill in self.spills.items():
+            spill.close()
+            self._spill_path(name).unlink(missing_ok=True)
+        self.path.with_name(self.path.name + ".tmp").unlink(missing_ok=True)
+        self.spills = {}
+
+    def __enter__(self) -> "KeypointsFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_header(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Read and validate the JSON header of a binary keypoints file
+    """
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise ValueError(f"Truncated keypoints file: {path}")
+        magic, header_size = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"Not a keypoints file: {path}")
+        header = json.loads(f.read(header_size).decode("utf-8"))
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported keypoints format version: {header.get('version')}")
+    return header
+
+
+def _map_file(path: Union[str, Path]):
+    """
+    Map a whole file read-only; pages are loaded lazily and shared through the OS page cache
+    """
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def read_keypoints(path: Union[str, Path], use_mmap: bool = False) -> KeypointSequence:
+    """
+    Load a binary keypoints file
+
+    With use_mmap=True the arrays are zero-copy views into a read-only memory map,
+    so only the frames that are actually indexed get paged in.
+    """
+    header = read_header(path)
+    arrays = {}
+
+    if use_mmap:
+        buffer = _map_file(path)
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape)) if shape else 1
+            if spec["offset"] + count * dtype.itemsize > len(buffer):
+                raise ValueError(f"Truncated keypoints array '{name}' in {path}")
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec["offset"]).reshape(shape)
+    else:
+        with open(path, "rb") as f:
+            for name, spec in header["arrays"].items():
+                dtype = np.dtype(spec["dtype"])
+                shape = tuple(spec["shape"])
+                count = int(np.prod(shape)) if shape else 1
+                f.seek(spec["offset"])
+                array = np.fromfile(f, dtype=dtype, count=count)
+                if array.size != count:
+                    raise ValueError(f"Truncated keypoints array '{name}' in {path}")
+                arrays[name] = array.reshape(shape)
+
+    return KeypointSequence(
+        landmarks=arrays["landmarks"],
+        timestamps=arrays["timestamps"],
+        frame_indices=arrays["frame_indices"],
+        pose_detected=arrays["pose_detected"].view(bool),
+        meta=header.get("meta") or {},
+        features={name: array for name, array in arrays.items() if name not in CORE_ARRAYS}
+    )
+
+
+def read_legacy_json(path: Union[str, Path]) -> KeypointSequence:
+    """
+    Load an old indent=2 JSON keypoints file as a sequence
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return KeypointSequence.from_frames(json.load(f))
+
+
+def load_sequence(path: Union[str, Path], use_mmap: bool = False) -> KeypointSequence:
+    """
+    Load either format, dispatching on the file suffix
+    (use_mmap only applies to binary files; legacy JSON is always parsed)
+    """
+    path = Path(path)
+    if path.suffix == LEGACY_SUFFIX:
+        return read_legacy_json(path)
+    return read_keypoints(path, use_mmap=use_mmap)
+
+
+def migrate_json_file(json_path: Union[str, Path], remove_json: bool = False) -> Path:
+    """
+    Convert a legacy JSON keypoints file to the binary format next to it
+
+    Returns: path of the new .kpt file
+    """
+    json_path = Path(json_path)
+    sequence = read_legacy_json(json_path)
+    kpt_path = write_keypoints(json_path.with_suffix(FILE_SUFFIX), sequence)
+    if remove_json:
+        json_path.unlink()
+    return kpt_path
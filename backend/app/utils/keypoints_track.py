@@ -0,0 +1,204 @@
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.utils.keypoints_store import FILE_SUFFIX, KeypointsFileWriter, KeypointSequence, read_keypoints
+from app.utils.pose_features import with_derived_features
+
+# Video-level keypoint tracks.
+#
+# Every extracted frame of a video lives in one file, track_<sha256>.kpt, keyed by the
+# video file's content hash so every upload of the same clip shares it (videos stored
+# before content hashing keep video_<id>.kpt). Its meta records the
+# source fps and frame count, the sampling it was extracted with and the half-open frame
+# ranges it covers. Segments point at the track and are read as slices of it: the rows
+# inside (start_time, end_time) are found by binary search on the timestamp column and
+# returned as views, so moving a segment boundary inside the covered ranges needs no
+# extraction and overlapping segments share storage. A segment reaching past the covered
+# ranges only has its uncovered frames extracted.
+
+TRACK_FILENAME = re.compile(r"^(video_\d+|track_[0-9a-f]{64})" + re.escape(FILE_SUFFIX) + r"$")
+
+FrameRange = Tuple[int, int]
+
+# Old track rows copied into a rewritten track per block
+TRACK_COPY_FRAMES = 1024
+
+
+def track_filename(video_id: int, content_hash: Optional[str] = None) -> str:
+    if content_hash:
+        return f"track_{content_hash}{FILE_SUFFIX}"
+    return f"video_{video_id}{FILE_SUFFIX}"
+
+
+def is_track_file(filename: Optional[str]) -> bool:
+    return bool(filename) and TRACK_FILENAME.match(Path(filename).name) is not None
+
+
+def load_track(path: Union[str, Path], use_mmap: bool = False) -> Optional[KeypointSequence]:
+    """
+    Read a video track, or None if the video has none yet
+    """
+    path = Path(path)
+    if not path.exists():
+        return None
+    return read_keypoints(path, use_mmap=use_mmap)
+
+
+def frame_range(fps: float, frame_count: int, start_time: float, end_time: Optional[float]) -> FrameRange:
+    """
+    Source frames [start, end) of a time range, with the extractor's int(time * fps) rule
+    """
+    start_frame = int(start_time * fps)
+    end_frame = min(int(end_time * fps), frame_count) if end_time else frame_count
+    return start_frame, max(start_frame, end_frame)
+
+
+def range_times(fps: float, frame_range: FrameRange) -> Tuple[float, float]:
+    """
+    Times that frame_range() maps back to exactly this frame range (half a frame in, so
+    float rounding cannot move a boundary onto the neighbouring frame)
+    """
+    start, end = frame_range
+    return (start + 0.5) / fps, (end + 0.5) / fps
+
+
+def merge_ranges(ranges: List[FrameRange]) -> List[FrameRange]:
+    """
+    Sorted union of frame ranges (touching ranges are joined)
+    """
+    merged: List[List[int]] = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_ranges(ranges: List[FrameRange], removed: List[FrameRange]) -> List[FrameRange]:
+    """
+    Parts of ranges outside every range in removed, sorted and merged
+    """
+    result = []
+    removed = merge_ranges(removed)
+    for start, end in merge_ranges(ranges):
+        for removed_start, removed_end in removed:
+            if removed_end <= start or end <= removed_start:
+                continue
+            if start < removed_start:
+                result.append((start, removed_start))
+            start = max(start, removed_end)
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def covered_ranges(track: Optional[KeypointSequence]) -> List[FrameRange]:
+    if track is None:
+        return []
+    return [(int(start), int(end)) for start, end in track.meta.get("covered", [])]
+
+
+def is_covered(ranges: List[FrameRange], start_frame: int, end_frame: int) -> bool:
+    return end_frame <= start_frame or any(start <= start_frame and end_frame <= end for start, end in ranges)
+
+
+def track_sampling(track: KeypointSequence) -> Tuple[Optional[float], Optional[int]]:
+    return track.meta.get("target_fps"), track.meta.get("frame_stride")
+
+
+def segment_rows(track: KeypointSequence, start_time: float, end_time: Optional[float]) -> slice:
+    """
+    Rows of the track inside a segment, by binary search on the timestamp column
+
+    Boundaries are snapped to frame times with the track's fps (same frame rule as the
+    extractor), so a slice holds exactly the frames a per-segment extraction would have.
+    """
+    fps = track.meta.get("fps")
+    if fps:
+        start_frame, end_frame = frame_range(fps, track.meta.get("frame_count") or np.iinfo(np.int32).max, start_time, end_time)
+        bounds = [start_frame / fps, end_frame / fps]
+    else:
+        bounds = [start_time, end_time if end_time else np.inf]
+    first, last = np.searchsorted(track.timestamps, bounds, side="left")
+    return slice(int(first), int(last))
+
+
+def slice_track(track: KeypointSequence, start_time: float, end_time: Optional[float]) -> KeypointSequence:
+    """
+    A segment's keypoints as views into the video track
+    """
+    return track.subset(segment_rows(track, start_time, end_time))
+
+
+def write_track(
+    path: Union[str, Path],
+    track: Optional[KeypointSequence],
+    chunks: Iterable[KeypointSequence],
+    new_ranges: List[FrameRange],
+    fps: float,
+    frame_count: int,
+    sampling: Tuple[Optional[float], Optional[int]]
+) -> KeypointSequence:
+    """
+    Write a track of freshly extracted frame ranges plus the old track's rows outside them
+
+    chunks hold the rows of new_ranges in frame order (derived features included); they
+    are merged with the kept rows of track (e.g. the memory-mapped current file at path)
+    in frame order and streamed to disk, so neither track is ever held in memory.
+    Returns the new track, memory-mapped.
+    """
+    new_ranges = merge_ranges(new_ranges)
+    meta = {
+        "fps": fps,
+        "frame_count": frame_count,
+        "target_fps": sampling[0],
+        "frame_stride": sampling[1],
+        "covered": [list(frame_range) for frame_range in merge_ranges(covered_ranges(track) + new_ranges)],
+    }
+
+    # Rows of the old track outside new_ranges, as [first, last) row spans (rows are in frame order)
+    kept: List[List[int]] = []
+    if track is not None and len(track):
+        first = 0
+        for start, end in new_ranges:
+            replaced_first, replaced_last = (int(row) for row in np.searchsorted(track.frame_indices, [start, end]))
+            if replaced_first > first:
+                kept.append([first, replaced_first])
+            first = max(first, replaced_last)
+        if first < len(track):
+            kept.append([first, len(track)])
+
+    with KeypointsFileWriter(path, meta) as writer:
+        def copy_kept(before_frame: Optional[int]):
+            # Kept rows with a frame index below before_frame (all of them for None)
+            while kept:
+                first, last = kept[0]
+                if before_frame is not None:
+                    last = min(last, int(np.searchsorted(track.frame_indices, before_frame)))
+                last = min(last, first + TRACK_COPY_FRAMES)
+                if last <= first:
+                    return
+                writer.append(with_derived_features(track.subset(slice(first, last))))
+                kept[0][0] = last
+                if kept[0][0] == kept[0][1]:
+                    kept.pop(0)
+
+        for chunk in chunks:
+            start = 0
+            while start < len(chunk):
+                copy_kept(int(chunk.frame_indices[start]))
+                # Up to the next kept row, which has to go in between
+                stop = len(chunk)
+                if kept:
+                    stop = int(np.searchsorted(chunk.frame_indices, track.frame_indices[kept[0][0]]))
+                writer.append(chunk.subset(slice(start, stop)))
+                start = stop
+        copy_kept(None)
+
+    return read_keypoints(path, use_mmap=True)
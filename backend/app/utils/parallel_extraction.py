@@ -0,0 +1,309 @@
+import math
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from app.utils.keypoints_extractor import KeypointsExtractor, is_sampled, sample_step, video_timing
+from app.utils.keypoints_store import KeypointSequence, concatenate_sequences
+from app.utils.pose_features import with_derived_features
+
+# Process-pool keypoint extraction.
+#
+# Every pool process owns one KeypointsExtractor (one MediaPipe Pose), created once by the
+# pool initializer and reused for every chunk it is given. Segments are cut into time
+# chunks so a single long segment also spreads over all processes. MediaPipe tracks the
+# pose from frame to frame, so each chunk starts decoding WARMUP_SECONDS early and the
+# warm-up frames are thrown away. Chunks come back as KeypointSequence arrays (cheap to
+# pickle) and are handed out in frame order, a bounded window of them in flight.
+
+DEFAULT_CHUNK_SECONDS = 60.0
+MIN_CHUNK_SECONDS = 10.0
+DEFAULT_WARMUP_SECONDS = 1.0
+# Chunks submitted per process beyond the next one to hand out (bounds finished chunks held back)
+MAX_CHUNKS_AHEAD_PER_PROCESS = 2
+
+# Pool process state (set by _init_worker)
+_extractor = None
+
+
+class Chunk(NamedTuple):
+    key: Hashable  # which segment the chunk belongs to
+    index: int  # position inside the segment
+    start_time: float
+    end_time: float
+    warmup_time: float  # decoding starts here; frames before start_frame are dropped
+    start_frame: int
+    end_frame: int
+    frame_count: int  # frames the chunk will process (after sampling)
+    target_fps: Optional[float] = None
+    frame_stride: Optional[int] = None
+
+
+def _init_worker(profile: Optional[str] = None):
+    global _extractor
+    _extractor = KeypointsExtractor(profile)
+
+
+def _extract_chunk(video_path: str, chunk: Chunk) -> KeypointSequence:
+    sequence = _extractor.extract_sequence(
+        video_path, chunk.warmup_time, chunk.end_time,
+        target_fps=chunk.target_fps, frame_stride=chunk.frame_stride
+    )
+    # Drop the warm-up frames
+    sequence = sequence.subset(sequence.frame_indices >= chunk.start_frame)
+    return with_derived_features(sequence)
+
+
+def default_processes() -> int:
+    return int(os.getenv("KEYPOINTS_EXTRACT_PROCESSES", os.cpu_count() or 1))
+
+
+def plan_chunks(
+    segments: Dict[Hashable, Tuple[float, Optional[float]]],
+    fps: float,
+    total_frames: int,
+    processes: int,
+    chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+    warmup_seconds: float = DEFAULT_WARMUP_SECONDS,
+    sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]] = None
+) -> List[Chunk]:
+    """
+    Split segments {key: (start_time, end_time or None)} into chunks for the pool
+
+    sampling optionally gives {key: (target_fps, frame_stride)}; frames are sampled by
+    absolute frame index, so chunked output matches a single-pass extraction.
+
+    Chunks are at most chunk_seconds long, and shorter (down to MIN_CHUNK_SECONDS) when
+    there would otherwise be fewer than two chunks per process. Chunk boundaries use the
+    same int(time * fps) frame rule as the extractor, so consecutive chunks neither
+    overlap nor leave gaps.
+    """
+    duration = total_frames / fps
+    ranges = {
+        key: (start_time, min(end_time, duration) if end_time else duration)
+        for key, (start_time, end_time) in segments.items()
+    }
+    total_seconds = sum(max(0.0, end - start) for start, end in ranges.values())
+    length = min(chunk_seconds, max(MIN_CHUNK_SECONDS, total_seconds / (2 * max(1, processes))))
+
+    chunks = []
+    for key, (start_time, end_time) in ranges.items():
+        target_fps, frame_stride = (sampling or {}).get(key, (None, None))
+        step = sample_step(fps, target_fps, frame_stride)
+        count = max(1, math.ceil((end_time - start_time) / length))
+        bounds = [start_time + (end_time - start_time) * i / count for i in range(count)] + [end_time]
+        for index in range(count):
+            start_frame = int(bounds[index] * fps)
+            end_frame = int(bounds[index + 1] * fps)
+            chunks.append(Chunk(
+                key=key,
+                index=index,
+                start_time=bounds[index],
+                end_time=bounds[index + 1],
+                warmup_time=max(0.0, bounds[index] - warmup_seconds),
+                start_frame=start_frame,
+                end_frame=end_frame,
+                frame_count=sum(1 for frame_index in range(start_frame, end_frame) if is_sampled(frame_index, step)),
+                target_fps=target_fps,
+                frame_stride=frame_stride
+            ))
+    return chunks
+
+
+class ParallelExtractor:
+    """
+    Keypoint extraction over a pool of processes, one MediaPipe Pose per process
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        chunk_seconds: float = DEFAULT_CHUNK_SECONDS,
+        warmup_seconds: float = DEFAULT_WARMUP_SECONDS,
+        profile: Optional[str] = None
+    ):
+        self.processes = processes or default_processes()
+        self.chunk_seconds = chunk_seconds
+        self.warmup_seconds = warmup_seconds
+        # spawn: MediaPipe starts threads, which do not survive a fork safely
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(profile,)
+        )
+
+    def _plan(
+        self,
+        video_path: str,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]],
+        resume_from: Optional[List[KeypointSequence]]
+    ):
+        """
+        (meta, frame ranges, chunks left to extract) of a set of segments, skipping the
+        frames resume_from already holds
+        """
+        fps, total_frames = video_timing(video_path)
+        meta = {"fps": fps, "frame_count": total_frames}
+        frame_ranges = {
+            key: (int(start_time * fps), min(int(end_time * fps), total_frames) if end_time else total_frames)
+            for key, (start_time, end_time) in segments.items()
+        }
+        resume_from = [part for part in resume_from or [] if len(part)]
+        next_frame = int(resume_from[-1].meta.get("next_frame", 0)) if resume_from else 0
+        # Half a frame in, so int(time * fps) lands exactly on next_frame
+        remaining = {
+            key: (max(start_time, (next_frame + 0.5) / fps) if next_frame > frame_ranges[key][0] else start_time, end_time)
+            for key, (start_time, end_time) in segments.items()
+            if frame_ranges[key][1] > next_frame
+        }
+        chunks = plan_chunks(
+            remaining, fps, total_frames, self.processes, self.chunk_seconds, self.warmup_seconds, sampling
+        )
+        return meta, frame_ranges, resume_from, chunks
+
+    def _run_chunks(self, video_path: str, chunks: List[Chunk]) -> Iterator[Tuple[Chunk, KeypointSequence]]:
+        """
+        Extract chunks over the pool, yielding (chunk, rows) in frame order
+
+        At most MAX_CHUNKS_AHEAD_PER_PROCESS chunks per process are submitted beyond the one
+        handed out next, so finished chunks waiting for an earlier, slower one stay bounded.
+        """
+        order = sorted(chunks, key=lambda chunk: (chunk.start_frame, chunk.index))
+        window = MAX_CHUNKS_AHEAD_PER_PROCESS * self.processes
+        futures: Dict[int, Future] = {}
+        submitted = 0
+        try:
+            for position, chunk in enumerate(order):
+                while submitted < min(len(order), position + window):
+                    futures[submitted] = self.pool.submit(_extract_chunk, video_path, order[submitted])
+                    submitted += 1
+                yield chunk, futures.pop(position).result()
+        finally:
+            # Don't leave the rest of a failed or abandoned video queued in the pool
+            for future in futures.values():
+                future.cancel()
+
+    def iter_segments(
+        self,
+        video_path: str,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        progress_callback: Optional[Callable[[Hashable, int, int], None]] = None,
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]] = None,
+        resume_from: Optional[List[KeypointSequence]] = None,
+        checkpoint: Optional[Callable[[KeypointSequence], None]] = None
+    ) -> Iterator[KeypointSequence]:
+        """
+        Rows of several non-overlapping segments as consecutive chunks in frame order
+
+        The parts of resume_from come first, then every pool chunk as soon as it and all
+        chunks before it are done. Memory stays at the chunks in flight however long the
+        video is. Arguments as for extract_segments.
+        """
+        meta, frame_ranges, resume_from, chunks = self._plan(video_path, segments, sampling, resume_from)
+        ranges = sorted(frame_ranges.values())
+        if any(end > start for (_, end), (start, _) in zip(ranges, ranges[1:])):
+            raise ValueError("Segments streamed together must not overlap")
+
+        frames_done = {key: sum(int(np.count_nonzero(
+            (part.frame_indices >= start_frame) & (part.frame_indices < end_frame)
+        )) for part in resume_from) for key, (start_frame, end_frame) in frame_ranges.items()}
+        frames_total = dict(frames_done)
+        for chunk in chunks:
+            frames_total[chunk.key] += chunk.frame_count
+
+        yield from resume_from
+        for chunk, part in self._run_chunks(video_path, chunks):
+            frames_done[chunk.key] += chunk.frame_count
+            if progress_callback:
+                progress_callback(chunk.key, frames_done[chunk.key], frames_total[chunk.key])
+            if checkpoint:
+                checkpoint(KeypointSequence(
+                    part.landmarks, part.timestamps, part.frame_indices, part.pose_detected,
+                    meta={**meta, "next_frame": chunk.end_frame}, features=part.features
+                ))
+            yield part
+
+    def extract_segments(
+        self,
+        video_path: str,
+        segments: Dict[Hashable, Tuple[float, Optional[float]]],
+        progress_callback: Optional[Callable[[Hashable, int, int], None]] = None,
+        sampling: Optional[Dict[Hashable, Tuple[Optional[float], Optional[int]]]] = None,
+        resume_from: Optional[List[KeypointSequence]] = None,
+        checkpoint: Optional[Callable[[KeypointSequence], None]] = None
+    ) -> Dict[Hashable, KeypointSequence]:
+        """
+        Extract several segments of one video at once
+
+        Args:
+            segments: {key: (start_time, end_time or None)}
+            progress_callback: called as (key, frames_done, frames_total) when a chunk finishes
+            sampling: {key: (target_fps, frame_stride)} for segments not extracted at every frame
+            resume_from: parts saved by an interrupted run, in frame order (the last one's
+                         meta "next_frame"); only frames from next_frame on are extracted
+            checkpoint: called with each finished chunk once every chunk before it (in frame
+                        order) is finished too; segments must not overlap when checkpointing
+
+        Returns:
+            {key: KeypointSequence} with derived features, frames in order
+        """
+        meta, frame_ranges, resume_from, chunks = self._plan(video_path, segments, sampling, resume_from)
+
+        # Rows already extracted by an interrupted run, per segment
+        resumed: Dict[Hashable, List[KeypointSequence]] = {key: [] for key in segments}
+        for key, (start_frame, end_frame) in frame_ranges.items():
+            for part in resume_from:
+                rows = slice(*part.frame_indices.searchsorted([start_frame, end_frame]))
+                resumed[key].append(part.subset(rows))
+
+        frames_done = {key: sum(len(part) for part in resumed[key]) for key in segments}
+        frames_total = dict(frames_done)
+        for chunk in chunks:
+            frames_total[chunk.key] += chunk.frame_count
+
+        parts: Dict[Hashable, Dict[int, KeypointSequence]] = {key: {} for key in segments}
+        for chunk, part in self._run_chunks(video_path, chunks):
+            parts[chunk.key][chunk.index] = part
+            frames_done[chunk.key] += chunk.frame_count
+            if progress_callback:
+                progress_callback(chunk.key, frames_done[chunk.key], frames_total[chunk.key])
+            if checkpoint:
+                checkpoint(KeypointSequence(
+                    part.landmarks, part.timestamps, part.frame_indices, part.pose_detected,
+                    meta={**meta, "next_frame": chunk.end_frame}, features=part.features
+                ))
+
+        return {
+            key: concatenate_sequences(
+                resumed[key] + [chunk_parts[index] for index in sorted(chunk_parts)], meta=meta
+            )
+            for key, chunk_parts in parts.items()
+        }
+
+    def extract_sequence(
+        self,
+        video_path: str,
+        start_time: float = 0,
+        end_time: float = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        target_fps: Optional[float] = None,
+        frame_stride: Optional[int] = None
+    ) -> KeypointSequence:
+        """
+        One segment, split into chunks across the pool
+        """
+        callback = (lambda key, done, total: progress_callback(done, total)) if progress_callback else None
+        return self.extract_segments(
+            video_path, {None: (start_time, end_time)}, callback, {None: (target_fps, frame_stride)}
+        )[None]
+
+    def video_timing(self, video_path: str) -> Tuple[float, int]:
+        return video_timing(video_path)
+
+    def close(self):
+        self.pool.shutdown()
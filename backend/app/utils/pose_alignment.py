@@ -0,0 +1,192 @@
+from typing import Tuple
+
+import numpy as np
+
+from app.utils.pose_scoring import DISTANCE_SCALE, IMPORTANT_JOINTS, VISIBILITY_THRESHOLD
+
+# Banded dynamic time warping of a trainee recording against the trainer sequence.
+#
+# Trainee timestamps are on the trainer video's clock (the player position when the frame
+# was captured), so trainee frame j is only compared with trainer frames within
+# +/- band_frames of the trainer frame nearest its timestamp. The cost and DP tables are
+# (trainee frames, 2 * band_frames + 1), so time and memory grow linearly with the
+# session length instead of quadratically.
+#
+# Steps are the classic (1, 0), (0, 1), (1, 1); the path may start and end anywhere inside
+# the first/last band so a trainee who starts early or stops late is not forced onto the
+# trainer's first/last frame.
+
+DEFAULT_BAND_SECONDS = 2.0
+# The alignment cost only looks at the weighted limb joints (shoulders to ankles); face,
+# hand and foot landmarks move with them and would triple the cost of the band. Final
+# scores are computed on the matched pairs with every landmark.
+ALIGNMENT_JOINTS = tuple(sorted(IMPORTANT_JOINTS))
+# Trainee rows scored per vectorized block when building the cost band
+COST_CHUNK_ROWS = 256
+
+
+def band_starts(trainer_timestamps: np.ndarray, trainee_timestamps: np.ndarray, band_frames: int) -> np.ndarray:
+    """
+    First trainer index of each trainee row's band (may be negative near the start)
+    """
+    right = np.searchsorted(trainer_timestamps, trainee_timestamps, side="left")
+    left = np.clip(right - 1, 0, len(trainer_timestamps) - 1)
+    right = np.clip(right, 0, len(trainer_timestamps) - 1)
+    # Same nearest-frame rule as KeypointSequence.closest_frame_indices (earlier frame wins ties)
+    nearest = np.where(
+        np.abs(trainer_timestamps[right] - trainee_timestamps) < np.abs(trainee_timestamps - trainer_timestamps[left]),
+        right, left
+    )
+    # Keep bands monotonic so consecutive rows always overlap in the same direction
+    return np.maximum.accumulate(nearest) - band_frames
+
+
+def band_costs(
+    trainer: np.ndarray,
+    trainee: np.ndarray,
+    starts: np.ndarray,
+    width: int
+) -> np.ndarray:
+    """
+    1 - weighted pose similarity for every (trainee row, band column), float64 (rows, width)
+
+    Same similarity rule as pose_scoring, restricted to ALIGNMENT_JOINTS. Columns outside
+    the trainer sequence are +inf; pairs with no commonly visible joint cost 1.
+    """
+    trainer_count = trainer.shape[0]
+    joints = [joint for joint in ALIGNMENT_JOINTS if joint < trainer.shape[1]]
+    weights = np.array([IMPORTANT_JOINTS[joint] for joint in joints], dtype=np.float32)
+
+    trainer_xy = np.ascontiguousarray(trainer[:, joints, :2], dtype=np.float32)
+    trainer_visible = (trainer[:, joints, 3] > VISIBILITY_THRESHOLD).astype(np.float32)
+    trainee_xy = np.ascontiguousarray(trainee[:, joints, :2], dtype=np.float32)
+    trainee_visible = (trainee[:, joints, 3] > VISIBILITY_THRESHOLD).astype(np.float32)
+
+    offsets = np.arange(width)
+    costs = np.empty((len(trainee), width), dtype=np.float64)
+    for first in range(0, len(trainee), COST_CHUNK_ROWS):
+        rows = slice(first, first + COST_CHUNK_ROWS)
+        columns = starts[rows, None] + offsets
+        inside = (columns >= 0) & (columns < trainer_count)
+        columns = np.clip(columns, 0, trainer_count - 1)
+
+        valid = trainer_visible[columns] * trainee_visible[rows, None, :]
+        delta = trainer_xy[columns] - trainee_xy[rows, None, :, :]
+        delta *= delta
+        # In place: distance -> max(0, 1 - DISTANCE_SCALE * distance) -> masked similarity
+        similarity = np.sqrt(delta[..., 0] + delta[..., 1])
+        similarity *= -DISTANCE_SCALE
+        similarity += 1.0
+        np.maximum(similarity, 0.0, out=similarity)
+        similarity *= valid
+
+        numerator = similarity @ weights
+        denominator = valid @ weights
+        score = np.divide(numerator, denominator, out=np.zeros_like(denominator), where=denominator > 0)
+        costs[rows] = np.where(inside, 1.0 - score, np.inf)
+    return costs
+
+
+def banded_dtw(costs: np.ndarray, starts: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Accumulate a banded cost table and backtrack the cheapest warping path
+
+    Returns:
+        matches: int (rows,) trainer index matched to each trainee row (the cheapest one
+                 when the path stays on a row for several trainer frames)
+        cost:    total cost of the path
+    """
+    rows, width = costs.shape
+    # One extra +inf column so out-of-band lookups can be expressed as plain indexing
+    accumulated = np.full((rows, width + 1), np.inf)
+
+    # Everything that does not depend on the previous row is prepared for all rows at once:
+    # previous_columns[j, k] is the column of row j - 1 holding trainer index starts[j] + k - 1
+    previous_columns = (starts[1:] - starts[:-1])[:, None] - 1 + np.arange(width + 1)
+    previous_columns[(previous_columns < 0) | (previous_columns >= width)] = width
+    # Horizontal steps (j, i-1): D[i] = S[i] + min_{k<=i}(E[k] - S[k]) with S the running cost
+    # sum along the row, which turns the sequential recurrence into a prefix minimum
+    finite = np.isfinite(costs)
+    running = np.cumsum(np.where(finite, costs, 0.0), axis=1)
+    running_or_inf = np.where(finite, running, np.inf)
+
+    # entry_gains[j, k] = E[k] - S[k] and its running minimum, kept to find where the path
+    # entered each row during the backtrack
+    entry_gains = np.empty((rows, width))
+    best_gains = np.empty((rows, width))
+    restarted = np.zeros(rows, dtype=bool)
+    restarted[0] = True
+
+    for row in range(rows):
+        if row == 0:
+            entry = costs[0]
+        else:
+            # Vertical (j-1, i) and diagonal (j-1, i-1) predecessors
+            previous = accumulated[row - 1, previous_columns[row - 1]]
+            entry = costs[row] + np.minimum(previous[1:], previous[:-1])
+            if entry.min() == np.inf:
+                # The band jumped past the previous one (a pause in the recording): start over
+                entry = costs[row]
+                restarted[row] = True
+        np.subtract(entry, running[row], out=entry_gains[row])
+        np.minimum.accumulate(entry_gains[row], out=best_gains[row])
+        np.add(best_gains[row], running_or_inf[row], out=accumulated[row, :width])
+
+    # Backtrack one row at a time from the cheapest end point of the last band
+    column = int(np.argmin(accumulated[-1, :width]))
+    total = float(accumulated[-1, column])
+    matches = np.empty(rows, dtype=np.int64)
+    for row in range(rows - 1, -1, -1):
+        # Column where the path entered this row; usually the exit column itself (no horizontal
+        # step). A fresh start always enters where it exits since costs are non-negative.
+        if restarted[row] or entry_gains[row, column] == best_gains[row, column]:
+            matches[row] = starts[row] + column
+            entered = column
+        else:
+            entered = int(np.argmin(entry_gains[row, :column + 1]))
+            # A row spanning several trainer frames is matched to the closest of them
+            matches[row] = starts[row] + entered + int(np.argmin(costs[row, entered:column + 1]))
+        if row == 0:
+            break
+        if restarted[row]:
+            column = int(np.argmin(accumulated[row - 1, :width]))
+            continue
+        vertical = previous_columns[row - 1, entered + 1]
+        diagonal = previous_columns[row - 1, entered]
+        column = int(vertical if accumulated[row - 1, vertical] <= accumulated[row - 1, diagonal] else diagonal)
+
+    return matches, total
+
+
+def align_sequences(
+    trainer_landmarks: np.ndarray,
+    trainer_timestamps: np.ndarray,
+    trainee_landmarks: np.ndarray,
+    trainee_timestamps: np.ndarray,
+    band_seconds: float = DEFAULT_BAND_SECONDS
+) -> Tuple[np.ndarray, float]:
+    """
+    Match every trainee frame to a trainer frame with banded DTW
+
+    Args:
+        trainer_landmarks:  (N, landmarks, 4), trainer_timestamps sorted (N,)
+        trainee_landmarks:  (M, landmarks, 4), trainee_timestamps sorted (M,)
+        band_seconds:       how far from the trainer frame at the same timestamp a match may be
+
+    Returns:
+        matches: int (M,) trainer frame index per trainee frame
+        cost:    mean path cost per trainee frame
+    """
+    trainer_timestamps = np.asarray(trainer_timestamps, dtype=np.float64)
+    trainee_timestamps = np.asarray(trainee_timestamps, dtype=np.float64)
+
+    # Band half-width in trainer frames, from the trainer's own frame rate
+    duration = trainer_timestamps[-1] - trainer_timestamps[0]
+    frame_interval = duration / (len(trainer_timestamps) - 1) if len(trainer_timestamps) > 1 and duration > 0 else 1.0
+    band_frames = max(1, int(np.ceil(band_seconds / frame_interval)))
+    width = 2 * band_frames + 1
+
+    starts = band_starts(trainer_timestamps, trainee_timestamps, band_frames)
+    costs = band_costs(trainer_landmarks, trainee_landmarks, starts, width)
+    matches, total = banded_dtw(costs, starts)
+    return matches, total / len(trainee_timestamps)
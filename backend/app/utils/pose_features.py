@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from app.utils.joint_angles import (
+    JOINT_ANGLE_NAMES,
+    MIN_VISIBILITY,
+    UNKNOWN_DIRECTION,
+    calculate_joint_angles,
+    detect_body_direction,
+    direction_name,
+)
+from app.utils.keypoints_store import LANDMARK_COUNT, KeypointsFileWriter, KeypointSequence, read_keypoints
+from app.utils.pose_scoring import VISIBILITY_THRESHOLD
+
+# Derived per-frame features of a trainer pose. They depend only on the trainer's own
+# landmarks, so they are computed once when a segment is extracted/saved and stored as
+# extra arrays in its .kpt file:
+#
+#   joint_angles          float64 (frames, 8)      degrees, NaN where not measurable (float64 like
+#                                                  the trainee side, so js_round sees the same values)
+#   body_direction        int8    (frames,)        index into DIRECTION_NAMES, -1 = unknown
+#   visibility_mask       uint64  (frames,)        bit i = landmark i visible for distance scoring
+#   angle_visibility_mask uint64  (frames,)        bit i = landmark i visible for angle scoring
+#                                                  (non-zero = isValidPose)
+
+FEATURE_DTYPES = {
+    "joint_angles": np.dtype(np.float64),
+    "body_direction": np.dtype(np.int8),
+    "visibility_mask": np.dtype(np.uint64),
+    "angle_visibility_mask": np.dtype(np.uint64),
+}
+FEATURE_NAMES = tuple(FEATURE_DTYPES)
+
+# Frames rewritten per block by migrate_features_file
+MIGRATION_BLOCK_FRAMES = 1024
+
+_BIT_VALUES = np.left_shift(np.uint64(1), np.arange(LANDMARK_COUNT, dtype=np.uint64))
+
+
+def visibility_mask(landmarks: np.ndarray, threshold: float = VISIBILITY_THRESHOLD) -> np.ndarray:
+    """
+    Pack per-landmark visibility > threshold into one uint64 per pose (bit i = landmark i)
+    """
+    landmarks = np.asarray(landmarks)
+    visible = landmarks[..., :LANDMARK_COUNT, 3] > threshold
+    bits = _BIT_VALUES[:visible.shape[-1]]
+    return np.where(visible, bits, np.uint64(0)).sum(axis=-1, dtype=np.uint64)
+
+
+def unpack_visibility(mask: np.ndarray, landmark_count: int = LANDMARK_COUNT) -> np.ndarray:
+    """
+    Inverse of visibility_mask: (...,) uint64 -> (..., landmark_count) bool
+    """
+    mask = np.asarray(mask, dtype=np.uint64)
+    return (mask[..., None] & _BIT_VALUES[:landmark_count]) != 0
+
+
+def compute_features(landmarks: np.ndarray, pose_detected: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    All derived features for (frames, 33, 4) landmarks, frames without a pose blanked out
+    """
+    missing = ~np.asarray(pose_detected, dtype=bool)
+
+    angles = calculate_joint_angles(landmarks)
+    angles[missing] = np.nan
+
+    directions = detect_body_direction(landmarks)
+    directions[missing] = UNKNOWN_DIRECTION
+
+    masks = visibility_mask(landmarks)
+    masks[missing] = 0
+    angle_masks = visibility_mask(landmarks, MIN_VISIBILITY)
+    angle_masks[missing] = 0
+
+    return {
+        "joint_angles": angles,
+        "body_direction": directions,
+        "visibility_mask": masks,
+        "angle_visibility_mask": angle_masks,
+    }
+
+
+def has_current_features(sequence: KeypointSequence) -> bool:
+    """
+    True when the sequence stores exactly FEATURE_NAMES with their current dtypes
+    """
+    return set(sequence.features) == set(FEATURE_NAMES) and all(
+        sequence.features[name].dtype == dtype for name, dtype in FEATURE_DTYPES.items()
+    )
+
+
+def with_derived_features(sequence: KeypointSequence) -> KeypointSequence:
+    """
+    Attach the derived features to a trainer sequence, recomputing them when they are
+    missing or outdated (e.g. float32 joint angles of older files)
+
+    Sequences without a full 33-landmark skeleton are left as is.
+    """
+    if sequence.landmark_count < LANDMARK_COUNT or has_current_features(sequence):
+        return sequence
+
+    sequence.features = compute_features(sequence.landmarks, sequence.pose_detected)
+    return sequence
+
+
+def migrate_features_file(path: Union[str, Path]) -> bool:
+    """
+    Rewrite a .kpt file whose derived features are missing or outdated, block by block
+
+    Returns False when the file needed no rewrite.
+    """
+    sequence = read_keypoints(path, use_mmap=True)
+    if not len(sequence) or sequence.landmark_count < LANDMARK_COUNT or has_current_features(sequence):
+        return False
+
+    with KeypointsFileWriter(path, sequence.meta) as writer:
+        for first in range(0, len(sequence), MIGRATION_BLOCK_FRAMES):
+            writer.append(with_derived_features(sequence.subset(slice(first, first + MIGRATION_BLOCK_FRAMES))))
+    return True
+
+
+def _json_floats(values: np.ndarray) -> List[Any]:
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+def feature_block(features: Dict[str, np.ndarray], index: int) -> Dict[str, Any]:
+    """
+    JSON-friendly derived features of one frame (NaN -> None, direction as its name)
+    """
+    return {
+        "joint_angles": dict(zip(JOINT_ANGLE_NAMES, _json_floats(features["joint_angles"][index]))),
+        "body_direction": direction_name(int(features["body_direction"][index])),
+        "visibility_mask": int(features["visibility_mask"][index]),
+        "angle_visibility_mask": int(features["angle_visibility_mask"][index]),
+    }
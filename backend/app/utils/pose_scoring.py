@@ -0,0 +1,187 @@
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# Scoring rules shared by the compare endpoints:
+#   a landmark counts when both trainer and trainee visibility > VISIBILITY_THRESHOLD
+#   similarity = max(0, 1 - DISTANCE_SCALE * xy_distance)
+#   overall    = weighted mean of similarities (JOINT_WEIGHTS)
+#   body parts = unweighted mean over BODY_PARTS indices
+
+VISIBILITY_THRESHOLD = 0.5
+DISTANCE_SCALE = 2.0
+LANDMARK_COUNT = 33
+
+# MediaPipe pose landmark indices with weights (more important joints weigh more)
+IMPORTANT_JOINTS = {
+    11: 1.5,  # Left shoulder
+    12: 1.5,  # Right shoulder
+    13: 1.3,  # Left elbow
+    14: 1.3,  # Right elbow
+    15: 1.1,  # Left wrist
+    16: 1.1,  # Right wrist
+    23: 1.5,  # Left hip
+    24: 1.5,  # Right hip
+    25: 1.3,  # Left knee
+    26: 1.3,  # Right knee
+    27: 1.1,  # Left ankle
+    28: 1.1,  # Right ankle
+}
+
+# MediaPipe pose landmark indices per body part
+BODY_PARTS = {
+    "head": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],  # Face and ears
+    "arms": [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22],  # Shoulders, elbows, wrists, hands
+    "torso": [11, 12, 23, 24],  # Shoulders and hips
+    "legs": [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]  # Hips, knees, ankles, feet
+}
+BODY_PART_NAMES = tuple(BODY_PARTS)
+
+
+@lru_cache(maxsize=8)
+def joint_weights(landmark_count: int = LANDMARK_COUNT) -> np.ndarray:
+    """
+    Weight vector of shape (landmark_count,)
+    """
+    weights = np.ones(landmark_count, dtype=np.float64)
+    for index, weight in IMPORTANT_JOINTS.items():
+        if index < landmark_count:
+            weights[index] = weight
+    weights.flags.writeable = False
+    return weights
+
+
+@lru_cache(maxsize=8)
+def body_part_masks(landmark_count: int = LANDMARK_COUNT) -> np.ndarray:
+    """
+    Float mask matrix of shape (body parts, landmark_count), rows in BODY_PART_NAMES order
+    """
+    masks = np.zeros((len(BODY_PARTS), landmark_count), dtype=np.float64)
+    for row, indices in enumerate(BODY_PARTS.values()):
+        masks[row, [i for i in indices if i < landmark_count]] = 1.0
+    masks.flags.writeable = False
+    return masks
+
+
+@lru_cache(maxsize=8)
+def scoring_matrix(landmark_count: int = LANDMARK_COUNT) -> np.ndarray:
+    """
+    Transposed (landmark_count, 1 + body parts) matrix: joint weights, then one mask per body part
+
+    Multiplying per-landmark similarities (or visibility flags) by this matrix yields the
+    overall and per-part numerators (or denominators) in a single matmul.
+    """
+    matrix = np.vstack([joint_weights(landmark_count), body_part_masks(landmark_count)]).T.copy()
+    matrix.flags.writeable = False
+    return matrix
+
+
+# score_pair constants: its scoring matrix, and per-landmark visibility thresholds and
+# distance caps (arrays, so its ufunc calls skip converting a Python scalar)
+_PAIR_MATRIX = scoring_matrix(LANDMARK_COUNT)
+_PAIR_THRESHOLDS = np.full(LANDMARK_COUNT, VISIBILITY_THRESHOLD)
+_PAIR_DISTANCE_CAPS = np.full(LANDMARK_COUNT, 1.0 / DISTANCE_SCALE)
+for _constant in (_PAIR_THRESHOLDS, _PAIR_DISTANCE_CAPS):
+    _constant.flags.writeable = False
+
+
+def landmarks_to_array(points: List[Dict[str, Any]]) -> np.ndarray:
+    """
+    Convert [{"x", "y", "z", "visibility"}, ...] to a float64 (landmarks, 4) array
+    """
+    if not points:
+        return np.zeros((0, 4), dtype=np.float64)
+    return np.array(
+        [[p.get("x", 0), p.get("y", 0), p.get("z", 0), p.get("visibility", 0)] for p in points],
+        dtype=np.float64
+    )
+
+
+def score_poses(
+    trainer: np.ndarray,
+    trainee: np.ndarray,
+    trainer_visible: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Score any number of pose pairs at once
+
+    Args:
+        trainer: (..., landmarks, 4) array
+        trainee: (..., landmarks, 4) array, broadcastable against trainer
+        trainer_visible: optional (..., landmarks) bool, trainer visibility > VISIBILITY_THRESHOLD
+                         when already known (e.g. unpacked from the stored visibility_mask)
+
+    Returns:
+        overall: (...,) weighted similarity in [0, 1]
+        parts:   (..., body parts) mean similarity per body part, BODY_PART_NAMES order
+    """
+    trainer = np.asarray(trainer, dtype=np.float64)
+    trainee = np.asarray(trainee, dtype=np.float64)
+
+    if trainer_visible is None:
+        trainer_visible = trainer[..., 3] > VISIBILITY_THRESHOLD
+    valid = trainer_visible & (trainee[..., 3] > VISIBILITY_THRESHOLD)
+    dx = trainer[..., 0] - trainee[..., 0]
+    dy = trainer[..., 1] - trainee[..., 1]
+    distance = np.sqrt(dx * dx + dy * dy)
+    # fmax (not maximum) so a NaN distance scores 0 like Python's max(0, nan)
+    similarity = np.where(valid, np.fmax(0.0, 1.0 - distance * DISTANCE_SCALE), 0.0)
+
+    matrix = scoring_matrix(trainer.shape[-2])
+    numerators = similarity @ matrix
+    denominators = valid.astype(np.float64) @ matrix
+    scores = np.divide(
+        numerators, denominators,
+        out=np.zeros_like(denominators), where=denominators > 0
+    )
+    return scores[..., 0], scores[..., 1:]
+
+
+def score_pair(trainer: np.ndarray, trainee: np.ndarray) -> Tuple[float, Dict[str, float]]:
+    """
+    score_poses for one pair of (LANDMARK_COUNT, 4) arrays, without its conversions and checks
+
+    At 33 landmarks the cost is numpy call overhead, so this makes as few calls as possible:
+    the x/y difference is read as one complex number per landmark (a single abs gives the
+    distance), and max(0, 1 - DISTANCE_SCALE * d) is summed as 1 - DISTANCE_SCALE * min(d, cap)
+    so weighted distances and weights come out of one matmul. Callers guarantee the shapes.
+    """
+    # One cast up front: mixed float32/float64 operands cost more per call than the cast
+    trainer = trainer.astype(np.float64)
+    diff = trainee - trainer
+    distance = np.abs(diff.view(np.complex128)[:, 0])
+
+    # Row 0: capped distance of each counted landmark, row 1: 1.0 where it counts
+    columns = np.empty((2, LANDMARK_COUNT))
+    np.greater(np.minimum(trainer[:, 3], trainee[:, 3]), _PAIR_THRESHOLDS, out=columns[1])
+    np.fmin(distance, _PAIR_DISTANCE_CAPS, out=distance)
+    np.multiply(distance, columns[1], out=columns[0])
+
+    distances, weights = (columns @ _PAIR_MATRIX).tolist()
+    scores = [1.0 - DISTANCE_SCALE * d / w if w > 0 else 0.0 for d, w in zip(distances, weights)]
+    return scores[0], dict(zip(BODY_PART_NAMES, scores[1:]))
+
+
+def score_pose(trainer: np.ndarray, trainee: np.ndarray) -> Tuple[float, Dict[str, float]]:
+    """
+    Score a single trainer/trainee pose pair
+
+    Mismatched landmark counts give an overall score of 0 while body parts are scored
+    on the landmarks both poses have (same behaviour as the original per-landmark loops).
+    """
+    if (
+        isinstance(trainer, np.ndarray) and isinstance(trainee, np.ndarray)
+        and trainer.shape == trainee.shape == (LANDMARK_COUNT, 4)
+    ):
+        return score_pair(trainer, trainee)
+
+    trainer = np.asarray(trainer, dtype=np.float64).reshape(-1, 4)
+    trainee = np.asarray(trainee, dtype=np.float64).reshape(-1, 4)
+
+    common = min(len(trainer), len(trainee))
+    overall, parts = score_poses(trainer[:common], trainee[:common])
+    if len(trainer) != len(trainee):
+        overall = 0.0
+
+    return float(overall), dict(zip(BODY_PART_NAMES, parts.tolist()))
@@ -0,0 +1,142 @@
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import TranscodeJob
+from app.utils.transcoding import transcode
+from app.utils.video_metadata import get_video_metadata_sync
+
+# Transcoding as a persistent job queue, run the same way as extraction_jobs.
+#
+# Storing a new video queues one job for its content hash (a duplicate upload shares the
+# job and its renditions); scripts/transcode_worker.py claims queued rows with SELECT ...
+# FOR UPDATE SKIP LOCKED and runs ffmpeg, refreshing heartbeat_at while it encodes. A job
+# whose worker died goes back to the queue once its heartbeat is stale.
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# A running job whose heartbeat is older than this is assumed to belong to a dead worker
+STALE_JOB_SECONDS = int(os.getenv("TRANSCODE_JOB_STALE_SECONDS", 300))
+# Re-queued at most this many times before being marked failed
+MAX_JOB_ATTEMPTS = int(os.getenv("TRANSCODE_JOB_MAX_ATTEMPTS", 3))
+HEARTBEAT_SECONDS = 30.0
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+UPLOADED_VIDEOS_DIR = BACKEND_DIR / "uploaded_videos"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def enqueue_transcode(db: Session, content_hash: str, source_filename: str) -> TranscodeJob:
+    """
+    Queue transcoding of a stored video unless its content is queued, running or done already
+
+    The job is only added to the session; the caller commits it together with the video,
+    once the file is in uploaded_videos/, so a worker never claims a job without its source.
+    """
+    job = db.query(TranscodeJob).filter(
+        TranscodeJob.content_hash == content_hash,
+        TranscodeJob.status != JOB_FAILED
+    ).first()
+    if job:
+        return job
+
+    job = TranscodeJob(
+        content_hash=content_hash,
+        source_filename=source_filename,
+        status=JOB_QUEUED,
+        attempts=0
+    )
+    db.add(job)
+    return job
+
+
+def requeue_stale_transcodes(db: Session) -> int:
+    """
+    Put running jobs of dead workers back in the queue (or fail them after MAX_JOB_ATTEMPTS)
+    """
+    threshold = _now() - timedelta(seconds=STALE_JOB_SECONDS)
+    stale = db.query(TranscodeJob).filter(
+        TranscodeJob.status == JOB_RUNNING,
+        TranscodeJob.heartbeat_at < threshold
+    ).with_for_update(skip_locked=True).all()
+
+    for job in stale:
+        logger.warning(f"Transcode job {job.id} on {job.worker_id} went stale")
+        if job.attempts >= MAX_JOB_ATTEMPTS:
+            job.status = JOB_FAILED
+            job.error = f"Worker stopped responding ({job.attempts} attempts)"
+            job.finished_at = _now()
+        else:
+            job.status = JOB_QUEUED
+            job.worker_id = None
+    db.commit()
+    return len(stale)
+
+
+def claim_transcode_job(db: Session, worker_id: str) -> Optional[TranscodeJob]:
+    """
+    Claim the oldest queued job
+    """
+    job = db.query(TranscodeJob).filter(
+        TranscodeJob.status == JOB_QUEUED
+    ).order_by(TranscodeJob.id).with_for_update(skip_locked=True).first()
+    if not job:
+        db.commit()
+        return None
+
+    job.status = JOB_RUNNING
+    job.worker_id = worker_id
+    job.attempts += 1
+    job.started_at = _now()
+    job.heartbeat_at = job.started_at
+    job.error = None
+    db.commit()
+    return job
+
+
+def run_transcode_job(db: Session, job: TranscodeJob) -> TranscodeJob:
+    """
+    Transcode a claimed job's video into its renditions
+
+    A job whose source file is not there (yet) goes back to the queue instead of failing,
+    until it has been tried MAX_JOB_ATTEMPTS times.
+    """
+    def heartbeat():
+        job.heartbeat_at = _now()
+        db.commit()
+
+    source = UPLOADED_VIDEOS_DIR / job.source_filename
+    if not source.exists() and job.attempts < MAX_JOB_ATTEMPTS:
+        logger.warning(f"Transcode job {job.id}: {job.source_filename} not found, requeued")
+        job.status = JOB_QUEUED
+        job.worker_id = None
+        db.commit()
+        return job
+
+    try:
+        if not source.exists():
+            raise FileNotFoundError(f"Video file not found: {job.source_filename}")
+        metadata = get_video_metadata_sync(source, job.content_hash)
+        job.renditions = transcode(source, job.content_hash, metadata, heartbeat, HEARTBEAT_SECONDS)
+        job.status = JOB_SUCCEEDED
+        logger.info(f"Transcode job {job.id}: {job.source_filename} -> {job.renditions}")
+    except Exception as e:
+        db.rollback()
+        job.status = JOB_FAILED
+        job.error = str(e)
+        logger.error(f"Transcode job {job.id} failed: {e}")
+    job.finished_at = _now()
+    db.commit()
+    return job
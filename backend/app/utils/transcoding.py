@@ -0,0 +1,183 @@
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple, Union
+
+from app.utils.video_metadata import VideoMetadata
+
+# Normalized streaming renditions of uploaded videos.
+#
+# Trainer uploads arrive in whatever codec, bitrate and resolution the phone produced. Each
+# stored video is transcoded once into an H.264/AAC ladder (LADDER, never upscaled) with a
+# keyframe every KEYFRAME_SECONDS and the index at the front of the file, so players start
+# at once and seek anywhere, and cv2.VideoCapture seeks by decoding at most one short GOP.
+# A single ffmpeg run decodes the source once and encodes every rung. Frames keep their
+# original timestamps (no frame rate conversion), so frame indices in a rendition match the
+# original and a keypoint track stays valid whichever of the two was read.
+#
+# Renditions live in RENDITIONS_DIR/<sha256>/<name>.mp4, keyed by content hash like the
+# stored video, and are written under temporary names and renamed once complete.
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+RENDITIONS_DIR = BACKEND_DIR / "renditions"
+
+KEYFRAME_SECONDS = float(os.getenv("TRANSCODE_KEYFRAME_SECONDS", 2))
+# x264 speed/size trade-off
+TRANSCODE_PRESET = os.getenv("TRANSCODE_PRESET", "veryfast")
+TRANSCODE_TIMEOUT_SECONDS = int(os.getenv("TRANSCODE_TIMEOUT_SECONDS", 3600))
+# GOP length when the source frame rate is unknown
+DEFAULT_FPS = 30.0
+RENDITION_SUFFIX = ".mp4"
+
+
+class Rendition(NamedTuple):
+    name: str
+    height: int  # of the short side, so portrait videos get the same ladder
+    max_kbps: int
+    audio_kbps: int
+
+
+# Highest first; extraction reads the first one available
+LADDER = (
+    Rendition("720p", 720, 3000, 128),
+    Rendition("480p", 480, 1200, 96),
+)
+
+
+def rendition_path(content_hash: str, name: str) -> Path:
+    return RENDITIONS_DIR / content_hash / f"{name}{RENDITION_SUFFIX}"
+
+
+def available_renditions(content_hash: Optional[str]) -> List[str]:
+    """
+    Names of the finished renditions of a video, highest first
+    """
+    if not content_hash:
+        return []
+    return [rung.name for rung in LADDER if rendition_path(content_hash, rung.name).exists()]
+
+
+def extraction_source(content_hash: Optional[str]) -> Optional[Path]:
+    """
+    Highest finished rendition of a video, None until it has been transcoded
+    """
+    names = available_renditions(content_hash)
+    return rendition_path(content_hash, names[0]) if names else None
+
+
+def is_rendition(path: Union[str, Path]) -> bool:
+    return RENDITIONS_DIR in Path(path).parents
+
+
+def remove_renditions(content_hash: str):
+    shutil.rmtree(RENDITIONS_DIR / content_hash, ignore_errors=True)
+
+
+def _short_side(metadata: Optional[VideoMetadata]) -> Optional[int]:
+    if metadata is None or not metadata.width or not metadata.height:
+        return None
+    return min(metadata.width, metadata.height)
+
+
+def plan_ladder(metadata: Optional[VideoMetadata]) -> List[Rendition]:
+    """
+    Rungs no taller than the source; a source below the lowest rung gets that one at its own size
+    """
+    short_side = _short_side(metadata)
+    if short_side is None:
+        return list(LADDER)
+    return [rung for rung in LADDER if rung.height <= short_side] or [LADDER[-1]]
+
+
+def _scale_filter(rung: Rendition, metadata: Optional[VideoMetadata]) -> str:
+    short_side = _short_side(metadata)
+    size = min(rung.height, short_side) if short_side else rung.height
+    size -= size % 2  # yuv420p needs even dimensions
+    portrait = metadata is not None and metadata.width and metadata.height and metadata.height > metadata.width
+    return f"scale={size}:-2" if portrait else f"scale=-2:{size}"
+
+
+def transcode_command(
+    source: Union[str, Path],
+    outputs: List[Tuple[Rendition, Path]],
+    metadata: Optional[VideoMetadata]
+) -> List[str]:
+    """
+    ffmpeg arguments encoding every (rung, path) output from one decode of source
+    """
+    fps = metadata.fps if metadata is not None and metadata.fps else DEFAULT_FPS
+    gop = max(1, round(fps * KEYFRAME_SECONDS))
+    split = f"[0:v]split={len(outputs)}" + "".join(f"[s{i}]" for i in range(len(outputs)))
+    scales = [f"[s{i}]{_scale_filter(rung, metadata)}[v{i}]" for i, (rung, _) in enumerate(outputs)]
+
+    command = ["ffmpeg", "-nostdin", "-y", "-v", "error", "-i", str(source), "-filter_complex", ";".join([split] + scales)]
+    for i, (rung, path) in enumerate(outputs):
+        command += [
+            "-map", f"[v{i}]", "-map", "0:a?",
+            "-c:v", "libx264", "-preset", TRANSCODE_PRESET, "-crf", "23", "-pix_fmt", "yuv420p",
+            "-maxrate", f"{rung.max_kbps}k", "-bufsize", f"{2 * rung.max_kbps}k",
+            # Fixed keyframe interval: no extra keyframes at scene cuts
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            # Keep every source frame and timestamp
+            "-fps_mode", "passthrough",
+            "-c:a", "aac", "-b:a", f"{rung.audio_kbps}k",
+            "-movflags", "+faststart", "-f", "mp4", str(path)
+        ]
+    return command
+
+
+def transcode(
+    source: Union[str, Path],
+    content_hash: str,
+    metadata: Optional[VideoMetadata],
+    heartbeat: Optional[Callable[[], None]] = None,
+    heartbeat_seconds: float = 30.0,
+    timeout: float = TRANSCODE_TIMEOUT_SECONDS
+) -> List[str]:
+    """
+    Write the renditions of a video, returning their names (highest first)
+
+    heartbeat is called every heartbeat_seconds while ffmpeg runs. Raises RuntimeError if
+    ffmpeg fails and TimeoutError after timeout seconds; nothing is left behind either way.
+    """
+    directory = RENDITIONS_DIR / content_hash
+    directory.mkdir(parents=True, exist_ok=True)
+    outputs = [(rung, directory / f".{rung.name}.part{RENDITION_SUFFIX}") for rung in plan_ladder(metadata)]
+    command = transcode_command(source, outputs, metadata)
+
+    started = time.monotonic()
+    try:
+        # stderr to a file: a pipe nobody reads while waiting could fill up and stall ffmpeg
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=stderr)
+            while True:
+                try:
+                    process.wait(timeout=heartbeat_seconds)
+                    break
+                except subprocess.TimeoutExpired:
+                    if time.monotonic() - started > timeout:
+                        process.kill()
+                        process.wait()
+                        raise TimeoutError(f"ffmpeg did not finish within {timeout} seconds")
+                    if heartbeat:
+                        heartbeat()
+            if process.returncode != 0:
+                stderr.seek(0)
+                message = stderr.read().decode(errors="replace").strip()
+                raise RuntimeError(f"ffmpeg exited with {process.returncode}: {message[-500:]}")
+
+        for rung, partial_path in outputs:
+            os.replace(partial_path, rendition_path(content_hash, rung.name))
+    finally:
+        for _, partial_path in outputs:
+            partial_path.unlink(missing_ok=True)
+
+    names = [rung.name for rung, _ in outputs]
+    logger.info(f"Transcoded {Path(source).name} to {names} in {time.monotonic() - started:.1f}s")
+    return names
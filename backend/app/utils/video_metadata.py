@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import weakref
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+
+# Video metadata from one ffprobe run, cached by content hash.
+#
+# ffprobe runs as an asyncio subprocess, so request handlers never block the event loop
+# on it, and at most PROBE_CONCURRENCY probes run at once per event loop. Results are
+# cached in memory and as <sha256>.json in METADATA_DIR, keyed by the file's content hash:
+# the API process (uploads, update-duration) and the keypoints workers share them, and a
+# renamed or re-uploaded copy of the same file is never probed twice. Callers that already
+# know the hash (save_upload computes it while writing) pass it in; otherwise the file is
+# hashed once per process and the hash remembered by (path, size, mtime).
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent.parent
+METADATA_DIR = BACKEND_DIR / "video_metadata"
+
+PROBE_CONCURRENCY = int(os.getenv("FFPROBE_CONCURRENCY", 4))
+PROBE_TIMEOUT_SECONDS = 30
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+class VideoMetadata(NamedTuple):
+    duration: Optional[float]  # seconds
+    fps: Optional[float]
+    width: Optional[int]
+    height: Optional[int]
+    codec: Optional[str]
+    frame_count: Optional[int]
+
+    @property
+    def duration_seconds(self) -> Optional[int]:
+        """
+        Whole seconds, as stored in Video.duration
+        """
+        return int(round(self.duration)) if self.duration is not None else None
+
+
+_metadata_cache: Dict[str, VideoMetadata] = {}
+_hash_cache: Dict[Tuple[str, int, int], str] = {}
+# One semaphore per event loop (the worker runs a fresh loop per asyncio.run)
+_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _rate(value: Optional[str]) -> Optional[float]:
+    """
+    ffprobe rate like "30000/1001" as a float (None for "0/0" or missing)
+    """
+    if not value:
+        return None
+    numerator, _, denominator = value.partition("/")
+    try:
+        rate = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate or None
+
+
+def parse_probe(data: Dict[str, Any]) -> VideoMetadata:
+    """
+    VideoMetadata from ffprobe -show_format -show_streams JSON output
+
+    fps and frame_count follow OpenCV's FFmpeg backend (average frame rate, else the base
+    rate; stream frame count, else duration x fps), so they match what cv2.VideoCapture
+    reports to the keypoint extractor.
+    """
+    stream = next((s for s in data.get("streams", []) if s.get("codec_type") == "video"), {})
+    duration = data.get("format", {}).get("duration") or stream.get("duration")
+    duration = float(duration) if duration is not None else None
+    fps = _rate(stream.get("avg_frame_rate")) or _rate(stream.get("r_frame_rate"))
+
+    frame_count = int(stream["nb_frames"]) if str(stream.get("nb_frames", "")).isdigit() else None
+    if not frame_count and duration and fps:
+        frame_count = int(duration * fps + 0.5)
+
+    return VideoMetadata(
+        duration=duration,
+        fps=fps,
+        width=stream.get("width"),
+        height=stream.get("height"),
+        codec=stream.get("codec_name"),
+        frame_count=frame_count
+    )
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """
+    SHA-256 of a file, read in blocks (remembered per path, size and modification time)
+    """
+    stat = os.stat(path)
+    key = (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+
+def _cache_path(content_hash: str) -> Path:
+    return METADATA_DIR / f"{content_hash}.json"
+
+
+def cached_metadata(content_hash: str) -> Optional[VideoMetadata]:
+    if content_hash in _metadata_cache:
+        return _metadata_cache[content_hash]
+    try:
+        metadata = VideoMetadata(**json.loads(_cache_path(content_hash).read_text()))
+    except (FileNotFoundError, json.JSONDecodeError, TypeError):
+        return None
+    _metadata_cache[content_hash] = metadata
+    return metadata
+
+
+def _store(content_hash: str, metadata: VideoMetadata):
+    _metadata_cache[content_hash] = metadata
+    METADATA_DIR.mkdir(exist_ok=True)
+    tmp_path = _cache_path(content_hash).with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(metadata._asdict()))
+    os.replace(tmp_path, _cache_path(content_hash))
+
+
+async def probe_video(path: Union[str, Path]) -> Optional[VideoMetadata]:
+    """
+    Run ffprobe on a file without blocking the event loop; None if it cannot be probed
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = _semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _semaphores[loop] = asyncio.Semaphore(PROBE_CONCURRENCY)
+
+    async with semaphore:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", str(path),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            logger.warning(f"Cannot run ffprobe: {e}")
+            return None
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), PROBE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            logger.warning(f"ffprobe timeout for {path}")
+            return None
+
+    if process.returncode != 0:
+        logger.warning(f"ffprobe error for {path}: {stderr.decode(errors='replace').strip()}")
+        return None
+    try:
+        return parse_probe(json.loads(stdout))
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning(f"Unreadable ffprobe output for {path}: {e}")
+        return None
+
+
+async def get_video_metadata(path: Union[str, Path], content_hash: Optional[str] = None) -> Optional[VideoMetadata]:
+    """
+    Metadata of a video file, probed only when nothing is cached for its content hash
+    """
+    if not os.path.exists(path):
+        logger.warning(f"Video file not found: {path}")
+        return None
+    if content_hash is None:
+        content_hash = await run_in_threadpool(file_sha256, path)
+
+    metadata = cached_metadata(content_hash)
+    if metadata is None:
+        metadata = await probe_video(path)
+        if metadata is not None:
+            _store(content_hash, metadata)
+    return metadata
+
+
+def get_video_metadata_sync(path: Union[str, Path], content_hash: Optional[str] = None) -> Optional[VideoMetadata]:
+    """
+    get_video_metadata for code outside an event loop (the keypoints worker)
+    """
+    if content_hash is not None:
+        metadata = cached_metadata(content_hash)
+        if metadata is not None:
+            return metadata
+    return asyncio.run(get_video_metadata(path, content_hash))
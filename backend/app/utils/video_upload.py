@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import math
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import AsyncIterable, List, NamedTuple, Optional, Tuple, Union
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+# Streaming storage of uploaded videos.
+#
+# An upload is copied from the request's spooled file to its destination in
+# UPLOAD_CHUNK_BYTES blocks and hashed on the way, so memory per upload stays at one block
+# whatever the video's size. Hashing and writing run in the threadpool (hashlib releases
+# the GIL on large blocks), keeping the event loop free for other requests. The file is
+# written under a temporary name and renamed once complete, so a failed upload never
+# leaves a truncated video behind.
+#
+# Stored videos are content-addressed: uploaded_videos/<sha256><ext>. Uploading the same
+# clip again finds the stored copy and keeps no second one; the Video rows pointing at a
+# file are its references, and the file is deleted with the last of them.
+#
+# Resumable uploads (app/routers/uploads.py) send a video as numbered chunks of a fixed
+# size. ChunkedUpload preallocates the whole file and writes every chunk straight to its
+# offset, so chunks can arrive in any order, in parallel or more than once, and the
+# finished file is moved into place without being copied. A chunk counts as
+# received only once all of its bytes are written (a marker file per chunk), so a chunk
+# cut off mid-request is simply sent again.
+#
+# Everything that decides about a stored file or its keypoint track from the Video rows
+# sharing its content takes lock_content first, so the check and what follows are not
+# interleaved with another upload or delete of the same content.
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+
+
+class SavedUpload(NamedTuple):
+    path: Path
+    size: int
+    sha256: str
+
+
+async def save_upload(file: UploadFile, destination: Union[str, Path]) -> SavedUpload:
+    """
+    Stream an uploaded file to destination, returning its size and SHA-256
+    """
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = destination.with_name(destination.name + PARTIAL_SUFFIX)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(partial_path, "wb") as out:
+            def write(chunk: bytes):
+                digest.update(chunk)
+                out.write(chunk)
+
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                await run_in_threadpool(write, chunk)
+                size += len(chunk)
+        os.replace(partial_path, destination)
+    except BaseException:
+        partial_path.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Saved upload {destination.name}: {size} bytes, sha256 {digest.hexdigest()}")
+    return SavedUpload(destination, size, digest.hexdigest())
+
+
+def lock_content(db: Session, sha256: str):
+    """
+    Serialize on content with this hash until db's transaction ends
+
+    A PostgreSQL transaction-level advisory lock; other databases (SQLite in development)
+    serialize writers anyway and get no lock.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:sha256))"), {"sha256": sha256})
+
+
+def content_path(directory: Union[str, Path], sha256: str, filename: str) -> Path:
+    """
+    Where content with this hash lives in directory: the stored copy, else <sha256><ext>
+    """
+    directory = Path(directory)
+    stored = sorted(directory.glob(f"{sha256}.*")) + sorted(directory.glob(sha256))
+    stored = [path for path in stored if not path.name.endswith(PARTIAL_SUFFIX)]
+    return stored[0] if stored else directory / f"{sha256}{Path(filename).suffix.lower()}"
+
+
+def place_by_content(path: Union[str, Path], sha256: str, directory: Union[str, Path], filename: str) -> Path:
+    """
+    Move a complete file to content_path(); if that content is already stored, drop this copy
+    """
+    destination = content_path(directory, sha256, filename)
+    if destination.exists():
+        Path(path).unlink()
+        logger.info(f"Upload {filename} is a duplicate of {destination.name}")
+    else:
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(destination))
+    return destination
+
+
+async def store_upload(file: UploadFile, directory: Union[str, Path], db: Optional[Session] = None) -> SavedUpload:
+    """
+    Stream an upload into directory under its content-addressed name (deduplicated)
+
+    With db, the content's lock_content is taken before the file is placed; the caller
+    commits once the video referencing it has been added.
+    """
+    saved = await save_upload(file, Path(directory) / f".upload_{uuid.uuid4().hex}")
+    try:
+        if db is not None:
+            lock_content(db, saved.sha256)
+        stored = place_by_content(saved.path, saved.sha256, directory, file.filename or "")
+    except BaseException:
+        saved.path.unlink(missing_ok=True)
+        raise
+    return SavedUpload(stored, saved.size, saved.sha256)
+
+
+class ChunkedUpload:
+    """
+    On-disk state of one resumable upload: <id>.part (the file) and <id>.chunks/ (markers)
+    """
+
+    def __init__(self, directory: Union[str, Path], upload_id: str, total_size: int, chunk_size: int):
+        self.directory = Path(directory)
+        self.total_size = total_size
+        self.chunk_size = chunk_size
+        self.data_path = self.directory / f"{upload_id}{PARTIAL_SUFFIX}"
+        self.markers_dir = self.directory / f"{upload_id}.chunks"
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, math.ceil(self.total_size / self.chunk_size))
+
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.total_size - index * self.chunk_size)
+
+    def create(self):
+        self.markers_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.data_path, "wb") as f:
+            # Sparse on most filesystems; chunks fill it in
+            f.truncate(self.total_size)
+
+    def exists(self) -> bool:
+        return self.data_path.exists()
+
+    async def write_chunk(self, index: int, body: AsyncIterable[bytes]):
+        """
+        Write chunk `index` from a stream of byte blocks; ValueError if its length is wrong
+        """
+        if not 0 <= index < self.chunk_count:
+            raise ValueError(f"Chunk index must be between 0 and {self.chunk_count - 1}")
+        expected = self.chunk_length(index)
+        offset = index * self.chunk_size
+        written = 0
+        marker = self.markers_dir / str(index)
+        # A resent chunk counts as missing again until it has been written in full
+        marker.unlink(missing_ok=True)
+
+        with open(self.data_path, "r+b") as f:
+            f.seek(offset)
+            async for block in body:
+                if written + len(block) > expected:
+                    raise ValueError(f"Chunk {index} is longer than {expected} bytes")
+                await run_in_threadpool(f.write, block)
+                written += len(block)
+        if written != expected:
+            raise ValueError(f"Chunk {index} has {written} bytes, expected {expected}")
+        marker.touch()
+
+    def received_chunks(self) -> List[int]:
+        if not self.markers_dir.exists():
+            return []
+        return sorted(int(marker.name) for marker in self.markers_dir.iterdir() if marker.name.isdigit())
+
+    def received_ranges(self) -> List[Tuple[int, int]]:
+        """
+        Received bytes as sorted half-open [start, end) ranges
+        """
+        ranges: List[List[int]] = []
+        for index in self.received_chunks():
+            start = index * self.chunk_size
+            end = start + self.chunk_length(index)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return [(start, end) for start, end in ranges]
+
+    def missing_chunks(self) -> List[int]:
+        received = set(self.received_chunks())
+        return [index for index in range(self.chunk_count) if index not in received]
+
+    def discard(self):
+        self.data_path.unlink(missing_ok=True)
+        shutil.rmtree(self.markers_dir, ignore_errors=True)
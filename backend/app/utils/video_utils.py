@@ -1,72 +1,25 @@
-import subprocess
-import json
-import os
 from pathlib import Path
 
+from fastapi.concurrency import run_in_threadpool
+
+from app.utils.video_metadata import file_sha256, get_video_metadata, get_video_metadata_sync
+
 def get_video_duration(video_path):
     """
     ใช้ ffprobe ดึง duration ของวิดีโอ (หน่วยเป็นวินาที)
+    (สำหรับโค้ดที่ไม่ได้รันใน event loop; ผลลัพธ์ถูก cache ตาม content hash ของไฟล์)
     """
-    try:
-        # ตรวจสอบว่าไฟล์มีอยู่หรือไม่
-        if not os.path.exists(video_path):
-            print(f"[VIDEO_UTILS] File not found: {video_path}")
-            return None
-            
-        # ใช้ ffprobe ดึง metadata
-        cmd = [
-            'ffprobe',
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_format',
-            '-show_streams',
-            video_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode != 0:
-            print(f"[VIDEO_UTILS] ffprobe error: {result.stderr}")
-            return None
-            
-        data = json.loads(result.stdout)
-        
-        # หา duration จาก format หรือ streams
-        duration = None
-        
-        # วิธีที่ 1: ดึงจาก format
-        if 'format' in data and 'duration' in data['format']:
-            duration = float(data['format']['duration'])
-            
-        # วิธีที่ 2: ดึงจาก video stream
-        if duration is None and 'streams' in data:
-            for stream in data['streams']:
-                if stream.get('codec_type') == 'video' and 'duration' in stream:
-                    duration = float(stream['duration'])
-                    break
-                    
-        if duration is not None:
-            # แปลงเป็นจำนวนเต็ม (วินาที)
-            duration_int = int(round(duration))
-            print(f"[VIDEO_UTILS] Duration for {video_path}: {duration_int} seconds")
-            return duration_int
-        else:
-            print(f"[VIDEO_UTILS] Could not extract duration from {video_path}")
-            return None
-            
-    except subprocess.TimeoutExpired:
-        print(f"[VIDEO_UTILS] ffprobe timeout for {video_path}")
-        return None
-    except json.JSONDecodeError as e:
-        print(f"[VIDEO_UTILS] JSON decode error: {e}")
-        return None
-    except Exception as e:
-        print(f"[VIDEO_UTILS] Unexpected error: {e}")
+    metadata = get_video_metadata_sync(video_path)
+    if metadata is None or metadata.duration_seconds is None:
+        print(f"[VIDEO_UTILS] Could not extract duration from {video_path}")
         return None
+    print(f"[VIDEO_UTILS] Duration for {video_path}: {metadata.duration_seconds} seconds")
+    return metadata.duration_seconds
 
-def update_video_duration(video_id, db):
+async def update_video_duration(video_id, db):
     """
     อัปเดต duration ของวิดีโอในฐานข้อมูลจากไฟล์จริง
+    ใช้ metadata ที่ cache ไว้ตอนอัปโหลด (ตาม content hash) ถ้ามี ไม่ต้อง probe ใหม่
     """
     from app.models import Video
     
@@ -84,9 +37,17 @@ def update_video_duration(video_id, db):
             filename = video.s3_url
             
         video_path = Path(__file__).parent.parent.parent / "uploaded_videos" / filename
+        if not video_path.exists():
+            print(f"[VIDEO_UTILS] File not found: {video_path}")
+            return False
+        
+        # วิดีโอเก่าที่ยังไม่มี content hash: คำนวณครั้งเดียวแล้วเก็บไว้
+        if not video.content_hash:
+            video.content_hash = await run_in_threadpool(file_sha256, video_path)
         
-        # ดึง duration จากไฟล์
-        duration = get_video_duration(str(video_path))
+        # ดึง duration จาก metadata (probe เฉพาะเมื่อยังไม่มีใน cache)
+        metadata = await get_video_metadata(video_path, video.content_hash)
+        duration = metadata.duration_seconds if metadata else None
         
         if duration is not None:
             # อัปเดตในฐานข้อมูล
@@ -101,4 +62,4 @@ def update_video_duration(video_id, db):
     except Exception as e:
         print(f"[VIDEO_UTILS] Error updating video {video_id} duration: {e}")
         db.rollback()
-        return False
\ No newline at end of file
+        return False
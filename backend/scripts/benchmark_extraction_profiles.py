@@ -0,0 +1,104 @@
+"""
+Benchmark: extraction profiles (app/utils/keypoints_extractor.py EXTRACTION_PROFILES)
+
+Runs every profile over the start of each video in uploaded_videos/ and reports throughput
+and how far its landmarks drift from the reference profile (accurate by default). Drift is
+the mean x/y distance, in normalized image units, over landmarks visible in both outputs.
+
+--no-pipeline runs decode, inference and landmark copying one after another instead of in
+overlapping threads, to measure what the pipelined extractor gains.
+
+Usage:
+    python scripts/benchmark_extraction_profiles.py
+    python scripts/benchmark_extraction_profiles.py --seconds 30 --videos uploaded_videos/a.mp4
+    python scripts/benchmark_extraction_profiles.py --no-pipeline
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.keypoints_extractor import EXTRACTION_PROFILES, KeypointsExtractor
+from app.utils.keypoints_store import KeypointSequence
+from app.utils.pose_scoring import VISIBILITY_THRESHOLD
+
+VIDEO_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
+
+
+def landmark_drift(reference: KeypointSequence, candidate: KeypointSequence):
+    """
+    (mean x/y drift, share of frames where pose detection agrees) on common frame indices
+    """
+    common, reference_rows, candidate_rows = np.intersect1d(
+        reference.frame_indices, candidate.frame_indices, return_indices=True
+    )
+    if not len(common):
+        return float("nan"), float("nan")
+
+    reference_detected = reference.pose_detected[reference_rows]
+    candidate_detected = candidate.pose_detected[candidate_rows]
+    agreement = float(np.mean(reference_detected == candidate_detected))
+
+    both = reference_detected & candidate_detected
+    a = reference.landmarks[reference_rows][both]
+    b = candidate.landmarks[candidate_rows][both]
+    visible = (a[..., 3] > VISIBILITY_THRESHOLD) & (b[..., 3] > VISIBILITY_THRESHOLD)
+    if not visible.any():
+        return float("nan"), agreement
+    distance = np.linalg.norm(a[..., :2] - b[..., :2], axis=-1)
+    return float(distance[visible].mean()), agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark keypoint extraction profiles")
+    parser.add_argument("--videos", nargs="*", help="Video files (default: everything in uploaded_videos/)")
+    parser.add_argument("--seconds", type=float, default=20.0, help="Length of video processed per run")
+    parser.add_argument("--reference", choices=list(EXTRACTION_PROFILES), default="accurate")
+    parser.add_argument("--no-pipeline", action="store_true", help="Run the extraction stages sequentially")
+    args = parser.parse_args()
+
+    if args.videos:
+        videos = [Path(video) for video in args.videos]
+    else:
+        videos_dir = Path(__file__).parent.parent / "uploaded_videos"
+        videos = sorted(path for path in videos_dir.glob("*") if path.suffix.lower() in VIDEO_SUFFIXES)
+    if not videos:
+        print("No videos found")
+        sys.exit(1)
+
+    # Reference first so every other profile can be compared against it
+    profiles = [args.reference] + [name for name in EXTRACTION_PROFILES if name != args.reference]
+    extractors = {name: KeypointsExtractor(name) for name in profiles}
+
+    for video in videos:
+        mode = "sequential" if args.no_pipeline else "pipelined"
+        print(f"\n{video.name} (first {args.seconds:g} s, {mode})")
+        print(f"{'profile':<10} {'complexity':>10} {'max size':>9} {'frames':>7} {'fps':>8} {'drift':>8} {'detect agree':>13}")
+        reference = None
+        for name in profiles:
+            extractor = extractors[name]
+            start = time.perf_counter()
+            sequence = extractor.extract_sequence(str(video), 0, args.seconds, pipelined=not args.no_pipeline)
+            elapsed = time.perf_counter() - start
+
+            if reference is None:
+                reference = sequence
+                drift, agreement = 0.0, 1.0
+            else:
+                drift, agreement = landmark_drift(reference, sequence)
+
+            profile = extractor.profile
+            print(
+                f"{name:<10} {profile.model_complexity:>10} {str(profile.max_inference_size or '-'):>9} "
+                f"{len(sequence):>7} {len(sequence) / elapsed:>8.1f} {drift:>8.4f} {agreement:>12.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
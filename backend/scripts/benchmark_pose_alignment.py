@@ -0,0 +1,75 @@
+"""
+Benchmark: banded DTW alignment (app/utils/pose_alignment.py) on a long synthetic session
+
+The trainer segment is the sample keypoints file tiled up to --minutes; the trainee is the
+same motion shifted by --delay seconds with coordinate jitter.
+
+Usage:
+    python scripts/benchmark_pose_alignment.py
+    python scripts/benchmark_pose_alignment.py --minutes 20 --band-seconds 3
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.keypoints_store import load_sequence
+from app.utils.pose_alignment import align_sequences, DEFAULT_BAND_SECONDS
+from app.utils.pose_scoring import score_poses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark whole-session DTW alignment")
+    parser.add_argument("--keypoints", default=str(Path(__file__).parent.parent / "keypoints" / "video_156_segment_43.json"))
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--band-seconds", type=float, default=DEFAULT_BAND_SECONDS)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    sample = load_sequence(args.keypoints)
+    frame_count = int(args.minutes * 60 * args.fps)
+    repeats = -(-frame_count // len(sample))
+
+    trainer = np.tile(sample.landmarks, (repeats, 1, 1))[:frame_count]
+    trainer_timestamps = np.arange(frame_count) / args.fps
+
+    rng = np.random.default_rng(0)
+    trainee = trainer.astype(np.float64)
+    trainee[..., :2] += rng.normal(0, 0.02, trainee[..., :2].shape)
+    trainee_timestamps = trainer_timestamps + args.delay
+
+    start = time.perf_counter()
+    matches, cost = align_sequences(trainer, trainer_timestamps, trainee, trainee_timestamps, args.band_seconds)
+    elapsed = time.perf_counter() - start
+
+    aligned, _ = score_poses(trainer[matches], trainee)
+    nearest = np.clip(np.searchsorted(trainer_timestamps, trainee_timestamps), 0, frame_count - 1)
+    unaligned, _ = score_poses(trainer[nearest], trainee)
+    offset = np.median(trainee_timestamps - trainer_timestamps[matches])
+
+    print(f"Frames:            {frame_count} ({args.minutes:g} min at {args.fps:g} fps)")
+    print(f"Band:              +/- {args.band_seconds:g} s")
+    print(f"Alignment time:    {elapsed * 1000:8.1f} ms ({elapsed / frame_count * 1e6:.2f} us/frame)")
+    print(f"Mean path cost:    {cost:.4f}")
+    print(f"Aligned score:     {aligned.mean():.4f}")
+    print(f"Unaligned score:   {unaligned.mean():.4f}")
+    print(f"Tempo offset:      {offset:+.3f} s (expected {args.delay:+.3f} s)")
+
+    if abs(offset - args.delay) > 1.0 / args.fps:
+        print("FAIL: recovered tempo offset is off by more than one frame")
+        sys.exit(1)
+    if elapsed > args.max_seconds:
+        print(f"FAIL: alignment took longer than {args.max_seconds} s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
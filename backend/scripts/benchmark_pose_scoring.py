@@ -0,0 +1,170 @@
+"""
+Micro-benchmark: original per-landmark scoring loops vs the vectorized engine in app/utils/pose_scoring.py
+
+Usage:
+    python scripts/benchmark_pose_scoring.py
+    python scripts/benchmark_pose_scoring.py --keypoints keypoints/video_156_segment_44.json --repeat 5
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.utils.pose_scoring import score_pose, score_poses, landmarks_to_array, BODY_PART_NAMES
+
+
+# --- Reference implementation (the loops previously in app/routers/keypoints.py) ---
+
+def legacy_joint_weight(joint_index):
+    important_joints = {
+        11: 1.5, 12: 1.5, 13: 1.3, 14: 1.3, 15: 1.1, 16: 1.1,
+        23: 1.5, 24: 1.5, 25: 1.3, 26: 1.3, 27: 1.1, 28: 1.1,
+    }
+    return important_joints.get(joint_index, 1.0)
+
+
+def legacy_pose_similarity(trainer_keypoints, trainee_keypoints):
+    if len(trainer_keypoints) != len(trainee_keypoints):
+        return 0.0
+    total_similarity = 0.0
+    valid_points = 0
+    for i, (trainer_point, trainee_point) in enumerate(zip(trainer_keypoints, trainee_keypoints)):
+        if trainer_point.get('visibility', 0) > 0.5 and trainee_point.get('visibility', 0) > 0.5:
+            dx = trainer_point['x'] - trainee_point['x']
+            dy = trainer_point['y'] - trainee_point['y']
+            distance = np.sqrt(dx*dx + dy*dy)
+            similarity = max(0, 1 - (distance * 2))
+            weight = legacy_joint_weight(i)
+            total_similarity += similarity * weight
+            valid_points += weight
+    return total_similarity / valid_points if valid_points > 0 else 0.0
+
+
+def legacy_detailed_scores(trainer_keypoints, trainee_keypoints):
+    body_parts = {
+        "head": [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
+        "arms": [11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22],
+        "torso": [11, 12, 23, 24],
+        "legs": [23, 24, 25, 26, 27, 28, 29, 30, 31, 32]
+    }
+    detailed_scores = {}
+    for part_name, indices in body_parts.items():
+        part_score = 0.0
+        valid_points = 0
+        for idx in indices:
+            if idx < len(trainer_keypoints) and idx < len(trainee_keypoints):
+                trainer_point = trainer_keypoints[idx]
+                trainee_point = trainee_keypoints[idx]
+                if trainer_point.get('visibility', 0) > 0.5 and trainee_point.get('visibility', 0) > 0.5:
+                    import numpy as np
+                    dx = trainer_point['x'] - trainee_point['x']
+                    dy = trainer_point['y'] - trainee_point['y']
+                    distance = np.sqrt(dx*dx + dy*dy)
+                    part_score += max(0, 1 - (distance * 2))
+                    valid_points += 1
+        detailed_scores[part_name] = part_score / valid_points if valid_points > 0 else 0.0
+    return detailed_scores
+
+
+def make_pairs(frames, rng):
+    """
+    Pair every detected trainer frame with a jittered copy acting as the trainee
+    """
+    pairs = []
+    for frame in frames:
+        if not frame.get("pose_detected") or not frame.get("keypoints"):
+            continue
+        trainee = []
+        for point in frame["keypoints"]:
+            trainee.append({
+                "x": point["x"] + rng.normal(0, 0.05),
+                "y": point["y"] + rng.normal(0, 0.05),
+                "z": point["z"],
+                "visibility": float(np.clip(point["visibility"] + rng.normal(0, 0.3), 0, 1))
+            })
+        pairs.append((frame["keypoints"], trainee))
+    return pairs
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pose scoring implementations")
+    parser.add_argument("--keypoints", default=str(Path(__file__).parent.parent / "keypoints" / "video_156_segment_43.json"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with open(args.keypoints, "r", encoding="utf-8") as f:
+        frames = json.load(f)
+    pairs = make_pairs(frames, np.random.default_rng(0))
+    n = len(pairs)
+
+    trainer_arrays = np.stack([landmarks_to_array(t) for t, _ in pairs]).astype(np.float32)
+    trainee_arrays = np.stack([landmarks_to_array(s) for _, s in pairs])
+
+    # Correctness: vectorized scores must match the reference loops
+    max_diff = 0.0
+    for (trainer, trainee), trainer_array, trainee_array in zip(pairs, trainer_arrays, trainee_arrays):
+        expected_overall = legacy_pose_similarity(trainer, trainee)
+        expected_parts = legacy_detailed_scores(trainer, trainee)
+        overall, parts = score_pose(landmarks_to_array(trainer), trainee_array)
+        max_diff = max(max_diff, abs(overall - expected_overall))
+        max_diff = max(max_diff, max(abs(parts[k] - expected_parts[k]) for k in BODY_PART_NAMES))
+
+    batch_overall, batch_parts = score_poses(trainer_arrays, trainee_arrays)
+    float32_diff = max(
+        abs(batch_overall[i] - legacy_pose_similarity(*pairs[i])) for i in range(n)
+    )
+
+    def run_legacy():
+        for trainer, trainee in pairs:
+            legacy_pose_similarity(trainer, trainee)
+            legacy_detailed_scores(trainer, trainee)
+
+    def run_single():
+        for i in range(n):
+            score_pose(trainer_arrays[i], trainee_arrays[i])
+
+    def run_batch():
+        score_poses(trainer_arrays, trainee_arrays)
+
+    legacy_time = timed(run_legacy, args.repeat)
+    single_time = timed(run_single, args.repeat)
+    batch_time = timed(run_batch, args.repeat)
+
+    print(f"Pose pairs:                {n}")
+    print(f"Max score difference:      {max_diff:.3e} (float64 landmarks)")
+    print(f"Max difference vs float32: {float32_diff:.3e} (stored .kpt precision)")
+    print(f"Legacy loops:              {legacy_time / n * 1e6:8.2f} us/comparison")
+    print(f"score_pair, one pair:      {single_time / n * 1e6:8.2f} us/comparison  ({legacy_time / single_time:5.1f}x)")
+    print(f"Vectorized, whole batch:   {batch_time / n * 1e6:8.2f} us/comparison  ({legacy_time / batch_time:5.1f}x)")
+
+    if max_diff > 1e-9:
+        print("FAIL: vectorized scores differ from the reference implementation")
+        sys.exit(1)
+    failed = False
+    for name, elapsed in (("single-pair", single_time), ("batched", batch_time)):
+        if legacy_time / elapsed < args.min_speedup:
+            print(f"FAIL: {name} speedup {legacy_time / elapsed:.1f}x is below {args.min_speedup}x")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Keypoint extraction worker: processes jobs queued by POST /keypoints/extract-segment and
+/keypoints/extract-video/{video_id}
+
+Queued segments of the same video are claimed together and extracted from one decode of
+the video (--per-segment takes one job at a time instead).
+
+Run one or more of these next to the API (they share the extraction_jobs table):
+    python scripts/keypoints_worker.py
+    python scripts/keypoints_worker.py --poll-interval 5
+    python scripts/keypoints_worker.py --once      # drain the queue and exit
+    python scripts/keypoints_worker.py --processes 8   # one video's segments over 8 processes
+    python scripts/keypoints_worker.py --profile fast  # lite model, 480p inference
+    python scripts/keypoints_worker.py --per-segment   # one job per claim, reopening the video each time
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import signal
+import socket
+import time
+
+from app.db import SessionLocal
+from app.utils.extraction_jobs import claim_next_job, claim_video_jobs, requeue_stale_jobs, run_job, run_video_jobs
+from app.utils.keypoints_extractor import DEFAULT_PROFILE, EXTRACTION_PROFILES, KeypointsExtractor
+from app.utils.parallel_extraction import ParallelExtractor
+
+logger = logging.getLogger("keypoints_worker")
+
+# Most segments of one video claimed together per extraction process
+JOBS_PER_PROCESS = 16
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the keypoint extraction worker")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument(
+        "--processes", type=int, default=1,
+        help="Extraction processes; above 1, a video's segments are split into time chunks across them"
+    )
+    parser.add_argument("--per-segment", action="store_true", help="Claim and extract one segment job at a time")
+    parser.add_argument(
+        "--profile", choices=list(EXTRACTION_PROFILES), default=DEFAULT_PROFILE,
+        help="Speed/accuracy trade-off: MediaPipe model complexity and maximum inference resolution"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    # Finish the current job on SIGTERM/SIGINT instead of leaving it half done
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info("Stop requested, finishing current job")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    # One MediaPipe Pose instance (per process) reused for every job this worker runs
+    if args.processes > 1:
+        extractor = ParallelExtractor(processes=args.processes, profile=args.profile)
+    else:
+        extractor = KeypointsExtractor(args.profile)
+    logger.info(f"Worker {worker_id} started ({args.processes} process(es), {args.profile} profile)")
+
+    try:
+        while not stopping:
+            db = SessionLocal()
+            try:
+                requeue_stale_jobs(db)
+                if not args.per_segment:
+                    jobs = claim_video_jobs(db, worker_id, limit=args.processes * JOBS_PER_PROCESS)
+                    if jobs:
+                        logger.info(f"Jobs {[job.id for job in jobs]}: video {jobs[0].video_id}, {len(jobs)} segment(s)")
+                        run_video_jobs(db, jobs, extractor)
+                        continue
+                else:
+                    job = claim_next_job(db, worker_id)
+                    if job:
+                        logger.info(f"Job {job.id}: video {job.video_id} segment {job.segment_id} (attempt {job.attempts})")
+                        run_job(db, job, extractor)
+                        continue
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Worker loop error: {e}")
+            finally:
+                db.close()
+
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+    finally:
+        if args.processes > 1:
+            extractor.close()
+
+    logger.info(f"Worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    main()
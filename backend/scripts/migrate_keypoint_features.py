@@ -0,0 +1,42 @@
+"""
+Rewrite binary keypoints files (.kpt) whose derived trainer features are missing or
+outdated (e.g. float32 joint angles), so compare requests read them instead of
+recomputing them on every load.
+
+File names do not change, so the database is not touched. Run it with the
+extraction workers stopped.
+
+Usage:
+    python scripts/migrate_keypoint_features.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+
+from app.utils.keypoints_store import FILE_SUFFIX
+from app.utils.pose_features import migrate_features_file
+
+KEYPOINTS_DIR = Path(__file__).parent.parent / "keypoints"
+
+
+def main():
+    kpt_files = sorted(KEYPOINTS_DIR.glob(f"*{FILE_SUFFIX}"))
+    print(f"Found {len(kpt_files)} keypoints files")
+
+    rewritten = 0
+    for kpt_path in kpt_files:
+        try:
+            if migrate_features_file(kpt_path):
+                print(f"  {kpt_path.name}: rewritten")
+                rewritten += 1
+        except Exception as e:
+            print(f"  Failed to migrate {kpt_path.name}: {e}")
+
+    print(f"{rewritten} of {len(kpt_files)} files rewritten")
+
+
+if __name__ == "__main__":
+    main()
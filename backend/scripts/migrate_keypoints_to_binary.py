@@ -0,0 +1,83 @@
+"""
+Convert legacy JSON keypoints files (indent=2) to the binary .kpt format
+and point video_segments.keypoints_file at the new files.
+
+Usage:
+    python scripts/migrate_keypoints_to_binary.py              # migrate files referenced in the database
+    python scripts/migrate_keypoints_to_binary.py --files-only # migrate every *.json in keypoints/ without touching the database
+    python scripts/migrate_keypoints_to_binary.py --remove-json
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from pathlib import Path
+
+from app.utils.keypoints_store import LEGACY_SUFFIX, migrate_json_file
+
+KEYPOINTS_DIR = Path(__file__).parent.parent / "keypoints"
+
+
+def migrate_files(remove_json: bool):
+    json_files = sorted(KEYPOINTS_DIR.glob(f"*{LEGACY_SUFFIX}"))
+    print(f"Found {len(json_files)} JSON keypoints files")
+
+    for json_path in json_files:
+        try:
+            before = json_path.stat().st_size
+            kpt_path = migrate_json_file(json_path, remove_json=remove_json)
+            after = kpt_path.stat().st_size
+            print(f"  {json_path.name} -> {kpt_path.name} ({before:,} -> {after:,} bytes)")
+        except Exception as e:
+            print(f"  Failed to migrate {json_path.name}: {e}")
+
+
+def migrate_database(remove_json: bool):
+    from app.db import SessionLocal
+    from app.models import VideoSegment
+
+    db = SessionLocal()
+    try:
+        segments = db.query(VideoSegment).filter(
+            VideoSegment.keypoints_file.like(f"%{LEGACY_SUFFIX}")
+        ).all()
+        print(f"Found {len(segments)} segments with JSON keypoints")
+
+        for segment in segments:
+            json_path = KEYPOINTS_DIR / segment.keypoints_file
+            if not json_path.exists():
+                print(f"  Segment {segment.id}: file missing ({segment.keypoints_file}), skipped")
+                continue
+            try:
+                kpt_path = migrate_json_file(json_path, remove_json=False)
+                segment.keypoints_file = kpt_path.name
+                db.commit()
+                print(f"  Segment {segment.id}: {json_path.name} -> {kpt_path.name}")
+            except Exception as e:
+                db.rollback()
+                print(f"  Segment {segment.id}: failed to migrate: {e}")
+                continue
+
+            # Only drop the JSON once the database points at the new file
+            if remove_json:
+                json_path.unlink()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate JSON keypoints files to the binary format")
+    parser.add_argument("--files-only", action="store_true", help="Convert files without updating the database")
+    parser.add_argument("--remove-json", action="store_true", help="Delete JSON files after a successful conversion")
+    args = parser.parse_args()
+
+    if args.files_only:
+        migrate_files(args.remove_json)
+    else:
+        migrate_database(args.remove_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Transcoding worker: turns stored trainer videos into their normalized H.264 renditions
+(see app/utils/transcoding.py), one queued job at a time
+
+Run one or more of these next to the API (they share the transcode_jobs table):
+    python scripts/transcode_worker.py
+    python scripts/transcode_worker.py --poll-interval 5
+    python scripts/transcode_worker.py --once      # drain the queue and exit
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import logging
+import signal
+import socket
+import time
+
+from app.db import SessionLocal
+from app.utils.transcode_jobs import JOB_QUEUED, claim_transcode_job, requeue_stale_transcodes, run_transcode_job
+
+logger = logging.getLogger("transcode_worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the video transcoding worker")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    # Finish the current job on SIGTERM/SIGINT instead of leaving it half done
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info("Stop requested, finishing current job")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    logger.info(f"Worker {worker_id} started")
+    while not stopping:
+        db = SessionLocal()
+        try:
+            requeue_stale_transcodes(db)
+            job = claim_transcode_job(db, worker_id)
+            if job:
+                logger.info(f"Job {job.id}: {job.source_filename} (attempt {job.attempts})")
+                run_transcode_job(db, job)
+                # A requeued job (source not there yet) is retried after the poll interval
+                if job.status != JOB_QUEUED:
+                    continue
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Worker loop error: {e}")
+        finally:
+            db.close()
+
+        if args.once:
+            break
+        time.sleep(args.poll_interval)
+
+    logger.info(f"Worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    main()
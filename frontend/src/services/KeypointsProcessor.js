@@ -44,8 +44,9 @@ class KeypointsProcessor {
         return await response.json();
     }
 
-    // Extract keypoints สำหรับ segment เฉพาะ
-    async extractSegmentKeypoints(videoId, segmentId) {
+    // Extract keypoints สำหรับ segment เฉพาะ (เข้าคิวให้ worker ประมวลผล คืนค่า job พร้อม job_id)
+    // options: { targetFps } หรือ { frameStride } เพื่อลดจำนวนเฟรมที่ประมวลผล
+    async extractSegmentKeypoints(videoId, segmentId, options = {}) {
         const response = await fetch(`${this.baseURL}/keypoints/extract-segment`, {
             method: 'POST',
             headers: {
@@ -53,7 +54,9 @@ class KeypointsProcessor {
             },
             body: JSON.stringify({
                 video_id: videoId,
-                segment_id: segmentId
+                segment_id: segmentId,
+                target_fps: options.targetFps ?? null,
+                frame_stride: options.frameStride ?? null
             })
         });
 
@@ -65,6 +68,34 @@ class KeypointsProcessor {
         return await response.json();
     }
 
+    // ดูสถานะและความคืบหน้าของ extraction job
+    async getExtractionJob(jobId) {
+        const response = await fetch(`${this.baseURL}/keypoints/jobs/${jobId}`);
+
+        if (!response.ok) {
+            throw new Error(`Failed to get extraction job: ${response.status}`);
+        }
+
+        return await response.json();
+    }
+
+    // รอจน job เสร็จ (poll ทุก intervalMs) และรายงานความคืบหน้าผ่าน onProgress
+    async waitForExtractionJob(jobId, onProgress = null, intervalMs = 2000) {
+        while (true) {
+            const job = await this.getExtractionJob(jobId);
+            if (onProgress) {
+                onProgress(job);
+            }
+            if (job.status === 'succeeded') {
+                return job;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || 'Keypoints extraction failed');
+            }
+            await new Promise(resolve => setTimeout(resolve, intervalMs));
+        }
+    }
+
     // ตรวจสอบสถานะ keypoints ของวิดีโอ
     async checkKeypointsStatus(videoId) {
         try {
@@ -78,6 +78,66 @@ class KeypointsService {
         }
     }
 
+    // เปรียบเทียบ keypoints หลายเฟรมในคำขอเดียว
+    // frames: [{ keypoints, timestamp }, ...] -> { results: [...], window: { mean_score, ... } }
+    // mode: 'distance' (ระยะห่างของ landmark) หรือ 'angles' (มุมข้อต่อแบบ MultiDirectionalPoseComparator)
+    async compareKeypointsBatch(videoId, segmentId, frames, interpolate = false, mode = 'distance') {
+        try {
+            const response = await fetch(
+                `${this.baseURL}/keypoints/videos/${videoId}/segments/${segmentId}/compare-batch`,
+                {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        frames: frames,
+                        interpolate: interpolate,
+                        mode: mode
+                    })
+                }
+            );
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            return await response.json();
+        } catch (error) {
+            console.error('Error comparing keypoints batch:', error);
+            throw error;
+        }
+    }
+
+    // เปิด WebSocket สำหรับเปรียบเทียบแบบ real-time (หนึ่ง connection ต่อ segment)
+    // onResults จะถูกเรียกพร้อม array ของ ComparisonResult และจำนวนเฟรมที่ถูก drop
+    openCompareStream(videoId, segmentId, { onResults, onError, interpolate = false, mode = 'distance' } = {}) {
+        const wsURL = this.baseURL.replace(/^http/, 'ws');
+        const socket = new WebSocket(
+            `${wsURL}/keypoints/ws/videos/${videoId}/segments/${segmentId}/compare?interpolate=${interpolate}&mode=${mode}`
+        );
+
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'results') {
+                onResults && onResults(message.results, message.dropped);
+            } else if (message.type === 'error') {
+                console.error('Compare stream error:', message.detail);
+                onError && onError(message.detail);
+            }
+        };
+
+        return {
+            socket,
+            sendFrame: (keypoints, timestamp) => {
+                if (socket.readyState === WebSocket.OPEN) {
+                    socket.send(JSON.stringify({ keypoints, timestamp }));
+                }
+            },
+            close: () => socket.close()
+        };
+    }
+
     // ดูข้อมูล segments ทั้งหมดของ video
     async getVideoSegments(videoId) {
         try {